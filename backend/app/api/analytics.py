@@ -1,27 +1,33 @@
 """Analytics API endpoints"""
-from flask import Blueprint, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.models import Petition, Department, User
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
+from app.models import Petition, Department
 from app.extensions import db
+from app.db_routing import read_only
+from app.services import TrendService, AnalysisService, cached_response, current_identity, roles_required
+from app.services.cache import get_analytics_cache
+from app.services.track_cache import get_track_cache
 from sqlalchemy import func
-from datetime import datetime, timedelta
+from datetime import date, datetime, timedelta
 
 analytics = Blueprint("analytics", __name__)
 
 
 @analytics.route("/dashboard", methods=["GET"])
 @jwt_required()
+@read_only
+@cached_response("petitions", "departments")
 def get_dashboard_stats():
     """Get overall dashboard statistics"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = current_identity()
+        user_id = identity.user_id
         
         # Build base query
         query = Petition.query
         
         # Filter by user for citizens
-        if user.role == "citizen":
+        if identity.role == "citizen":
             query = query.filter_by(user_id=user_id)
         
         # Total petitions
@@ -33,7 +39,7 @@ def get_dashboard_stats():
             func.count(Petition.id)
         ).group_by(Petition.status)
         
-        if user.role == "citizen":
+        if identity.role == "citizen":
             status_counts = status_counts.filter_by(user_id=user_id)
         
         status_breakdown = {status: count for status, count in status_counts.all()}
@@ -44,7 +50,7 @@ def get_dashboard_stats():
             func.count(Petition.id)
         ).group_by(Petition.priority)
         
-        if user.role == "citizen":
+        if identity.role == "citizen":
             priority_counts = priority_counts.filter_by(user_id=user_id)
         
         priority_breakdown = {priority: count for priority, count in priority_counts.all()}
@@ -55,7 +61,7 @@ def get_dashboard_stats():
             func.count(Petition.id)
         ).join(Petition).group_by(Department.name)
         
-        if user.role == "citizen":
+        if identity.role == "citizen":
             dept_counts = dept_counts.filter(Petition.user_id == user_id)
         
         department_breakdown = {dept: count for dept, count in dept_counts.all()}
@@ -85,48 +91,111 @@ def get_dashboard_stats():
 
 @analytics.route("/trends", methods=["GET"])
 @jwt_required()
+@read_only
+@cached_response("petitions", "departments")
 def get_trends():
-    """Get petition trends over time"""
+    """
+    Get petition trends over time
+
+    Query params:
+        start, end: ISO dates (inclusive); defaults to the last TRENDS_DEFAULT_DAYS days
+        granularity: hour, day (default), week or month
+        dimension: optional breakdown - department, category, priority or status
+    """
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        
-        # Get petitions from last 30 days
-        thirty_days_ago = datetime.utcnow() - timedelta(days=30)
-        
-        query = db.session.query(
-            func.date(Petition.created_at).label('date'),
-            func.count(Petition.id).label('count')
-        ).filter(Petition.created_at >= thirty_days_ago)\
-         .group_by(func.date(Petition.created_at))\
-         .order_by(func.date(Petition.created_at))
-        
-        if user.role == "citizen":
-            query = query.filter(Petition.user_id == user_id)
-        
-        results = query.all()
+        identity = current_identity()
+        user_id = identity.user_id
+        
+        try:
+            end = _parse_date(request.args.get("end")) or datetime.utcnow().date()
+            start = _parse_date(request.args.get("start")) or \
+                end - timedelta(days=current_app.config["TRENDS_DEFAULT_DAYS"] - 1)
+            granularity = request.args.get("granularity", "day")
+            dimension = request.args.get("dimension") or None
+            
+            result = TrendService.get_series(
+                start,
+                end,
+                granularity=granularity,
+                dimension=dimension,
+                user_id=user_id if identity.role == "citizen" else None,
+                max_hourly_days=current_app.config["TRENDS_MAX_HOURLY_DAYS"]
+            )
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        
+        result.update({
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "granularity": granularity
+        })
+        if dimension:
+            result["dimension"] = dimension
+        
+        return jsonify(result), 200
         
-        trends = [
-            {
-                "date": str(date),
-                "count": count
-            }
-            for date, count in results
-        ]
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@analytics.route("/keywords", methods=["GET"])
+@jwt_required()
+@read_only
+@cached_response("petitions")
+def get_top_keywords():
+    """
+    Most frequent petition keywords over a date range
+
+    Query params:
+        start, end: ISO dates (inclusive); defaults to the last 7 days
+        limit: Number of keywords (default 20, at most 100)
+    """
+    try:
+        identity = current_identity()
+        
+        try:
+            end = _parse_date(request.args.get("end")) or datetime.utcnow().date()
+            start = _parse_date(request.args.get("start")) or end - timedelta(days=6)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        limit = min(request.args.get("limit", 20, type=int), 100)
+        
+        keywords = AnalysisService.top_keywords(
+            datetime.combine(start, datetime.min.time()),
+            datetime.combine(end + timedelta(days=1), datetime.min.time()),
+            limit=limit,
+            user_id=identity.user_id if identity.role == "citizen" else None
+        )
         
-        return jsonify({"trends": trends}), 200
+        return jsonify({
+            "start": start.isoformat(),
+            "end": end.isoformat(),
+            "keywords": keywords
+        }), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+def _parse_date(value):
+    """Parse an optional YYYY-MM-DD query parameter"""
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise ValueError(f"Invalid date '{value}', expected YYYY-MM-DD")
+
+
 @analytics.route("/priority-distribution", methods=["GET"])
 @jwt_required()
+@read_only
+@cached_response("petitions", "departments")
 def get_priority_distribution():
     """Get detailed priority distribution"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = current_identity()
+        user_id = identity.user_id
         
         query = db.session.query(
             Petition.priority,
@@ -134,7 +203,7 @@ def get_priority_distribution():
             func.count(Petition.id)
         ).group_by(Petition.priority, Petition.urgency_level)
         
-        if user.role == "citizen":
+        if identity.role == "citizen":
             query = query.filter(Petition.user_id == user_id)
         
         results = query.all()
@@ -156,15 +225,17 @@ def get_priority_distribution():
 
 @analytics.route("/sentiment-analysis", methods=["GET"])
 @jwt_required()
+@read_only
+@cached_response("petitions", "departments")
 def get_sentiment_analysis():
     """Get sentiment analysis statistics"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = current_identity()
+        user_id = identity.user_id
         
         query = Petition.query
         
-        if user.role == "citizen":
+        if identity.role == "citizen":
             query = query.filter_by(user_id=user_id)
         
         petitions = query.all()
@@ -195,3 +266,18 @@ def get_sentiment_analysis():
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@analytics.route("/cache-stats", methods=["GET"])
+@jwt_required()
+@roles_required("admin", message="Unauthorized. Admin access required")
+def get_cache_stats():
+    """Get analytics and tracking response cache metrics (admin only)"""
+    try:
+        return jsonify({
+            "cache": get_analytics_cache().stats(),
+            "track_cache": get_track_cache().stats()
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,8 +1,9 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.security import generate_password_hash, check_password_hash
 from app.extensions import db
 from app.models import User
+from app.services import roles_required, rate_limit, get_password_hasher, PasswordHasherBusy
+from app.services.identity import token_claims, load_user, invalidate_user
 
 auth = Blueprint("auth", __name__)
 
@@ -21,7 +22,10 @@ def register():
     if User.query.filter_by(email=email).first():
         return jsonify({"error": "Email already exists"}), 400
 
-    hashed_password = generate_password_hash(password, method='pbkdf2:sha256')
+    try:
+        hashed_password = get_password_hasher().hash(password)
+    except PasswordHasherBusy:
+        return _busy()
 
     user = User(name=name, email=email, password=hashed_password, phone=phone, role=role)
     db.session.add(user)
@@ -38,7 +42,22 @@ def register():
     }), 201
 
 
+def _busy():
+    response = jsonify({"error": "Server busy. Please try again shortly."})
+    response.status_code = 503
+    response.headers["Retry-After"] = "1"
+    return response
+
+
+def _login_email():
+    """Account being logged into, so guessing one password is limited across IPs"""
+    email = (request.get_json(silent=True) or {}).get("email")
+    return str(email).strip().lower() if email else None
+
+
 @auth.route("/login", methods=["POST"])
+@rate_limit("login", by="ip")
+@rate_limit("login_account", by=_login_email)
 def login():
     data = request.json
     email = data.get("email")
@@ -49,10 +68,19 @@ def login():
 
     user = User.query.filter_by(email=email).first()
 
-    if not user or not check_password_hash(user.password, password):
-        return jsonify({"error": "Invalid email or password"}), 401
+    hasher = get_password_hasher()
+    try:
+        if not user or not hasher.verify(user.password, password):
+            return jsonify({"error": "Invalid email or password"}), 401
 
-    token = create_access_token(identity=str(user.id))
+        # Upgrade hashes made with older parameters while we have the password
+        if hasher.needs_rehash(user.password):
+            user.password = hasher.hash(password)
+            db.session.commit()
+    except PasswordHasherBusy:
+        return _busy()
+
+    token = create_access_token(identity=str(user.id), additional_claims=token_claims(user))
 
     return jsonify({
         "message": "Login successful",
@@ -70,21 +98,48 @@ def login():
 @jwt_required()
 def get_profile():
     """Get current user profile"""
-    from flask_jwt_extended import get_jwt_identity
-    
     user_id = int(get_jwt_identity())
-    user = User.query.get(user_id)
+    user = load_user(user_id)
+    
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+    
+    return jsonify({
+        "user": {
+            "id": user["id"],
+            "name": user["name"],
+            "email": user["email"],
+            "phone": user["phone"],
+            "role": user["role"],
+            "created_at": user["created_at"].isoformat()
+        }
+    }), 200
+
+
+@auth.route("/users/<int:user_id>/role", methods=["PUT"])
+@jwt_required()
+@roles_required("admin", message="Unauthorized. Admin access required")
+def update_role(user_id):
+    """Change a user's role and revoke their existing tokens (admin only)"""
+    data = request.json
+    role = data.get("role")
+    
+    if role not in ["citizen", "officer", "admin"]:
+        return jsonify({"error": "Role must be citizen, officer or admin"}), 400
     
+    user = User.query.get(user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
     
+    user.role = role
+    user.token_version = (user.token_version or 0) + 1
+    db.session.commit()
+    invalidate_user(user_id)
+    
     return jsonify({
+        "message": "Role updated; the user must log in again",
         "user": {
             "id": user.id,
-            "name": user.name,
-            "email": user.email,
-            "phone": user.phone,
-            "role": user.role,
-            "created_at": user.created_at.isoformat()
+            "role": user.role
         }
     }), 200
@@ -1,27 +1,24 @@
 """Departments API endpoints"""
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, current_app
+from flask_jwt_extended import jwt_required
 from app.extensions import db
+from app.db_routing import read_only
 from app.models import Department, Petition, User
+from app.services import (
+    CacheVersions, department_directory, current_identity, roles_required, json_response, WorkQueue
+)
+from app.schemas import department_petition_schema, queue_item_schema
+from sqlalchemy import select
 
 departments = Blueprint("departments", __name__)
 
 
 @departments.route("/list", methods=["GET"])
+@read_only
 def list_departments():
     """List all departments (public endpoint)"""
     try:
-        depts = Department.query.all()
-        
-        result = [
-            {
-                "id": d.id,
-                "name": d.name,
-                "description": d.description,
-                "email": d.email
-            }
-            for d in depts
-        ]
+        result = [dict(d) for d in department_directory.all()]
         
         return jsonify({"departments": result}), 200
         
@@ -31,62 +28,118 @@ def list_departments():
 
 @departments.route("/<int:dept_id>/petitions", methods=["GET"])
 @jwt_required()
+@roles_required("officer", "admin")
 def get_department_petitions(dept_id):
     """Get all petitions for a specific department"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        
-        # Only officers and admins can view department petitions
-        if user.role not in ["officer", "admin"]:
-            return jsonify({"error": "Unauthorized"}), 403
-        
-        department = Department.query.get(dept_id)
+        department = department_directory.get(dept_id)
         if not department:
             return jsonify({"error": "Department not found"}), 404
         
         # Get petitions for this department
-        petitions = Petition.query.filter_by(department_id=dept_id)\
-            .order_by(Petition.created_at.desc()).all()
-        
-        result = [
-            {
-                "id": p.id,
-                "petition_id": p.petition_id,
-                "title": p.title,
-                "priority": p.priority,
-                "urgency_level": p.urgency_level,
-                "status": p.status,
-                "created_at": p.created_at.isoformat(),
-                "user": {
-                    "name": p.user.name,
-                    "email": p.user.email
-                }
-            }
-            for p in petitions
-        ]
-        
-        return jsonify({
-            "department": department.name,
+        rows = db.session.execute(
+            select(*department_petition_schema.columns)
+            .join(User, Petition.user_id == User.id)
+            .where(Petition.department_id == dept_id)
+            .order_by(Petition.created_at.desc())
+        ).all()
+        result = department_petition_schema.dump_many(rows)
+        
+        return json_response({
+            "department": department["name"],
             "petitions": result,
             "count": len(result)
-        }), 200
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@departments.route("/<int:dept_id>/queue", methods=["GET"])
+@jwt_required()
+@roles_required("officer", "admin")
+@read_only
+def get_queue(dept_id):
+    """Next unclaimed petitions in queue order, plus the caller's own claims"""
+    try:
+        identity = current_identity()
+        if not department_directory.get(dept_id):
+            return jsonify({"error": "Department not found"}), 404
+        limit = min(request.args.get("limit", 20, type=int), 100)
+        
+        upcoming = db.session.execute(WorkQueue.peek(queue_item_schema.columns, dept_id, limit)).all()
+        claimed = db.session.execute(
+            select(*queue_item_schema.columns)
+            .where(Petition.department_id == dept_id, Petition.claimed_by == identity.user_id)
+            .order_by(Petition.queue_score)
+        ).all()
+        
+        return json_response({
+            "upcoming": queue_item_schema.dump_many(upcoming),
+            "claimed": queue_item_schema.dump_many(claimed)
+        })
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@departments.route("/<int:dept_id>/queue/claim", methods=["POST"])
+@jwt_required()
+@roles_required("officer", "admin")
+def claim_from_queue(dept_id):
+    """Claim the next ``count`` unclaimed petitions (default 1)"""
+    try:
+        identity = current_identity()
+        if not department_directory.get(dept_id):
+            return jsonify({"error": "Department not found"}), 404
+        
+        count = (request.get_json(silent=True) or {}).get("count", 1)
+        if not isinstance(count, int) or not 1 <= count <= current_app.config["QUEUE_MAX_CLAIM"]:
+            return jsonify({"error": f"count must be between 1 and {current_app.config['QUEUE_MAX_CLAIM']}"}), 400
+        
+        ids = WorkQueue.claim(dept_id, identity.user_id, count)
+        rows = db.session.execute(
+            select(*queue_item_schema.columns).where(Petition.id.in_(ids)).order_by(Petition.queue_score)
+        ).all() if ids else []
+        
+        return json_response({"claimed": queue_item_schema.dump_many(rows), "count": len(rows)})
         
     except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@departments.route("/<int:dept_id>/queue/release", methods=["POST"])
+@jwt_required()
+@roles_required("officer", "admin")
+def release_to_queue(dept_id):
+    """Return claimed petitions to the queue (officers release their own; admins any)"""
+    try:
+        identity = current_identity()
+        
+        petition_ids = (request.get_json(silent=True) or {}).get("petition_ids")
+        if not isinstance(petition_ids, list) or not all(isinstance(i, int) for i in petition_ids):
+            return jsonify({"error": "petition_ids must be a list of ids"}), 400
+        
+        released = WorkQueue.release(
+            petition_ids,
+            department_id=dept_id,
+            officer_id=None if identity.role == "admin" else identity.user_id
+        )
+        
+        return jsonify({"released": released}), 200
+        
+    except Exception as e:
+        db.session.rollback()
         return jsonify({"error": str(e)}), 500
 
 
 @departments.route("/create", methods=["POST"])
 @jwt_required()
+@roles_required("admin", message="Unauthorized. Admin access required")
 def create_department():
     """Create a new department (admin only)"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        
-        if user.role != "admin":
-            return jsonify({"error": "Unauthorized. Admin access required"}), 403
-        
         data = request.json
         name = data.get("name")
         description = data.get("description", "")
@@ -107,7 +160,9 @@ def create_department():
         )
         
         db.session.add(department)
+        CacheVersions.bump("departments")
         db.session.commit()
+        department_directory.invalidate()
         
         return jsonify({
             "message": "Department created successfully",
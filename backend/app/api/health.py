@@ -0,0 +1,51 @@
+"""Health and runtime metrics endpoints"""
+from flask import Blueprint, jsonify, current_app
+from sqlalchemy import text
+from app.extensions import db
+from app.db_routing import routing_stats
+from app.services import is_warmed_up
+
+health = Blueprint("health", __name__)
+
+
+def _pool_stats(engine):
+    """Utilization of one engine's connection pool"""
+    pool = engine.pool
+    stats = {"pool": type(pool).__name__}
+    for name in ("size", "checkedin", "checkedout", "overflow"):
+        method = getattr(pool, name, None)
+        if callable(method):
+            stats[name] = method()
+    return stats
+
+
+@health.route("/live", methods=["GET"])
+def live():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({"status": "alive"}), 200
+
+
+@health.route("/ready", methods=["GET"])
+def ready():
+    """Readiness probe: models are warmed up and the database answers"""
+    checks = {"warmup": is_warmed_up(current_app)}
+    try:
+        db.session.execute(text("SELECT 1"))
+        checks["database"] = True
+    except Exception:
+        db.session.rollback()
+        checks["database"] = False
+    
+    is_ready = all(checks.values())
+    return jsonify({"status": "ready" if is_ready else "not ready", "checks": checks}), 200 if is_ready else 503
+
+
+@health.route("/pool", methods=["GET"])
+def pool_metrics():
+    """Connection pool usage per database and read/write routing counts"""
+    try:
+        engines = {key or "primary": _pool_stats(engine) for key, engine in db.engines.items()}
+        return jsonify({"engines": engines, **routing_stats.snapshot()}), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
@@ -1,33 +1,43 @@
 """Notifications API endpoints"""
-from flask import Blueprint, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.services import NotificationService
+import json
+from flask import Blueprint, Response, request, jsonify, current_app
+from flask_jwt_extended import jwt_required, get_jwt_identity, verify_jwt_in_request
+from app.extensions import db
+from app.services import NotificationService, event_bus, department_directory, roles_required, json_response
+from app.services.notification_service import SELECTOR_KEYS
+from app.services.identity import issue_stream_ticket, redeem_stream_ticket
+from app.schemas import notification_schema
 
 notifications = Blueprint("notifications", __name__)
 
 
+def _page_args():
+    """Read ``limit`` and ``before`` (cursor) query params"""
+    limit = request.args.get("limit", current_app.config["NOTIFICATIONS_PAGE_SIZE"], type=int)
+    limit = max(1, min(limit, current_app.config["NOTIFICATIONS_MAX_PAGE_SIZE"]))
+    before_id = request.args.get("before", type=int)
+    return limit, before_id
+
+
+def _next_cursor(page, limit):
+    """Cursor for the following page, or None on the last page"""
+    return page[-1].id if len(page) == limit else None
+
+
 @notifications.route("/list", methods=["GET"])
 @jwt_required()
 def get_notifications():
-    """Get user notifications"""
+    """Get user notifications, newest first (paginated with ?limit=&before=)"""
     try:
         user_id = int(get_jwt_identity())
+        limit, before_id = _page_args()
         
-        # Get all notifications
-        all_notifications = NotificationService.get_user_notifications(user_id)
-        
-        result = [
-            {
-                "id": n.id,
-                "message": n.message,
-                "read_status": n.read_status,
-                "created_at": n.created_at.isoformat(),
-                "petition_id": n.petition_id
-            }
-            for n in all_notifications
-        ]
+        page = NotificationService.get_user_notifications(
+            user_id, limit=limit, before_id=before_id, columns=notification_schema.columns
+        )
         
-        return jsonify({"notifications": result}), 200
+        result = notification_schema.dump_many(page)
+        return json_response({"notifications": result, "next_cursor": _next_cursor(page, limit)})
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -36,11 +46,14 @@ def get_notifications():
 @notifications.route("/unread", methods=["GET"])
 @jwt_required()
 def get_unread_notifications():
-    """Get unread notifications"""
+    """Get unread notifications (paginated) and the total unread count"""
     try:
         user_id = int(get_jwt_identity())
+        limit, before_id = _page_args()
         
-        unread = NotificationService.get_user_notifications(user_id, unread_only=True)
+        page = NotificationService.get_user_notifications(
+            user_id, unread_only=True, limit=limit, before_id=before_id
+        )
         
         result = [
             {
@@ -49,10 +62,26 @@ def get_unread_notifications():
                 "created_at": n.created_at.isoformat(),
                 "petition_id": n.petition_id
             }
-            for n in unread
+            for n in page
         ]
         
-        return jsonify({"notifications": result, "count": len(result)}), 200
+        return jsonify({
+            "notifications": result,
+            "count": NotificationService.get_unread_count(user_id),
+            "next_cursor": _next_cursor(page, limit)
+        }), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@notifications.route("/unread/count", methods=["GET"])
+@jwt_required()
+def get_unread_count():
+    """Get the unread badge count"""
+    try:
+        user_id = int(get_jwt_identity())
+        return jsonify({"count": NotificationService.get_unread_count(user_id)}), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -63,7 +92,8 @@ def get_unread_notifications():
 def mark_notification_read(notification_id):
     """Mark notification as read"""
     try:
-        notification = NotificationService.mark_as_read(notification_id)
+        user_id = int(get_jwt_identity())
+        notification = NotificationService.mark_as_read(notification_id, user_id=user_id)
         
         if not notification:
             return jsonify({"error": "Notification not found"}), 404
@@ -74,6 +104,25 @@ def mark_notification_read(notification_id):
         return jsonify({"error": str(e)}), 500
 
 
+@notifications.route("/mark-read", methods=["PUT"])
+@jwt_required()
+def mark_notifications_read():
+    """Mark a list of notifications as read ({"ids": [...]})"""
+    try:
+        user_id = int(get_jwt_identity())
+        ids = (request.json or {}).get("ids") or []
+        
+        if not isinstance(ids, list) or not all(isinstance(i, int) for i in ids):
+            return jsonify({"error": "ids must be a list of notification ids"}), 400
+        
+        updated = NotificationService.mark_many_as_read(user_id, ids)
+        
+        return jsonify({"message": "Notifications marked as read", "updated": updated}), 200
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @notifications.route("/mark-all-read", methods=["PUT"])
 @jwt_required()
 def mark_all_read():
@@ -86,3 +135,128 @@ def mark_all_read():
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
+
+
+@notifications.route("/broadcast", methods=["POST"])
+@jwt_required()
+@roles_required("officer", "admin", message="Unauthorized. Only officers can broadcast")
+def broadcast():
+    """
+    Send one message to many users (officers/admin only)
+    
+    Body: {"message": ..., plus any of "department" (name), "department_id",
+    "category", "status", "petition_ids", "user_ids", "all_users": true}
+    """
+    try:
+        data = request.json or {}
+        message = data.get("message")
+        if not message:
+            return jsonify({"error": "Message is required"}), 400
+        
+        selector = {key: data.get(key) for key in SELECTOR_KEYS if data.get(key) is not None}
+        if data.get("department"):
+            department_id = department_directory.get_id(data["department"])
+            if department_id is None:
+                return jsonify({"error": "Department not found"}), 404
+            selector["department_id"] = department_id
+        
+        batches = []
+        sent = NotificationService.fan_out(
+            message,
+            selector,
+            batch_size=current_app.config["NOTIFICATION_FANOUT_BATCH_SIZE"],
+            progress=batches.append
+        )
+        
+        return jsonify({
+            "message": "Broadcast sent",
+            "recipients": sent,
+            "batches": len(batches)
+        }), 200
+        
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@notifications.route("/stream-ticket", methods=["POST"])
+@jwt_required()
+def create_stream_ticket():
+    """One-time ticket for opening /stream from EventSource (which can't send headers)"""
+    try:
+        ticket = issue_stream_ticket(int(get_jwt_identity()))
+        return jsonify({
+            "ticket": ticket,
+            "expires_in": current_app.config["STREAM_TICKET_TTL_SECONDS"]
+        }), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"error": str(e)}), 500
+
+
+@notifications.route("/stream", methods=["GET"])
+def stream_events():
+    """
+    Server-Sent Events stream of the caller's notifications and status changes
+    
+    Authenticate with an Authorization header or, from EventSource, with
+    ?ticket= from POST /stream-ticket; a ticket opens one stream only, so
+    access logs never hold a reusable credential. Reconnecting clients
+    resume from Last-Event-ID (or ?last_event_id=).
+    """
+    try:
+        ticket = request.args.get("ticket")
+        if ticket:
+            user_id = redeem_stream_ticket(ticket)
+            if user_id is None:
+                return jsonify({"msg": "Invalid or expired stream ticket"}), 401
+        else:
+            verify_jwt_in_request()
+            user_id = int(get_jwt_identity())
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({"msg": str(e)}), 401
+    
+    if event_bus.connection_count() >= current_app.config["SSE_MAX_CONNECTIONS"]:
+        return jsonify({"error": "Too many open event streams, retry later"}), 503
+    
+    last_event_id = request.headers.get("Last-Event-ID") or request.args.get("last_event_id")
+    try:
+        last_event_id = int(last_event_id) if last_event_id else None
+    except ValueError:
+        last_event_id = None
+    
+    heartbeat = current_app.config["SSE_HEARTBEAT_SECONDS"]
+    # Subscribe before replaying so nothing published in between is lost
+    subscription = event_bus.subscribe(user_id)
+    
+    def generate():
+        # Runs after the request context is gone and holds no DB connection,
+        # but occupies a worker thread (a greenlet on the SSE server) while open
+        try:
+            yield f"retry: {int(heartbeat * 1000)}\n\n"
+            seen = 0
+            if last_event_id is not None:
+                for evt in event_bus.replay(user_id, last_event_id):
+                    seen = evt["id"]
+                    yield _format_event(evt)
+            while True:
+                evt = subscription.get(timeout=heartbeat)
+                if evt is None:
+                    yield ": heartbeat\n\n"
+                elif evt["id"] > seen:
+                    yield _format_event(evt)
+        finally:
+            event_bus.unsubscribe(subscription)
+    
+    return Response(generate(), mimetype="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no"
+    })
+
+
+def _format_event(evt):
+    """Encode one event in text/event-stream framing"""
+    return f"id: {evt['id']}\nevent: {evt['type']}\ndata: {json.dumps(evt['data'])}\n\n"
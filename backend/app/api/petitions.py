@@ -1,28 +1,79 @@
 """Petitions API endpoints"""
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app, send_file, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.extensions import db
-from app.models import Petition, PetitionStatus, User, Department
-from app.services import PetitionProcessor, NotificationService
-from datetime import datetime
+from app.db_routing import read_only
+from app.models import Petition, PetitionStatus, PetitionEntity, PetitionKeyword
+from app.services import (
+    get_processor, NotificationService, TrendService, CacheVersions, AttachmentService,
+    department_directory, current_identity, roles_required, publish_after_commit, streams_attachments,
+    upload_limit, start_import_job, read_import_state, detect_format, PetitionExporter, apply_petition_filters,
+    json_response, AnalysisService, WorkQueue, queue_score, SLAService, sla_due_at, rate_limit,
+    get_track_cache, invalidate_tracking
+)
+from app.schemas import petition_list_schema
+from datetime import datetime, timedelta
+from sqlalchemy import select
+import mimetypes
 import os
+import re
+import uuid
+from werkzeug.exceptions import RequestEntityTooLarge
 from werkzeug.utils import secure_filename
 
 petitions = Blueprint("petitions", __name__)
 
-# Initialize petition processor
-processor = PetitionProcessor()
-
 # File upload configuration
-UPLOAD_FOLDER = 'uploads'
 ALLOWED_EXTENSIONS = {'pdf', 'jpg', 'jpeg', 'png', 'doc', 'docx'}
 
 def allowed_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
 
 
+def list_filters(identity):
+    """Petition list filters from the query string, scoped to the caller"""
+    return {
+        "user_id": identity.user_id if identity.role == "citizen" else None,
+        "status": request.args.get("status"),
+        "priority": request.args.get("priority"),
+        "department": request.args.get("department")
+    }
+
+
+def can_view(identity, petition):
+    """Citizens only see their own petitions; staff see all"""
+    return identity.role != "citizen" or petition.user_id == identity.user_id
+
+
+def analysis_detail(petition):
+    """Stored AI analysis of a petition, or None for petitions filed before it was kept"""
+    analysis = petition.analysis
+    if analysis is None:
+        return None
+    entities = {}
+    for entity in PetitionEntity.query.filter_by(petition_id=petition.id).order_by(PetitionEntity.id):
+        entities.setdefault(entity.entity_type, []).append(entity.value)
+    keywords = db.session.execute(
+        select(PetitionKeyword.keyword).where(PetitionKeyword.petition_id == petition.id).order_by(PetitionKeyword.rank)
+    ).scalars().all()
+    return {
+        "confidence": analysis.confidence,
+        "class_probabilities": analysis.class_probabilities,
+        "priority_score": analysis.priority_score,
+        "sentiment": analysis.sentiment_polarity,
+        "urgency_keywords": analysis.urgency_keywords,
+        "summary": analysis.summary,
+        "entity_summary": analysis.entity_summary,
+        "degraded_stages": analysis.degraded_stages,
+        "entities": entities,
+        "keywords": keywords
+    }
+
+
 @petitions.route("/submit", methods=["POST"])
 @jwt_required()
+@rate_limit("submit", by="user")
+@streams_attachments
 def submit_petition():
     """Submit a new petition with AI processing"""
     try:
@@ -35,26 +86,31 @@ def submit_petition():
         if not title or not description:
             return jsonify({"error": "Title and description are required"}), 400
         
-        # Process petition through AI/NLP pipeline
-        ai_analysis = processor.process_petition(title, description)
+        # Process petition through AI/NLP pipeline; entity stages that don't
+        # fit the budget are completed later by the scheduler
+        processor = get_processor()
+        ai_analysis = processor.process_petition(
+            title,
+            description,
+            time_budget=current_app.config["NLP_TIME_BUDGET_MS"] / 1000,
+            max_chars=current_app.config["NLP_MAX_ENTITY_CHARS"]
+        )
         
         # Get department ID
-        department_id = processor.get_department_id(ai_analysis["classification"]["category"], db.session)
+        department_id = processor.get_department_id(ai_analysis["classification"]["category"])
         
         # Generate unique petition ID
         petition_id = processor.generate_petition_id()
         
-        # Handle file upload if present
-        attachment_path = None
+        # Handle file upload if present; the parser already streamed it to
+        # the attachment store's temp directory while hashing it
+        attachment = None
+        attachment_name = None
         if 'attachment' in request.files:
             file = request.files['attachment']
             if file and file.filename and allowed_file(file.filename):
-                filename = secure_filename(file.filename)
-                # Create uploads directory if it doesn't exist
-                os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-                filepath = os.path.join(UPLOAD_FOLDER, f"{petition_id}_{filename}")
-                file.save(filepath)
-                attachment_path = filepath
+                attachment_name = secure_filename(file.filename)
+                attachment = AttachmentService.store_upload(file)
         
         # Create petition record
         petition = Petition(
@@ -68,11 +124,22 @@ def submit_petition():
             sentiment_score=ai_analysis["sentiment"]["compound"],
             urgency_level=ai_analysis["urgency"]["level"],
             status="submitted",
-            attachment_path=attachment_path
+            queue_score=queue_score(
+                ai_analysis["priority"]["level"],
+                ai_analysis["urgency"]["level"],
+                ai_analysis["sentiment"]["compound"],
+                datetime.utcnow()
+            ),
+            sla_due_at=sla_due_at(ai_analysis["classification"]["category"]),
+            attachment=attachment,
+            attachment_name=attachment_name,
+            attachment_path=os.path.join(current_app.config["ATTACHMENT_ROOT"], attachment.path) if attachment else None
         )
         
         db.session.add(petition)
-        db.session.commit()
+        # Flush (not commit) so the history and notification rows can
+        # reference petition.id; everything below commits as one transaction
+        db.session.flush()
         
         # Create initial status entry
         status_entry = PetitionStatus(
@@ -82,10 +149,20 @@ def submit_petition():
             updated_by=user_id
         )
         db.session.add(status_entry)
-        db.session.commit()
         
         # Send notification
-        NotificationService.notify_petition_submitted(user_id, petition.id, title)
+        NotificationService.notify_petition_submitted(user_id, petition.id, title, commit=False)
+        
+        # Keep the full analysis (probabilities, entities, keywords) so
+        # later features don't have to re-run the pipeline
+        AnalysisService.record(petition, ai_analysis)
+        
+        TrendService.record_petition_created(
+            petition,
+            department_name=department_directory.name_for(department_id)
+        )
+        CacheVersions.bump("petitions")
+        db.session.commit()
         
         return jsonify({
             "message": "Petition submitted successfully",
@@ -96,10 +173,14 @@ def submit_petition():
                 "priority": ai_analysis["priority"]["level"],
                 "urgency": ai_analysis["urgency"]["level"],
                 "sentiment": ai_analysis["sentiment"]["polarity"],
-                "keywords": ai_analysis["keywords"]
+                "keywords": ai_analysis["keywords"],
+                "degraded_stages": ai_analysis["degraded_stages"]
             }
         }), 201
         
+    except RequestEntityTooLarge as e:
+        db.session.rollback()
+        return jsonify({"error": e.description}), 413
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": str(e)}), 500
@@ -107,74 +188,132 @@ def submit_petition():
 
 @petitions.route("/list", methods=["GET"])
 @jwt_required()
+@read_only
 def list_petitions():
     """List petitions with filters"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = current_identity()
         
-        # Build query
-        query = Petition.query
+        # Build query (citizens only see their own petitions)
+        query = apply_petition_filters(
+            Petition.query.with_entities(*petition_list_schema.columns), **list_filters(identity)
+        )
         
-        # Filter by user for citizens
-        if user.role == "citizen":
-            query = query.filter_by(user_id=user_id)
+        # Order by created date
+        rows = query.order_by(Petition.created_at.desc()).all()
         
-        # Apply filters
-        status_filter = request.args.get("status")
-        if status_filter:
-            query = query.filter_by(status=status_filter)
+        result = petition_list_schema.dump_many(rows)
+        return json_response({"petitions": result, "count": len(result)})
         
-        priority_filter = request.args.get("priority")
-        if priority_filter:
-            query = query.filter_by(priority=priority_filter)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@petitions.route("/export", methods=["GET"])
+@jwt_required()
+def export_petitions():
+    """Stream petitions as CSV or NDJSON (same scope and filters as /list)"""
+    try:
+        identity = current_identity()
         
-        department_filter = request.args.get("department")
-        if department_filter:
-            dept = Department.query.filter_by(name=department_filter).first()
-            if dept:
-                query = query.filter_by(department_id=dept.id)
+        fmt = request.args.get("format", "csv")
+        if fmt not in ("csv", "ndjson"):
+            return jsonify({"error": "format must be csv or ndjson"}), 400
+        compress = request.args.get("gzip", "false").lower() == "true"
         
-        # Order by created date
-        petitions_list = query.order_by(Petition.created_at.desc()).all()
-        
-        # Format response
-        result = []
-        for p in petitions_list:
-            result.append({
-                "id": p.id,
-                "petition_id": p.petition_id,
-                "title": p.title,
-                "description": p.description[:200] + "..." if len(p.description) > 200 else p.description,
-                "category": p.category,
-                "department": p.department.name if p.department else None,
-                "priority": p.priority,
-                "urgency_level": p.urgency_level,
-                "status": p.status,
-                "created_at": p.created_at.isoformat(),
-                "updated_at": p.updated_at.isoformat()
-            })
-        
-        return jsonify({"petitions": result, "count": len(result)}), 200
+        chunks = PetitionExporter.stream(
+            fmt, compress, current_app.config["EXPORT_BATCH_SIZE"], **list_filters(identity)
+        )
+        filename = f"petitions.{fmt}" + (".gz" if compress else "")
+        mimetype = "application/gzip" if compress else ("text/csv" if fmt == "csv" else "application/x-ndjson")
+        return current_app.response_class(
+            stream_with_context(chunks),
+            mimetype=mimetype,
+            headers={
+                "Content-Disposition": f'attachment; filename="{filename}"',
+                "Cache-Control": "no-store",
+                "X-Accel-Buffering": "no"
+            }
+        )
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@petitions.route("/mentions", methods=["GET"])
+@jwt_required()
+@read_only
+def petitions_mentioning():
+    """
+    Petitions whose analysis mentions an entity
+
+    Query params:
+        type: location, person, organization, date, phone or email
+        value: Entity value (case-insensitive)
+        limit: Maximum petitions to return (default 100, at most 500)
+    """
+    try:
+        identity = current_identity()
+
+        entity_type = request.args.get("type")
+        value = request.args.get("value")
+        if not entity_type or not value:
+            return jsonify({"error": "type and value are required"}), 400
+        limit = min(request.args.get("limit", 100, type=int), 500)
+
+        query = apply_petition_filters(select(*petition_list_schema.columns), **list_filters(identity))
+        query = AnalysisService.mentioning(query, entity_type, value)
+        rows = db.session.execute(query.order_by(Petition.created_at.desc()).limit(limit)).all()
+
+        result = petition_list_schema.dump_many(rows)
+        return json_response({"petitions": result, "count": len(result)})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@petitions.route("/keywords/<keyword>", methods=["GET"])
+@jwt_required()
+@read_only
+def petitions_with_keyword(keyword):
+    """
+    Petitions tagged with a keyword, filed within the last ``days`` days
+
+    Query params:
+        days: Window length (default 7)
+        limit: Maximum petitions to return (default 100, at most 500)
+    """
+    try:
+        identity = current_identity()
+
+        days = request.args.get("days", 7, type=int)
+        limit = min(request.args.get("limit", 100, type=int), 500)
+        since = datetime.utcnow() - timedelta(days=days)
+
+        query = apply_petition_filters(select(*petition_list_schema.columns), **list_filters(identity))
+        query = AnalysisService.with_keyword(query, keyword, since=since)
+        rows = db.session.execute(query.order_by(Petition.created_at.desc()).limit(limit)).all()
+
+        result = petition_list_schema.dump_many(rows)
+        return json_response({"petitions": result, "count": len(result), "keyword": keyword, "days": days})
+
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @petitions.route("/<int:petition_id>", methods=["GET"])
 @jwt_required()
 def get_petition(petition_id):
     """Get detailed petition information"""
     try:
-        user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
+        identity = current_identity()
         
         petition = Petition.query.get(petition_id)
         if not petition:
             return jsonify({"error": "Petition not found"}), 404
         
         # Check access rights
-        if user.role == "citizen" and petition.user_id != user_id:
+        if not can_view(identity, petition):
             return jsonify({"error": "Unauthorized access"}), 403
         
         # Get status history
@@ -188,7 +327,7 @@ def get_petition(petition_id):
                 "title": petition.title,
                 "description": petition.description,
                 "category": petition.category,
-                "department": petition.department.name if petition.department else None,
+                "department": department_directory.name_for(petition.department_id),
                 "priority": petition.priority,
                 "urgency_level": petition.urgency_level,
                 "sentiment_score": petition.sentiment_score,
@@ -198,6 +337,7 @@ def get_petition(petition_id):
                 "resolved_at": petition.resolved_at.isoformat() if petition.resolved_at else None,
                 "resolution_comment": petition.resolution_comment,
                 "attachment_path": petition.attachment_path,
+                "attachment_url": f"/petitions/{petition.id}/attachment" if petition.attachment_path else None,
                 "user": {
                     "name": petition.user.name,
                     "email": petition.user.email
@@ -211,24 +351,86 @@ def get_petition(petition_id):
                     "updated_by": s.updater.name if s.updater else "System"
                 }
                 for s in status_history
-            ]
+            ],
+            "analysis": analysis_detail(petition)
         }), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 
+@petitions.route("/<int:petition_id>/attachment", methods=["GET"])
+@jwt_required()
+def get_attachment(petition_id):
+    """Download a petition's attachment (Range and conditional GETs supported)"""
+    try:
+        identity = current_identity()
+        
+        petition = Petition.query.get(petition_id)
+        if not petition:
+            return jsonify({"error": "Petition not found"}), 404
+        
+        if not can_view(identity, petition):
+            return jsonify({"error": "Unauthorized access"}), 403
+        
+        root = current_app.config["ATTACHMENT_ROOT"]
+        attachment = petition.attachment
+        if attachment is not None:
+            relative = attachment.path
+            mimetype = attachment.content_type
+            etag = attachment.sha256
+        elif petition.attachment_path:
+            # Uploads saved before the content-addressed store
+            relative = os.path.relpath(petition.attachment_path, root)
+            mimetype = None
+            etag = True
+        else:
+            return jsonify({"error": "Petition has no attachment"}), 404
+        
+        if relative.startswith(".."):
+            return jsonify({"error": "Attachment not found"}), 404
+        path = os.path.abspath(os.path.join(root, relative))
+        if not os.path.isfile(path):
+            return jsonify({"error": "Attachment not found"}), 404
+        download_name = petition.attachment_name or os.path.basename(path)
+        
+        # Let the front proxy (nginx internal location) stream the file
+        accel_prefix = current_app.config["ATTACHMENT_ACCEL_REDIRECT_PREFIX"]
+        if accel_prefix:
+            response = current_app.response_class(
+                mimetype=mimetype or mimetypes.guess_type(download_name)[0] or "application/octet-stream"
+            )
+            response.headers["X-Accel-Redirect"] = accel_prefix.rstrip("/") + "/" + relative.replace(os.sep, "/")
+            response.headers["Content-Disposition"] = f'attachment; filename="{download_name}"'
+            if etag is not True:
+                response.set_etag(etag, weak=True)
+            return response
+        
+        # send_file hands the open file to the server's file wrapper
+        # (sendfile) and answers Range / If-None-Match / If-Modified-Since
+        response = send_file(
+            path,
+            mimetype=mimetype,
+            as_attachment=True,
+            download_name=download_name,
+            conditional=True,
+            etag=etag,
+            max_age=0
+        )
+        response.headers["Cache-Control"] = "private, no-cache"
+        return response
+        
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
 @petitions.route("/<int:petition_id>/status", methods=["PUT"])
 @jwt_required()
+@roles_required("officer", "admin", message="Unauthorized. Only officers can update status")
 def update_status(petition_id):
     """Update petition status (officers/admin only)"""
     try:
         user_id = int(get_jwt_identity())
-        user = User.query.get(user_id)
-        
-        # Check if user is officer or admin
-        if user.role not in ["officer", "admin"]:
-            return jsonify({"error": "Unauthorized. Only officers can update status"}), 403
         
         petition = Petition.query.get(petition_id)
         if not petition:
@@ -250,6 +452,11 @@ def update_status(petition_id):
             petition.resolved_at = datetime.utcnow()
             petition.resolution_comment = comment
         
+        # Resolved/rejected petitions leave the officer work queue, and
+        # anything past in_review stops its SLA clock
+        WorkQueue.sync(petition)
+        SLAService.sync(petition)
+        
         # Create status history entry
         status_entry = PetitionStatus(
             petition_id=petition.id,
@@ -258,13 +465,23 @@ def update_status(petition_id):
             updated_by=user_id
         )
         db.session.add(status_entry)
-        db.session.commit()
         
         # Send notification to user
         if new_status == "resolved":
-            NotificationService.notify_resolution(petition.user_id, petition.id, comment)
+            NotificationService.notify_resolution(petition.user_id, petition.id, comment, commit=False)
         else:
-            NotificationService.notify_status_update(petition.user_id, petition.id, new_status, comment)
+            NotificationService.notify_status_update(petition.user_id, petition.id, new_status, comment, commit=False)
+        
+        publish_after_commit(petition.user_id, "status", {
+            "id": petition.id,
+            "petition_id": petition.petition_id,
+            "status": new_status,
+            "comment": comment
+        })
+        TrendService.record_status_change(new_status)
+        CacheVersions.bump("petitions")
+        invalidate_tracking([petition.petition_id])
+        db.session.commit()
         
         return jsonify({
             "message": "Status updated successfully",
@@ -278,34 +495,113 @@ def update_status(petition_id):
 
 
 @petitions.route("/track/<petition_id_str>", methods=["GET"])
+@rate_limit("track", by="ip")
 def track_petition(petition_id_str):
     """Track petition by petition ID (public endpoint)"""
     try:
-        petition = Petition.query.filter_by(petition_id=petition_id_str).first()
-        if not petition:
-            return jsonify({"error": "Petition not found"}), 404
+        # Served from the tracking cache; the database is only read on a
+        # miss, and from the primary: a miss often follows an invalidation,
+        # and a lagging replica's answer would be cached for the whole TTL
+        cache = get_track_cache()
+        entry = cache.get(petition_id_str)
+        if entry is None:
+            generation = cache.generation()
+            payload = _tracking_payload(petition_id_str)
+            if payload is None:
+                return jsonify({"error": "Petition not found"}), 404
+            entry = (payload, cache.put(petition_id_str, payload, generation))
+        
+        payload, etag = entry
+        response = json_response(payload)
+        response.set_etag(etag, weak=True)
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config["TRACK_CACHE_MAX_AGE"]
+        return response.make_conditional(request)
         
-        # Get status history
-        status_history = PetitionStatus.query.filter_by(petition_id=petition.id)\
-            .order_by(PetitionStatus.timestamp.asc()).all()
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+def _tracking_payload(petition_id_str):
+    """Public tracking view of a petition, or None if there is no such petition"""
+    petition = Petition.query.filter_by(petition_id=petition_id_str).first()
+    if not petition:
+        return None
+    
+    # Get status history
+    status_history = PetitionStatus.query.filter_by(petition_id=petition.id)\
+        .order_by(PetitionStatus.timestamp.asc()).all()
+    
+    return {
+        "petition_id": petition.petition_id,
+        "title": petition.title,
+        "category": petition.category,
+        "department": department_directory.name_for(petition.department_id),
+        "priority": petition.priority,
+        "status": petition.status,
+        "created_at": petition.created_at.isoformat(),
+        "status_timeline": [
+            {
+                "status": s.status,
+                "comment": s.comment,
+                "timestamp": s.timestamp.isoformat()
+            }
+            for s in status_history
+        ]
+    }
+
+
+@petitions.route("/import", methods=["POST"])
+@jwt_required()
+@roles_required("admin", message="Unauthorized. Only admins can import petitions")
+@upload_limit("IMPORT_MAX_BYTES")
+def import_petitions():
+    """Start a bulk import of a CSV or JSONL file (admin only)"""
+    try:
+        file = request.files.get("file")
+        if not file or not file.filename:
+            return jsonify({"error": "A CSV or JSONL file is required"}), 400
+        
+        fmt = request.form.get("format") or detect_format(file.filename)
+        if fmt not in ("csv", "jsonl"):
+            return jsonify({"error": "format must be csv or jsonl"}), 400
+        
+        job_dir = current_app.config["IMPORT_DIR"]
+        os.makedirs(job_dir, exist_ok=True)
+        job_id = uuid.uuid4().hex
+        source_path = os.path.join(job_dir, f"{job_id}.{fmt}")
+        file.save(source_path)
+        
+        start_import_job(
+            current_app._get_current_object(), source_path, fmt, job_id,
+            batch_size=request.form.get("batch_size", current_app.config["IMPORT_BATCH_SIZE"], type=int),
+            workers=current_app.config["IMPORT_WORKERS"],
+            notify=request.form.get("notify", "false").lower() == "true"
+        )
         
-        return jsonify({
-            "petition_id": petition.petition_id,
-            "title": petition.title,
-            "category": petition.category,
-            "department": petition.department.name if petition.department else None,
-            "priority": petition.priority,
-            "status": petition.status,
-            "created_at": petition.created_at.isoformat(),
-            "status_timeline": [
-                {
-                    "status": s.status,
-                    "comment": s.comment,
-                    "timestamp": s.timestamp.isoformat()
-                }
-                for s in status_history
-            ]
-        }), 200
+        return jsonify({"message": "Import started", "job_id": job_id}), 202
+        
+    except RequestEntityTooLarge as e:
+        return jsonify({"error": e.description}), 413
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+
+@petitions.route("/import/<job_id>", methods=["GET"])
+@jwt_required()
+@roles_required("admin", message="Unauthorized. Only admins can import petitions")
+def import_status(job_id):
+    """Progress and the first row errors of an import job"""
+    try:
+        if not re.fullmatch(r"[0-9a-f]{32}", job_id):
+            return jsonify({"error": "Import job not found"}), 404
+        
+        limit = min(request.args.get("errors", 100, type=int), 1000)
+        state = read_import_state(job_id, errors=limit)
+        if state is None:
+            return jsonify({"error": "Import job not found"}), 404
+        
+        return jsonify({"job_id": job_id, **state}), 200
         
     except Exception as e:
         return jsonify({"error": str(e)}), 500
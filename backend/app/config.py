@@ -1,4 +1,5 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -7,9 +8,178 @@ class Config:
     SECRET_KEY = os.getenv("SECRET_KEY", "supersecretkey")
     JWT_SECRET_KEY = os.getenv("JWT_SECRET_KEY", "jwt-supersecretkey")
 
-    SQLALCHEMY_DATABASE_URI = (
+    SQLALCHEMY_DATABASE_URI = os.getenv("DATABASE_URL") or (
         f"mysql+pymysql://{os.getenv('DB_USER')}:{os.getenv('DB_PASS')}"
         f"@{os.getenv('DB_HOST')}:{os.getenv('DB_PORT')}/{os.getenv('DB_NAME')}"
     )
 
+    # Connection pool (used for the primary and the replica)
+    SQLALCHEMY_ENGINE_OPTIONS = {
+        "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+        "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+        "pool_timeout": float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+        "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() == "true",
+    }
+
+    # Optional read replica; @read_only views send their SELECTs there
+    DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL")
+    SQLALCHEMY_BINDS = (
+        {"replica": {"url": DATABASE_REPLICA_URL, **SQLALCHEMY_ENGINE_OPTIONS}} if DATABASE_REPLICA_URL else {}
+    )
+    REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "10"))  # read-your-writes window
+
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    AUTO_CREATE_SCHEMA = os.getenv("AUTO_CREATE_SCHEMA", "false").lower() == "true"
+
+    # Petition attachments are stored content-addressed under ATTACHMENT_ROOT;
+    # MAX_CONTENT_LENGTH rejects oversized requests before the body is read
+    ATTACHMENT_ROOT = os.getenv("ATTACHMENT_ROOT", "uploads")
+    ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(10 * 1024 * 1024)))
+    ATTACHMENT_CHUNK_SIZE = int(os.getenv("ATTACHMENT_CHUNK_SIZE", str(64 * 1024)))
+    MAX_CONTENT_LENGTH = int(os.getenv("MAX_CONTENT_LENGTH", str(ATTACHMENT_MAX_BYTES + 1024 * 1024)))
+    # Orphaned attachments (failed submissions, deleted petitions) are swept
+    # once they are older than the grace period
+    ATTACHMENT_SWEEP_INTERVAL_SECONDS = float(os.getenv("ATTACHMENT_SWEEP_INTERVAL_SECONDS", "3600"))
+    ATTACHMENT_ORPHAN_GRACE_SECONDS = float(os.getenv("ATTACHMENT_ORPHAN_GRACE_SECONDS", "3600"))
+
+    # Petition ids reserved per database round trip (unused ids are skipped)
+    ID_BLOCK_SIZE = int(os.getenv("ID_BLOCK_SIZE", "100"))
+
+    # Bulk petition import (admin endpoint and import_petitions.py)
+    IMPORT_DIR = os.getenv("IMPORT_DIR", "imports")
+    IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(1024 * 1024 * 1024)))
+    IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "500"))
+    IMPORT_WORKERS = int(os.getenv("IMPORT_WORKERS", "0")) or os.cpu_count()
+
+    # Officer work queue
+    QUEUE_HOURS_PER_POINT = float(os.getenv("QUEUE_HOURS_PER_POINT", "24"))  # waiting time one priority point is worth
+    QUEUE_CLAIM_TIMEOUT_MINUTES = float(os.getenv("QUEUE_CLAIM_TIMEOUT_MINUTES", "60"))
+    QUEUE_MAX_CLAIM = int(os.getenv("QUEUE_MAX_CLAIM", "20"))
+    QUEUE_RELEASE_INTERVAL_SECONDS = float(os.getenv("QUEUE_RELEASE_INTERVAL_SECONDS", "60"))
+
+    # Password hashing: method as in werkzeug (e.g. pbkdf2:sha256:600000 or
+    # scrypt:32768:8:1); stored hashes with other parameters are upgraded at
+    # the next successful login. Hashing runs on a bounded pool (thread,
+    # process or inline) so login peaks don't occupy every request thread
+    PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD", "pbkdf2:sha256:600000")
+    PASSWORD_HASH_EXECUTOR = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+    PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", "16"))
+    PASSWORD_HASH_QUEUE_TIMEOUT = float(os.getenv("PASSWORD_HASH_QUEUE_TIMEOUT", "2"))
+
+    # Public tracking responses: per-worker cache (invalidated on change
+    # through the EVENT_BROKER_DIR broker) and browser/CDN max-age
+    TRACK_CACHE_MAX_ENTRIES = int(os.getenv("TRACK_CACHE_MAX_ENTRIES", "10000"))
+    TRACK_CACHE_TTL_SECONDS = float(os.getenv("TRACK_CACHE_TTL_SECONDS", "300"))
+    TRACK_CACHE_MAX_AGE = int(os.getenv("TRACK_CACHE_MAX_AGE", "30"))
+
+    # Rate limits as name:count/period (second, minute, hour, day); each is a
+    # token bucket allowing a burst of ``count``. RATE_LIMIT_STORE=shared
+    # keeps buckets in a memory-mapped file shared by all workers on a host
+    RATE_LIMIT_ENABLED = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMITS = os.getenv("RATE_LIMITS", "login:10/minute,login_account:5/minute,submit:20/hour,track:60/minute")
+    RATE_LIMIT_STORE = os.getenv("RATE_LIMIT_STORE", "memory")  # memory or shared
+    RATE_LIMIT_SHARED_PATH = os.getenv("RATE_LIMIT_SHARED_PATH", "/dev/shm/grievance-rate-limits" if os.path.isdir("/dev/shm") else "rate-limits.bin")
+    RATE_LIMIT_SHARED_SLOTS = int(os.getenv("RATE_LIMIT_SHARED_SLOTS", "65536"))
+    # Reverse proxies in front of the app whose X-Forwarded-For is trusted
+    # for the client IP (0 = use the socket address)
+    TRUSTED_PROXIES = int(os.getenv("TRUSTED_PROXIES", "0"))
+
+    # SLA escalation: hours a petition may stay submitted/in_review, per
+    # category ("default" covers the rest)
+    SLA_RULES = os.getenv("SLA_RULES", "Public Safety:12,Healthcare:24,Water Supply:24,Electricity:24,default:72")
+    SLA_CHECK_INTERVAL_SECONDS = float(os.getenv("SLA_CHECK_INTERVAL_SECONDS", "60"))
+    SLA_BATCH_SIZE = int(os.getenv("SLA_BATCH_SIZE", "200"))
+
+    # NLP budget on submission: entity extraction runs on at most
+    # NLP_MAX_ENTITY_CHARS characters and is deferred when it would overrun
+    # NLP_TIME_BUDGET_MS; a scheduler job completes degraded analyses later
+    NLP_TIME_BUDGET_MS = float(os.getenv("NLP_TIME_BUDGET_MS", "1500"))
+    NLP_MAX_ENTITY_CHARS = int(os.getenv("NLP_MAX_ENTITY_CHARS", "5000"))
+    NLP_COMPLETION_INTERVAL_SECONDS = float(os.getenv("NLP_COMPLETION_INTERVAL_SECONDS", "30"))
+    NLP_COMPLETION_BATCH_SIZE = int(os.getenv("NLP_COMPLETION_BATCH_SIZE", "20"))
+    NLP_COMPLETION_LEASE_SECONDS = float(os.getenv("NLP_COMPLETION_LEASE_SECONDS", "600"))
+    NLP_COMPLETION_MAX_ATTEMPTS = int(os.getenv("NLP_COMPLETION_MAX_ATTEMPTS", "3"))
+
+    # NLP reprocessing of stored petitions (reprocess_petitions.py); kept
+    # below the import defaults so it can run next to live traffic
+    REPROCESS_BATCH_SIZE = int(os.getenv("REPROCESS_BATCH_SIZE", "200"))
+    REPROCESS_WORKERS = int(os.getenv("REPROCESS_WORKERS", "0")) or max(1, os.cpu_count() // 2)
+    REPROCESS_MAX_RATE = float(os.getenv("REPROCESS_MAX_RATE", "0"))  # petitions/second, 0 = unthrottled
+
+    # JSON responses at least this large are gzip/deflate-encoded when accepted
+    RESPONSE_COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "2048"))
+    RESPONSE_COMPRESS_LEVEL = int(os.getenv("RESPONSE_COMPRESS_LEVEL", "5"))
+
+    # Rows per server-side cursor fetch when streaming exports
+    EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "1000"))
+
+    # Attachment downloads: set a prefix (an nginx "internal" location aliased
+    # to ATTACHMENT_ROOT) to hand files to the proxy with X-Accel-Redirect, or
+    # USE_X_SENDFILE=true for servers that honour X-Sendfile
+    ATTACHMENT_ACCEL_REDIRECT_PREFIX = os.getenv("ATTACHMENT_ACCEL_REDIRECT_PREFIX", "")
+    USE_X_SENDFILE = os.getenv("USE_X_SENDFILE", "false").lower() == "true"
+
+    # Analytics trends
+    TRENDS_DEFAULT_DAYS = int(os.getenv("TRENDS_DEFAULT_DAYS", "30"))
+    TRENDS_MAX_HOURLY_DAYS = int(os.getenv("TRENDS_MAX_HOURLY_DAYS", "7"))
+    TREND_ROLLUP_INTERVAL_SECONDS = float(os.getenv("TREND_ROLLUP_INTERVAL_SECONDS", "10"))  # delta folding
+
+    # Analytics response cache
+    ANALYTICS_CACHE_MAX_ENTRIES = int(os.getenv("ANALYTICS_CACHE_MAX_ENTRIES", "512"))
+    ANALYTICS_CACHE_MAX_BYTES = int(os.getenv("ANALYTICS_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+    # How often workers check whether the departments table changed
+    DEPARTMENT_DIRECTORY_CHECK_SECONDS = float(os.getenv("DEPARTMENT_DIRECTORY_CHECK_SECONDS", "30"))
+
+    # Cached user rows backing token-version checks; role changes reach
+    # other workers within the TTL
+    IDENTITY_CACHE_TTL_SECONDS = float(os.getenv("IDENTITY_CACHE_TTL_SECONDS", "60"))
+    IDENTITY_CACHE_MAX_ENTRIES = int(os.getenv("IDENTITY_CACHE_MAX_ENTRIES", "10000"))
+
+    # Notification listing
+    NOTIFICATIONS_PAGE_SIZE = int(os.getenv("NOTIFICATIONS_PAGE_SIZE", "50"))
+    NOTIFICATIONS_MAX_PAGE_SIZE = int(os.getenv("NOTIFICATIONS_MAX_PAGE_SIZE", "200"))
+    NOTIFICATION_FANOUT_BATCH_SIZE = int(os.getenv("NOTIFICATION_FANOUT_BATCH_SIZE", "1000"))
+
+    # Server-Sent Events. Events (and cache invalidations) are shared with
+    # every process on the host using the same EVENT_BROKER_DIR: API
+    # workers, the SSE server, the scheduler and CLI jobs
+    EVENT_BROKER_DIR = os.getenv("EVENT_BROKER_DIR") or os.path.join(tempfile.gettempdir(), "grievance-events")
+    EVENT_HISTORY_SIZE = int(os.getenv("EVENT_HISTORY_SIZE", "100"))
+    EVENT_HISTORY_CHANNELS = int(os.getenv("EVENT_HISTORY_CHANNELS", "10000"))
+    EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+    SSE_HEARTBEAT_SECONDS = float(os.getenv("SSE_HEARTBEAT_SECONDS", "15"))
+    # Open streams per worker process; 503 above it. gunicorn.conf.py lowers
+    # it for the threaded API server, gunicorn_sse.conf.py serves thousands
+    SSE_MAX_CONNECTIONS = int(os.getenv("SSE_MAX_CONNECTIONS", "5000"))
+    STREAM_TICKET_TTL_SECONDS = int(os.getenv("STREAM_TICKET_TTL_SECONDS", "30"))
+
+    # Background jobs. Under gunicorn one worker per host runs them: the one
+    # holding SCHEDULER_LOCK_PATH (the others wait to take over)
+    SCHEDULER_ENABLED = os.getenv("SCHEDULER_ENABLED", "false").lower() == "true"
+    SCHEDULER_LOCK_PATH = os.getenv("SCHEDULER_LOCK_PATH") or os.path.join(tempfile.gettempdir(), "grievance-scheduler.lock")
+
+    # Outbound SMS/email, e.g. DELIVERY_PROVIDERS=sms:twilio,email:smtp
+    # (use "loopback" to write messages to DELIVERY_LOOPBACK_PATH instead)
+    DELIVERY_PROVIDERS = os.getenv("DELIVERY_PROVIDERS", "")
+    DELIVERY_LOOPBACK_PATH = os.getenv("DELIVERY_LOOPBACK_PATH", "outbox.jsonl")
+    DELIVERY_RATE_LIMITS = os.getenv("DELIVERY_RATE_LIMITS", "sms:1,email:10")  # messages/second
+    DELIVERY_INTERVAL_SECONDS = float(os.getenv("DELIVERY_INTERVAL_SECONDS", "5"))
+    DELIVERY_BATCH_SIZE = int(os.getenv("DELIVERY_BATCH_SIZE", "50"))
+    DELIVERY_MAX_ATTEMPTS = int(os.getenv("DELIVERY_MAX_ATTEMPTS", "5"))
+    DELIVERY_RETRY_BASE_SECONDS = float(os.getenv("DELIVERY_RETRY_BASE_SECONDS", "30"))
+    DELIVERY_RETRY_MAX_SECONDS = float(os.getenv("DELIVERY_RETRY_MAX_SECONDS", "3600"))
+    DELIVERY_CLAIM_TIMEOUT_SECONDS = float(os.getenv("DELIVERY_CLAIM_TIMEOUT_SECONDS", "300"))
+
+    TWILIO_ACCOUNT_SID = os.getenv("TWILIO_ACCOUNT_SID")
+    TWILIO_AUTH_TOKEN = os.getenv("TWILIO_AUTH_TOKEN")
+    TWILIO_FROM_NUMBER = os.getenv("TWILIO_FROM_NUMBER")
+
+    SMTP_HOST = os.getenv("SMTP_HOST", "localhost")
+    SMTP_PORT = int(os.getenv("SMTP_PORT", "587"))
+    SMTP_USERNAME = os.getenv("SMTP_USERNAME")
+    SMTP_PASSWORD = os.getenv("SMTP_PASSWORD")
+    SMTP_SENDER = os.getenv("SMTP_SENDER", "noreply@grievance.gov.in")
+    SMTP_USE_TLS = os.getenv("SMTP_USE_TLS", "true").lower() == "true"
@@ -0,0 +1,176 @@
+"""Read/write routing between the primary database and a read replica"""
+import math
+import threading
+import time
+from functools import wraps
+from flask import current_app, g, has_request_context, request
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from itsdangerous import BadSignature, URLSafeSerializer
+from sqlalchemy import event
+from sqlalchemy.sql import Select
+
+REPLICA_BIND = "replica"
+
+# Read-your-writes pins are shared with the other workers on the host over
+# the event bus, and with other hosts through a signed cookie
+STICKY_CHANNEL = "replica-sticky"
+STICKY_COOKIE = "primary_until"
+
+
+class RoutingSession(Session):
+    """Session that sends reads to the replica inside @read_only views.
+
+    Only plain SELECTs are routed; flushes, DML, SELECT ... FOR UPDATE and
+    everything outside a read-only view use the primary.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (
+            bind is None
+            and self.info.get("read_only")
+            and not self._flushing
+            and isinstance(clause, Select)
+            and clause._for_update_arg is None
+        ):
+            replica = self._db.engines.get(REPLICA_BIND)
+            if replica is not None:
+                routing_stats.count("replica")
+                return replica
+        routing_stats.count("primary")
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class RoutingStats:
+    """Queries routed to each side, and users recently pinned to the primary"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.routed = {"primary": 0, "replica": 0}
+        self._sticky = {}  # user id -> wall-clock deadline (comparable across processes)
+
+    def count(self, side):
+        self.routed[side] += 1  # approximate under threads; metrics only
+
+    def stick(self, user_id, until):
+        with self._lock:
+            now = time.time()
+            if len(self._sticky) > 10000:
+                self._sticky = {k: v for k, v in self._sticky.items() if v > now}
+            self._sticky[user_id] = max(until, self._sticky.get(user_id, 0))
+
+    def is_sticky(self, user_id):
+        deadline = self._sticky.get(user_id)
+        return deadline is not None and deadline > time.time()
+
+    def snapshot(self):
+        now = time.time()
+        with self._lock:
+            sticky = sum(1 for deadline in self._sticky.values() if deadline > now)
+        return {"routed": dict(self.routed), "sticky_users": sticky}
+
+
+routing_stats = RoutingStats()
+
+
+def init_routing(app):
+    """Share read-your-writes pins across workers and hosts (when a replica is configured)"""
+    if REPLICA_BIND not in app.config["SQLALCHEMY_BINDS"]:
+        return
+    from app.services.event_bus import event_bus
+    event_bus.add_listener(STICKY_CHANNEL, lambda evt: routing_stats.stick(*evt["data"]))
+    app.after_request(_set_sticky_cookie)
+
+
+def _serializer():
+    return URLSafeSerializer(current_app.config["SECRET_KEY"], salt=STICKY_COOKIE)
+
+
+def _set_sticky_cookie(response):
+    pinned = g.pop("primary_until", None)
+    if pinned is not None:
+        response.set_cookie(
+            STICKY_COOKIE,
+            _serializer().dumps(pinned),
+            max_age=math.ceil(current_app.config["REPLICA_STICKY_SECONDS"]),
+            httponly=True,
+            samesite="Lax"
+        )
+    return response
+
+
+def _is_sticky(user_id):
+    """True if ``user_id`` wrote recently, as seen by any worker on this host or by the cookie"""
+    if routing_stats.is_sticky(user_id):
+        return True
+    cookie = request.cookies.get(STICKY_COOKIE)
+    if not cookie:
+        return False
+    try:
+        pinned_user, until = _serializer().loads(cookie)
+    except (BadSignature, TypeError, ValueError):
+        return False
+    return pinned_user == user_id and until > time.time()
+
+
+def _request_user_id():
+    """The caller's user id if the request carries a verified JWT"""
+    try:
+        identity = get_jwt_identity()
+    except RuntimeError:
+        return None
+    return int(identity) if identity is not None else None
+
+
+def read_only(view):
+    """
+    Serve a view's SELECTs from the replica (use below @jwt_required())
+
+    Callers who wrote within the last REPLICA_STICKY_SECONDS stay on the
+    primary so they read their own writes.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        from app.extensions import db
+        user_id = _request_user_id()
+        db.session.info["read_only"] = user_id is None or not _is_sticky(user_id)
+        try:
+            return view(*args, **kwargs)
+        finally:
+            db.session.info.pop("read_only", None)
+    return wrapper
+
+
+def route_to_primary():
+    """Send the rest of this request's reads to the primary"""
+    from app.extensions import db
+    db.session.info.pop("read_only", None)
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _note_flush(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "do_orm_execute")
+def _note_dml(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _pin_writer(session):
+    if session.info.pop("wrote", False) and REPLICA_BIND in session._db.engines:
+        user_id = _request_user_id()
+        if user_id is not None:
+            from app.services.event_bus import event_bus
+            until = time.time() + current_app.config["REPLICA_STICKY_SECONDS"]
+            routing_stats.stick(user_id, until)
+            if has_request_context():
+                g.primary_until = [user_id, until]
+            event_bus.publish(STICKY_CHANNEL, "stick", [user_id, until])
+
+
+@event.listens_for(RoutingSession, "after_rollback")
+def _forget_writes(session):
+    session.info.pop("wrote", None)
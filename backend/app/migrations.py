@@ -0,0 +1,63 @@
+"""Bring an existing database up to the current models
+
+``db.create_all()`` only creates missing tables. Columns and indexes added
+to tables that already exist are applied here with ALTER TABLE / CREATE
+INDEX; every step checks the live schema first, so running it again is a
+no-op.
+"""
+import logging
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.schema import AddConstraint, CreateColumn
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade_schema():
+    """
+    Create missing tables, then add missing columns, foreign keys and indexes
+
+    Returns:
+        List of applied steps, e.g. ["users.token_version", "ix_petitions_queue"]
+    """
+    engine = db.engine
+    existing = set(inspect(engine).get_table_names())
+    db.create_all()
+    applied = []
+    with engine.begin() as conn:
+        inspector = inspect(conn)
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing:
+                continue
+            columns = {column["name"] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                conn.execute(text(f"ALTER TABLE {table.name} ADD COLUMN {_column_ddl(column, conn.dialect)}"))
+                if conn.dialect.name != "sqlite":
+                    # SQLite cannot add constraints to an existing table
+                    for fk in column.foreign_keys:
+                        conn.execute(AddConstraint(fk.constraint))
+                applied.append(f"{table.name}.{column.name}")
+            indexes = {index["name"] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name not in indexes:
+                    index.create(conn)
+                    applied.append(index.name)
+    for step in applied:
+        logger.info("Schema upgrade: added %s", step)
+    return applied
+
+
+def _column_ddl(column, dialect):
+    """Column definition for ADD COLUMN, with the Python default as a server default
+
+    Existing rows need a value for NOT NULL columns, so a scalar ``default=``
+    is rendered as DEFAULT.
+    """
+    ddl = str(CreateColumn(column).compile(dialect=dialect))
+    default = column.default
+    if column.server_default is None and default is not None and default.is_scalar:
+        value = literal(default.arg).compile(dialect=dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}"
+    return ddl
@@ -10,10 +10,12 @@ class User(db.Model):
     password = db.Column(db.String(200), nullable=False)
     role = db.Column(db.String(20), default='citizen')  # citizen, officer, admin
     phone = db.Column(db.String(20))
+    token_version = db.Column(db.Integer, nullable=False, default=0)  # bumped to revoke issued tokens
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
     # Relationships
-    petitions = db.relationship('Petition', backref='user', lazy=True, cascade='all, delete-orphan')
+    petitions = db.relationship('Petition', backref='user', lazy=True, cascade='all, delete-orphan',
+                                foreign_keys='Petition.user_id')
     notifications = db.relationship('Notification', backref='user', lazy=True, cascade='all, delete-orphan')
 
 
@@ -32,6 +34,9 @@ class Department(db.Model):
 
 class Petition(db.Model):
     __tablename__ = 'petitions'
+    __table_args__ = (
+        db.Index('ix_petitions_queue', 'department_id', 'claimed_by', 'queue_score'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     petition_id = db.Column(db.String(20), unique=True, nullable=False)  # e.g., PET-2025-0001
@@ -58,11 +63,70 @@ class Petition(db.Model):
     
     # Additional fields
     attachment_path = db.Column(db.String(255))
+    attachment_id = db.Column(db.Integer, db.ForeignKey('attachments.id'))
+    attachment_name = db.Column(db.String(255))  # original (sanitized) filename
     resolution_comment = db.Column(db.Text)
     
+    # Officer work queue (see services/work_queue.py)
+    queue_score = db.Column(db.BigInteger)  # lower is served first; NULL once closed
+    claimed_by = db.Column(db.Integer, db.ForeignKey('users.id'))
+    claimed_at = db.Column(db.DateTime, index=True)
+    
+    # SLA deadline while submitted/in_review; cleared once met or escalated
+    sla_due_at = db.Column(db.DateTime, index=True)
+    escalated_at = db.Column(db.DateTime)  # set once the SLA escalation has run
+    
     # Relationships
     status_history = db.relationship('PetitionStatus', backref='petition', lazy=True, cascade='all, delete-orphan')
     notifications = db.relationship('Notification', backref='petition', lazy=True, cascade='all, delete-orphan')
+    attachment = db.relationship('Attachment')
+    claimer = db.relationship('User', foreign_keys=[claimed_by])
+
+
+class PetitionAnalysis(db.Model):
+    __tablename__ = 'petition_analysis'
+    
+    petition_id = db.Column(db.Integer, db.ForeignKey('petitions.id'), primary_key=True)
+    confidence = db.Column(db.Float)  # classifier confidence for Petition.category
+    class_probabilities = db.Column(db.JSON)  # category -> probability
+    priority_score = db.Column(db.Integer)
+    sentiment_polarity = db.Column(db.String(20))  # positive, negative, neutral
+    urgency_keywords = db.Column(db.JSON)  # matched urgency keywords
+    summary = db.Column(db.Text)
+    entity_summary = db.Column(db.Text)
+    degraded_stages = db.Column(db.JSON)  # stage -> truncated/deferred when NLP ran under a budget
+    completion_due_at = db.Column(db.DateTime, index=True)  # next background try at degraded stages; NULL when done
+    completion_attempts = db.Column(db.Integer, nullable=False, default=0)
+    analysis_digest = db.Column(db.String(64))  # sha256 of the pipeline output, so reprocessing can skip unchanged rows
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    
+    petition = db.relationship('Petition', backref=db.backref('analysis', uselist=False))
+
+
+class PetitionEntity(db.Model):
+    __tablename__ = 'petition_entities'
+    __table_args__ = (
+        db.Index('ix_petition_entities_lookup', 'entity_type', 'normalized_value', 'petition_id'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    petition_id = db.Column(db.Integer, db.ForeignKey('petitions.id'), nullable=False, index=True)
+    entity_type = db.Column(db.String(20), nullable=False)  # location, person, organization, date, phone, email
+    value = db.Column(db.String(255), nullable=False)
+    normalized_value = db.Column(db.String(255), nullable=False)  # lowercased for lookups
+
+
+class PetitionKeyword(db.Model):
+    __tablename__ = 'petition_keywords'
+    __table_args__ = (
+        db.Index('ix_petition_keywords_keyword_created', 'keyword', 'created_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    petition_id = db.Column(db.Integer, db.ForeignKey('petitions.id'), nullable=False, index=True)
+    keyword = db.Column(db.String(100), nullable=False)
+    rank = db.Column(db.Integer, nullable=False)  # 0 = most relevant
+    created_at = db.Column(db.DateTime, nullable=False)  # copied from the petition for time-window queries
 
 
 class PetitionStatus(db.Model):
@@ -81,6 +145,9 @@ class PetitionStatus(db.Model):
 
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.Index('ix_notifications_user_read_id', 'user_id', 'read_status', 'id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
@@ -88,3 +155,122 @@ class Notification(db.Model):
     message = db.Column(db.Text, nullable=False)
     read_status = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class NotificationCounter(db.Model):
+    __tablename__ = 'notification_counters'
+    
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    unread = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PetitionTrendRollup(db.Model):
+    __tablename__ = 'petition_trend_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('day', 'dimension', 'value', name='uq_trend_rollup_bucket'),
+        db.Index('ix_trend_rollup_dimension_day', 'dimension', 'day'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    dimension = db.Column(db.String(20), nullable=False)  # total, department, category, priority, status
+    value = db.Column(db.String(100), nullable=False, default='')
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+
+class PetitionTrendDelta(db.Model):
+    __tablename__ = 'petition_trend_deltas'
+    __table_args__ = (
+        db.Index('ix_trend_delta_dimension_day', 'dimension', 'day'),
+    )
+    
+    # Rollup increments written with each petition change (insert-only, so
+    # writers never contend); folded into petition_trend_rollups in batches
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    dimension = db.Column(db.String(20), nullable=False)
+    value = db.Column(db.String(100), nullable=False, default='')
+    amount = db.Column(db.Integer, nullable=False)
+
+
+class CacheVersion(db.Model):
+    __tablename__ = 'cache_versions'
+    
+    name = db.Column(db.String(50), primary_key=True)  # e.g., petitions, departments
+    version = db.Column(db.Integer, nullable=False, default=0)
+
+
+class IdSequence(db.Model):
+    __tablename__ = 'id_sequences'
+    
+    name = db.Column(db.String(50), primary_key=True)  # e.g., petition:2025
+    next_value = db.Column(db.BigInteger, nullable=False, default=1)  # first number not yet reserved
+
+
+class ImportJob(db.Model):
+    __tablename__ = 'import_jobs'
+    
+    id = db.Column(db.String(255), primary_key=True)  # API job id, or the CLI's source path
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, completed, failed
+    last_row = db.Column(db.Integer, nullable=False, default=0)  # written in the same transaction as its batch
+    imported = db.Column(db.Integer, nullable=False, default=0)
+    failed = db.Column(db.Integer, nullable=False, default=0)
+    error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
+class ImportRowError(db.Model):
+    __tablename__ = 'import_row_errors'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    job_id = db.Column(db.String(255), db.ForeignKey('import_jobs.id'), nullable=False, index=True)
+    row = db.Column(db.Integer, nullable=False)
+    petition_id = db.Column(db.String(255))  # as given in the input
+    error = db.Column(db.Text, nullable=False)
+
+
+class OutboundMessage(db.Model):
+    __tablename__ = 'outbound_messages'
+    __table_args__ = (
+        db.Index('ix_outbound_messages_due', 'status', 'channel', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    notification_id = db.Column(db.Integer, db.ForeignKey('notifications.id'))
+    channel = db.Column(db.String(10), nullable=False)  # sms, email
+    recipient = db.Column(db.String(120), nullable=False)
+    subject = db.Column(db.String(200))
+    body = db.Column(db.Text, nullable=False)
+    
+    # Delivery state
+    status = db.Column(db.String(20), nullable=False, default='pending')  # pending, sending, sent, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    claim_token = db.Column(db.String(32), index=True)
+    claimed_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    notification = db.relationship('Notification')
+
+
+class Attachment(db.Model):
+    __tablename__ = 'attachments'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), unique=True, nullable=False)
+    size = db.Column(db.BigInteger, nullable=False)
+    content_type = db.Column(db.String(100))
+    path = db.Column(db.String(255), nullable=False)  # relative to ATTACHMENT_ROOT
+    ref_count = db.Column(db.Integer, nullable=False, default=0)  # petitions pointing at this object
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+
+class StreamTicket(db.Model):
+    __tablename__ = 'stream_tickets'
+    
+    ticket_hash = db.Column(db.String(64), primary_key=True)  # sha256 of the ticket handed out
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
@@ -81,39 +81,40 @@ class EntityExtractor:
         
         return list(set(locations))[:5]  # Return top 5 unique locations
     
-    def extract_names(self, text):
-        """Extract person names using NLTK NER"""
+    def extract_named_entities(self, text):
+        """
+        Extract person and organization names using NLTK NER
+
+        Tokenizes, tags and chunks the text once for both entity types.
+
+        Returns:
+            dict with "names" and "organizations" lists
+        """
         try:
             tokens = nltk.word_tokenize(text)
             pos_tags = nltk.pos_tag(tokens)
             chunks = nltk.ne_chunk(pos_tags)
             
-            names = []
+            names = set()
+            orgs = set()
             for chunk in chunks:
-                if hasattr(chunk, 'label') and chunk.label() == 'PERSON':
-                    name = ' '.join(c[0] for c in chunk)
-                    names.append(name)
+                if hasattr(chunk, 'label'):
+                    if chunk.label() == 'PERSON':
+                        names.add(' '.join(c[0] for c in chunk))
+                    elif chunk.label() == 'ORGANIZATION':
+                        orgs.add(' '.join(c[0] for c in chunk))
             
-            return list(set(names))
+            return {"names": list(names), "organizations": list(orgs)}
         except:
-            return []
+            return {"names": [], "organizations": []}
+    
+    def extract_names(self, text):
+        """Extract person names using NLTK NER"""
+        return self.extract_named_entities(text)["names"]
     
     def extract_organizations(self, text):
         """Extract organization names using NLTK NER"""
-        try:
-            tokens = nltk.word_tokenize(text)
-            pos_tags = nltk.pos_tag(tokens)
-            chunks = nltk.ne_chunk(pos_tags)
-            
-            orgs = []
-            for chunk in chunks:
-                if hasattr(chunk, 'label') and chunk.label() == 'ORGANIZATION':
-                    org = ' '.join(c[0] for c in chunk)
-                    orgs.append(org)
-            
-            return list(set(orgs))
-        except:
-            return []
+        return self.extract_named_entities(text)["organizations"]
     
     def extract_all_entities(self, text):
         """
@@ -135,13 +136,14 @@ class EntityExtractor:
                 "organizations": []
             }
         
+        named = self.extract_named_entities(text)
         return {
             "dates": self.extract_dates(text),
             "phone_numbers": self.extract_phone_numbers(text),
             "emails": self.extract_emails(text),
             "locations": self.extract_locations(text),
-            "names": self.extract_names(text),
-            "organizations": self.extract_organizations(text)
+            "names": named["names"],
+            "organizations": named["organizations"]
         }
     
     def generate_summary(self, entities):
@@ -0,0 +1,50 @@
+"""Response schemas for list endpoints, selected straight from row tuples"""
+from app.models import Petition, Notification, User
+from app.services.department_directory import department_directory
+from app.services.serialization import Field, Schema, truncate
+
+petition_list_schema = Schema(
+    Field("id", Petition.id),
+    Field("petition_id", Petition.petition_id),
+    Field("title", Petition.title),
+    Field("description", Petition.description, transform=truncate(200)),
+    Field("category", Petition.category),
+    Field("department", Petition.department_id, transform=department_directory.name_for),
+    Field("priority", Petition.priority),
+    Field("urgency_level", Petition.urgency_level),
+    Field("status", Petition.status),
+    Field("created_at", Petition.created_at),
+    Field("updated_at", Petition.updated_at),
+)
+
+department_petition_schema = Schema(
+    Field("id", Petition.id),
+    Field("petition_id", Petition.petition_id),
+    Field("title", Petition.title),
+    Field("priority", Petition.priority),
+    Field("urgency_level", Petition.urgency_level),
+    Field("status", Petition.status),
+    Field("created_at", Petition.created_at),
+    Field("user", User.name, User.email, transform=lambda name, email: {"name": name, "email": email}),
+)
+
+queue_item_schema = Schema(
+    Field("id", Petition.id),
+    Field("petition_id", Petition.petition_id),
+    Field("title", Petition.title),
+    Field("description", Petition.description, transform=truncate(200)),
+    Field("priority", Petition.priority),
+    Field("urgency_level", Petition.urgency_level),
+    Field("sentiment_score", Petition.sentiment_score),
+    Field("status", Petition.status),
+    Field("created_at", Petition.created_at),
+    Field("claimed_at", Petition.claimed_at),
+)
+
+notification_schema = Schema(
+    Field("id", Notification.id),
+    Field("message", Notification.message),
+    Field("read_status", Notification.read_status),
+    Field("created_at", Notification.created_at),
+    Field("petition_id", Notification.petition_id),
+)
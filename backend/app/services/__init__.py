@@ -1,5 +1,37 @@
 """Services package initialization"""
-from .petition_processor import PetitionProcessor
+from .petition_processor import PetitionProcessor, get_processor
 from .notification_service import NotificationService
+from .trend_service import TrendService
+from .cache import CacheVersions, cached_response
+from .department_directory import department_directory
+from .identity import current_identity, roles_required
+from .event_bus import event_bus, publish_after_commit
+from .delivery_service import DeliveryService, DeliveryWorker
+from .scheduler import init_scheduler, elect_scheduler
+from .attachment_store import (
+    AttachmentService, AttachmentRequest, AttachmentTooLarge, streams_attachments, upload_limit
+)
+from .petition_importer import PetitionImporter, start_import_job, read_import_state, detect_format
+from .id_allocator import petition_ids
+from .warmup import warm_up, is_warmed_up
+from .serialization import json_response
+from .petition_export import PetitionExporter, apply_petition_filters
+from .analysis_store import AnalysisService, compact_analysis
+from .petition_reprocessor import PetitionReprocessor
+from .work_queue import WorkQueue, queue_score
+from .sla_service import SLAService, sla_due_at
+from .rate_limit import rate_limit, get_rate_limiter
+from .track_cache import get_track_cache, invalidate_tracking
+from .passwords import PasswordHasherBusy, get_password_hasher
 
-__all__ = ['PetitionProcessor', 'NotificationService']
+__all__ = ['PetitionProcessor', 'get_processor', 'NotificationService', 'TrendService', 'CacheVersions', 'cached_response',
+           'department_directory', 'current_identity', 'roles_required',
+           'event_bus', 'publish_after_commit', 'DeliveryService', 'DeliveryWorker',
+           'init_scheduler', 'elect_scheduler', 'AttachmentService', 'AttachmentRequest', 'AttachmentTooLarge',
+           'streams_attachments', 'upload_limit', 'PetitionImporter', 'start_import_job',
+           'read_import_state', 'detect_format', 'PetitionExporter', 'apply_petition_filters',
+           'petition_ids', 'warm_up', 'is_warmed_up',
+           'json_response', 'AnalysisService', 'compact_analysis',
+           'PetitionReprocessor', 'WorkQueue', 'queue_score',
+           'SLAService', 'sla_due_at', 'rate_limit', 'get_rate_limiter',
+           'get_track_cache', 'invalidate_tracking', 'PasswordHasherBusy', 'get_password_hasher']
@@ -0,0 +1,348 @@
+"""Persisted NLP analysis: probabilities, entities and keywords per petition"""
+import hashlib
+import json
+import logging
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import delete, func, insert, select, update
+from app.extensions import db
+from app.models import Petition, PetitionAnalysis, PetitionEntity, PetitionKeyword
+from .cache import CacheVersions
+from .petition_processor import get_processor
+
+logger = logging.getLogger(__name__)
+
+# extract_all_entities keys -> stored entity_type
+ENTITY_TYPES = {
+    "locations": "location",
+    "names": "person",
+    "organizations": "organization",
+    "dates": "date",
+    "phone_numbers": "phone",
+    "emails": "email",
+}
+ENTITY_KEYS = {entity_type: key for key, entity_type in ENTITY_TYPES.items()}
+
+
+def normalize(value):
+    """Lookup form of an entity value or keyword"""
+    return " ".join(str(value).split()).lower()
+
+
+def compact_analysis(analysis):
+    """The parts of a process_petition result that are persisted"""
+    return {
+        "confidence": analysis["classification"]["confidence"],
+        "all_probabilities": analysis["classification"].get("all_probabilities", {}),
+        "priority_score": analysis["priority"]["score"],
+        "polarity": analysis["sentiment"]["polarity"],
+        "urgency_keywords": analysis["urgency"]["keywords"],
+        "summary": analysis["summary"],
+        "entity_summary": analysis.get("entity_summary"),
+        "degraded_stages": analysis.get("degraded_stages") or None,
+        "entities": analysis["entities"],
+        "keywords": analysis["keywords"],
+    }
+
+
+def analysis_digest(analysis):
+    """Stable fingerprint of a compact_analysis() result"""
+    encoded = json.dumps(analysis, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(encoded.encode()).hexdigest()
+
+
+class AnalysisService:
+    """Store and query the AI analysis of petitions.
+
+    The full analysis is written in the same transaction as the petition,
+    so later features read it back instead of re-running the pipeline.
+    Entities and keywords go to narrow tables with composite indexes for
+    "petitions mentioning X" and "keyword Y in a time window" lookups.
+    """
+
+    @staticmethod
+    def build_rows(petition_id, created_at, analysis):
+        """
+        Insert rows for one petition's analysis
+
+        Args:
+            petition_id: Petition primary key
+            created_at: Petition creation time (copied onto keyword rows)
+            analysis: compact_analysis() output
+
+        Returns:
+            (analysis row, entity rows, keyword rows) as dicts
+        """
+        now = datetime.utcnow()
+        degraded_stages = analysis.get("degraded_stages")
+        analysis_row = {
+            "petition_id": petition_id,
+            "confidence": analysis["confidence"],
+            "class_probabilities": analysis["all_probabilities"],
+            "priority_score": analysis["priority_score"],
+            "sentiment_polarity": analysis["polarity"],
+            "urgency_keywords": analysis["urgency_keywords"],
+            "summary": analysis["summary"],
+            "entity_summary": analysis["entity_summary"],
+            "degraded_stages": degraded_stages,
+            "completion_due_at": now if degraded_stages else None,
+            "completion_attempts": 0,
+            "analysis_digest": analysis_digest(analysis),
+            "created_at": now,
+        }
+
+        entity_rows = AnalysisService.entity_rows(petition_id, analysis["entities"])
+
+        keyword_rows = []
+        seen = set()
+        for keyword in analysis["keywords"]:
+            keyword = normalize(keyword)[:100]
+            if keyword and keyword not in seen:
+                seen.add(keyword)
+                keyword_rows.append({
+                    "petition_id": petition_id,
+                    "keyword": keyword,
+                    "rank": len(keyword_rows),
+                    "created_at": created_at,
+                })
+        return analysis_row, entity_rows, keyword_rows
+
+    @staticmethod
+    def entity_rows(petition_id, entities):
+        """PetitionEntity insert dicts for extract_all_entities-style lists"""
+        rows = []
+        for key, entity_type in ENTITY_TYPES.items():
+            seen = set()
+            for value in entities.get(key, []):
+                value = str(value).strip()[:255]
+                normalized = normalize(value)
+                if normalized and normalized not in seen:
+                    seen.add(normalized)
+                    rows.append({
+                        "petition_id": petition_id,
+                        "entity_type": entity_type,
+                        "value": value,
+                        "normalized_value": normalized,
+                    })
+        return rows
+
+    @staticmethod
+    def record(petition, analysis):
+        """
+        Stage a petition's analysis in the current transaction
+
+        Args:
+            petition: Flushed Petition (needs id and created_at)
+            analysis: process_petition() result
+        """
+        AnalysisService.record_many([
+            (petition.id, petition.created_at or datetime.utcnow(), compact_analysis(analysis))
+        ])
+
+    @staticmethod
+    def record_many(items):
+        """
+        Multi-row INSERTs for many petitions' analyses (no commit)
+
+        Args:
+            items: iterable of (petition id, created_at, compact_analysis()) tuples
+        """
+        analyses, entities, keywords = [], [], []
+        for petition_id, created_at, analysis in items:
+            analysis_row, entity_rows, keyword_rows = AnalysisService.build_rows(petition_id, created_at, analysis)
+            analyses.append(analysis_row)
+            entities.extend(entity_rows)
+            keywords.extend(keyword_rows)
+        if analyses:
+            db.session.execute(insert(PetitionAnalysis), analyses)
+        if entities:
+            db.session.execute(insert(PetitionEntity), entities)
+        if keywords:
+            db.session.execute(insert(PetitionKeyword), keywords)
+
+    @staticmethod
+    def complete_pending(batch_size=None, max_batches=10):
+        """
+        Finish analyses whose entity stages were truncated or deferred at submission
+
+        Each batch is claimed in a short transaction: due rows are taken
+        from the completion_due_at index with SKIP LOCKED and their due time
+        is pushed out by NLP_COMPLETION_LEASE_SECONDS, so other runs skip
+        them and a crashed run's rows come back later. The degraded stages
+        then run over the full text, in NLP_MAX_ENTITY_CHARS chunks, with no
+        transaction open, and each petition's result is written in its own
+        transaction. A petition that fails is retried with backoff and
+        left degraded after NLP_COMPLETION_MAX_ATTEMPTS.
+
+        Returns:
+            Number of analyses completed
+        """
+        processor = get_processor()
+        config = current_app.config
+        batch_size = batch_size or config["NLP_COMPLETION_BATCH_SIZE"]
+        completed = 0
+        for _ in range(max_batches):
+            claimed, lease = AnalysisService._claim_pending(batch_size, config["NLP_COMPLETION_LEASE_SECONDS"])
+            for row in claimed:
+                try:
+                    entities = processor.complete_stages(
+                        row.title, row.description, list(row.degraded_stages or {}), config["NLP_MAX_ENTITY_CHARS"]
+                    )
+                    completed += AnalysisService._store_completion(processor, row, lease, entities)
+                except Exception:
+                    db.session.rollback()
+                    logger.exception("NLP completion failed for petition %s", row.petition_id)
+                    AnalysisService._retry_later(row, lease, config["NLP_COMPLETION_MAX_ATTEMPTS"])
+            if len(claimed) < batch_size:
+                break
+        if completed:
+            logger.info("NLP completion: %d analyses completed", completed)
+        return completed
+
+    @staticmethod
+    def _claim_pending(batch_size, lease_seconds):
+        """
+        Lease up to batch_size due analyses (one short transaction)
+
+        Returns:
+            (rows, lease) where lease is the completion_due_at the rows now hold
+        """
+        now = datetime.utcnow()
+        # Whole seconds, so the lease compares equal after a DATETIME round trip
+        lease = now.replace(microsecond=0) + timedelta(seconds=lease_seconds)
+        rows = db.session.execute(
+            select(
+                PetitionAnalysis.petition_id, PetitionAnalysis.degraded_stages,
+                PetitionAnalysis.completion_attempts, Petition.title, Petition.description
+            )
+            .join(Petition, Petition.id == PetitionAnalysis.petition_id)
+            .where(PetitionAnalysis.completion_due_at <= now)
+            .order_by(PetitionAnalysis.completion_due_at)
+            .limit(batch_size)
+            .with_for_update(skip_locked=True, of=PetitionAnalysis)
+        ).all()
+        if rows:
+            db.session.execute(update(PetitionAnalysis), [
+                {"petition_id": row.petition_id, "completion_due_at": lease} for row in rows
+            ])
+        db.session.commit()
+        return rows, lease
+
+    @staticmethod
+    def _store_completion(processor, row, lease, entities):
+        """
+        Write one petition's completed stages (own transaction)
+
+        Returns:
+            1 if written, 0 if the analysis was rewritten since it was claimed
+        """
+        analysis = db.session.execute(
+            select(PetitionAnalysis).where(PetitionAnalysis.petition_id == row.petition_id).with_for_update()
+        ).scalar_one_or_none()
+        if analysis is None or analysis.completion_due_at != lease:
+            # Reprocessed or deleted while the stages ran
+            db.session.commit()
+            return 0
+        petition = db.session.get(Petition, row.petition_id)
+
+        merged = {key: [] for key in ENTITY_TYPES}
+        for entity_type, value in db.session.execute(
+            select(PetitionEntity.entity_type, PetitionEntity.value)
+            .where(PetitionEntity.petition_id == petition.id)
+            .order_by(PetitionEntity.id)
+        ):
+            merged[ENTITY_KEYS[entity_type]].append(value)
+        merged.update(entities)
+
+        db.session.execute(delete(PetitionEntity).where(PetitionEntity.petition_id == petition.id))
+        rows = AnalysisService.entity_rows(petition.id, merged)
+        if rows:
+            db.session.execute(insert(PetitionEntity), rows)
+        analysis.entity_summary = processor.entity_extractor.generate_summary(merged)
+        analysis.summary = processor.generate_summary(
+            petition.title, petition.category, petition.priority, petition.urgency_level, merged
+        )
+        analysis.degraded_stages = None
+        analysis.completion_due_at = None
+        analysis.completion_attempts = 0
+        CacheVersions.bump("petitions")
+        db.session.commit()
+        return 1
+
+    @staticmethod
+    def _retry_later(row, lease, max_attempts):
+        """Back off a failed completion, or give up and leave it degraded"""
+        attempts = row.completion_attempts + 1
+        due = None
+        if attempts < max_attempts:
+            due = datetime.utcnow() + timedelta(minutes=5 * 2 ** (attempts - 1))
+        db.session.execute(
+            update(PetitionAnalysis)
+            .where(PetitionAnalysis.petition_id == row.petition_id, PetitionAnalysis.completion_due_at == lease)
+            .values(completion_attempts=attempts, completion_due_at=due)
+        )
+        db.session.commit()
+
+    @staticmethod
+    def mentioning(query, entity_type, value):
+        """
+        Narrow a Petition select() to petitions mentioning an entity
+
+        Args:
+            query: select() over Petition columns (apply filter_by filters first)
+            entity_type: location, person, organization, date, phone or email
+            value: Entity value (matched case-insensitively)
+        """
+        return (
+            query
+            .join(PetitionEntity, PetitionEntity.petition_id == Petition.id)
+            .where(PetitionEntity.entity_type == entity_type,
+                   PetitionEntity.normalized_value == normalize(value))
+        )
+
+    @staticmethod
+    def with_keyword(query, keyword, since=None, until=None):
+        """
+        Narrow a Petition select() to petitions tagged with a keyword
+
+        Args:
+            query: select() over Petition columns (apply filter_by filters first)
+            keyword: Keyword (matched case-insensitively)
+            since: Only petitions created at or after this time
+            until: Only petitions created before this time
+        """
+        query = (
+            query
+            .join(PetitionKeyword, PetitionKeyword.petition_id == Petition.id)
+            .where(PetitionKeyword.keyword == normalize(keyword))
+        )
+        if since:
+            query = query.where(PetitionKeyword.created_at >= since)
+        if until:
+            query = query.where(PetitionKeyword.created_at < until)
+        return query
+
+    @staticmethod
+    def top_keywords(since, until=None, limit=20, user_id=None):
+        """
+        Most frequent keywords of petitions created in a time window
+
+        Args:
+            since: Window start (inclusive)
+            until: Window end (exclusive); open-ended when None
+            limit: Number of keywords to return
+            user_id: Only this user's petitions (citizen scope)
+
+        Returns:
+            list of {"keyword", "count"} dicts, most frequent first
+        """
+        count = func.count(PetitionKeyword.id)
+        query = select(PetitionKeyword.keyword, count).where(PetitionKeyword.created_at >= since)
+        if until:
+            query = query.where(PetitionKeyword.created_at < until)
+        if user_id is not None:
+            query = query.join(Petition, Petition.id == PetitionKeyword.petition_id).where(Petition.user_id == user_id)
+        rows = db.session.execute(
+            query.group_by(PetitionKeyword.keyword).order_by(count.desc(), PetitionKeyword.keyword).limit(limit)
+        )
+        return [{"keyword": keyword, "count": n} for keyword, n in rows]
@@ -0,0 +1,309 @@
+"""Content-addressed storage for petition attachments"""
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from datetime import datetime, timedelta
+from flask import Request, current_app
+from sqlalchemy import and_, delete, exists, select
+from werkzeug.exceptions import RequestEntityTooLarge
+from app.extensions import db
+from app.models import Attachment, Petition
+from .db_utils import upsert_increment
+
+logger = logging.getLogger(__name__)
+
+
+class AttachmentTooLarge(RequestEntityTooLarge):
+    """An uploaded file exceeded ATTACHMENT_MAX_BYTES"""
+
+
+class SpooledUpload:
+    """Writable temp file that hashes and size-checks data as it arrives.
+
+    Used as the stream behind uploaded files, so the multipart parser
+    writes each chunk straight to disk under the store's temp directory
+    and the digest is ready once parsing finishes. Unless committed to the
+    store, the temp file is removed on close.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.committed = False
+        self._hash = hashlib.sha256()
+        self._file = tempfile.NamedTemporaryFile(dir=directory, prefix="upload-", delete=False)
+
+    def write(self, data):
+        self.size += len(data)
+        if self.size > self.max_bytes:
+            self.close()
+            raise AttachmentTooLarge(f"Attachments are limited to {self.max_bytes} bytes")
+        self._hash.update(data)
+        return self._file.write(data)
+
+    @property
+    def sha256(self):
+        return self._hash.hexdigest()
+
+    @property
+    def name(self):
+        return self._file.name
+
+    def close(self):
+        self._file.close()
+        if not self.committed:
+            try:
+                os.unlink(self._file.name)
+            except FileNotFoundError:
+                pass
+
+    def __getattr__(self, attr):
+        # read/readline/seek/tell/flush for the parser and FileStorage
+        return getattr(self._file, attr)
+
+
+class AttachmentStore:
+    """Stores each distinct file once, at ``objects/ab/cd/<sha256>``.
+
+    A file's mtime is refreshed whenever an upload is deduplicated against
+    it; the orphan sweep only removes files older than its grace period, so
+    it never takes a file an in-flight upload is about to reference.
+    """
+
+    def __init__(self, root, max_bytes, chunk_size=64 * 1024):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.chunk_size = chunk_size
+        self.tmp_dir = os.path.join(root, "tmp")
+        os.makedirs(self.tmp_dir, exist_ok=True)
+
+    def spool(self):
+        """A new SpooledUpload in this store's temp directory"""
+        return SpooledUpload(self.tmp_dir, self.max_bytes)
+
+    def put(self, stream):
+        """
+        Move an upload into the store
+
+        Args:
+            stream: A SpooledUpload, or any readable binary stream (copied
+                in chunks)
+
+        Returns:
+            tuple of (sha256, size, path relative to the store root)
+        """
+        if not isinstance(stream, SpooledUpload):
+            spooled = self.spool()
+            try:
+                for chunk in iter(lambda: stream.read(self.chunk_size), b""):
+                    spooled.write(chunk)
+            except Exception:
+                spooled.close()
+                raise
+            stream = spooled
+
+        stream.flush()
+        os.fsync(stream.fileno())
+        sha, size = stream.sha256, stream.size
+        relative = self.path_for(sha)
+        target = self.absolute(relative)
+
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        if self._touch(target):
+            stream.close()  # already stored; drop the duplicate
+        else:
+            stream.committed = True
+            stream._file.close()
+            os.replace(stream.name, target)
+        return sha, size, relative
+
+    def absolute(self, relative):
+        return os.path.join(self.root, relative)
+
+    def iter_stale(self, cutoff):
+        """Yield (sha256, relative path) of stored files last touched before ``cutoff`` (epoch seconds)"""
+        objects = os.path.join(self.root, "objects")
+        for directory, _, names in os.walk(objects):
+            for name in names:
+                path = os.path.join(directory, name)
+                try:
+                    if os.stat(path).st_mtime < cutoff:
+                        yield name, os.path.relpath(path, self.root)
+                except FileNotFoundError:
+                    pass
+
+    def remove_stale(self, relative, cutoff):
+        """
+        Remove a stored file unless an upload touched it since ``cutoff``
+
+        The file is first moved aside, so an upload deduplicating against
+        it either touched it before the move (and it is put back) or finds
+        it gone and stores its own copy.
+
+        Returns:
+            True if the file was removed
+        """
+        target = self.absolute(relative)
+        aside = os.path.join(self.tmp_dir, f"sweep-{os.path.basename(target)}")
+        try:
+            os.replace(target, aside)
+        except FileNotFoundError:
+            return False
+        if os.stat(aside).st_mtime >= cutoff:
+            os.replace(aside, target)
+            return False
+        os.unlink(aside)
+        return True
+
+    def remove_stale_spools(self, cutoff):
+        """Remove temp files left behind by crashed uploads; returns how many"""
+        removed = 0
+        for name in os.listdir(self.tmp_dir):
+            path = os.path.join(self.tmp_dir, name)
+            try:
+                if os.stat(path).st_mtime < cutoff:
+                    os.unlink(path)
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+    @staticmethod
+    def _touch(target):
+        """Refresh an existing file's mtime; False if it does not exist"""
+        try:
+            os.utime(target)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @staticmethod
+    def path_for(sha):
+        return os.path.join("objects", sha[:2], sha[2:4], sha)
+
+
+def get_attachment_store():
+    """This app's attachment store, created on first use"""
+    store = current_app.extensions.get("attachment_store")
+    if store is None:
+        store = current_app.extensions.setdefault("attachment_store", AttachmentStore(
+            current_app.config["ATTACHMENT_ROOT"],
+            current_app.config["ATTACHMENT_MAX_BYTES"],
+            current_app.config["ATTACHMENT_CHUNK_SIZE"]
+        ))
+    return store
+
+
+def streams_attachments(view):
+    """Mark a view whose file uploads should be spooled into the attachment store"""
+    view.streams_attachments = True
+    return view
+
+
+def upload_limit(config_key):
+    """Use another config value than MAX_CONTENT_LENGTH as a view's request size limit"""
+    def decorator(view):
+        view.max_content_length_key = config_key
+        return view
+    return decorator
+
+
+class AttachmentRequest(Request):
+    """Request that spools uploads for marked views into the attachment store
+    and applies per-view size limits"""
+
+    @property
+    def max_content_length(self):
+        view = current_app.view_functions.get(self.endpoint)
+        return current_app.config[getattr(view, "max_content_length_key", "MAX_CONTENT_LENGTH")]
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        view = current_app.view_functions.get(self.endpoint)
+        if getattr(view, "streams_attachments", False):
+            return get_attachment_store().spool()
+        return super()._get_file_stream(total_content_length, content_type, filename, content_length)
+
+
+class AttachmentService:
+    """Reference-counted attachment rows backed by the store"""
+
+    @staticmethod
+    def store_upload(file):
+        """
+        Store an uploaded file and take a reference to it
+
+        The row change is staged on the current session and commits with
+        the petition that uses it.
+
+        Args:
+            file: werkzeug FileStorage
+
+        Returns:
+            Attachment
+        """
+        sha, size, relative = get_attachment_store().put(file.stream)
+        upsert_increment(
+            Attachment,
+            {"sha256": sha},
+            "ref_count",
+            insert_values={"size": size, "content_type": file.mimetype, "path": relative}
+        )
+        return db.session.execute(
+            select(Attachment).where(Attachment.sha256 == sha)
+            .execution_options(populate_existing=True)
+        ).scalar_one()
+
+    @staticmethod
+    def sweep_orphans(grace_seconds=None):
+        """
+        Delete attachments no petition references, and stored files no
+        attachment row references
+
+        Files stored for a submission that then rolled back have no row;
+        rows lose their petitions when petitions are deleted. Only rows
+        created, and files touched, more than ATTACHMENT_ORPHAN_GRACE_SECONDS
+        ago are removed, which covers uploads whose transaction is still
+        open.
+
+        Returns:
+            tuple of (rows deleted, files removed)
+        """
+        store = get_attachment_store()
+        grace = grace_seconds if grace_seconds is not None else current_app.config["ATTACHMENT_ORPHAN_GRACE_SECONDS"]
+        cutoff = datetime.utcnow() - timedelta(seconds=grace)
+        unreferenced = ~exists().where(Petition.attachment_id == Attachment.id)
+
+        rows = 0
+        candidates = db.session.execute(
+            select(Attachment.id, Attachment.ref_count)
+            .where(Attachment.created_at < cutoff, unreferenced)
+        ).all()
+        for attachment_id, ref_count in candidates:
+            # A deduplicated upload bumps ref_count (holding the row lock
+            # until it commits), which makes this delete a no-op
+            rows += db.session.execute(
+                delete(Attachment)
+                .where(and_(Attachment.id == attachment_id, Attachment.ref_count == ref_count), unreferenced)
+                .execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+
+        files = 0
+        file_cutoff = time.time() - grace
+        stale = list(store.iter_stale(file_cutoff))
+        for start in range(0, len(stale), 500):
+            batch = dict(stale[start:start + 500])
+            referenced = set(db.session.execute(
+                select(Attachment.sha256).where(Attachment.sha256.in_(list(batch)))
+            ).scalars())
+            db.session.commit()
+            for sha, relative in batch.items():
+                if sha not in referenced and store.remove_stale(relative, file_cutoff):
+                    files += 1
+        files += store.remove_stale_spools(file_cutoff)
+
+        if rows or files:
+            logger.info("Attachment sweep: %d rows deleted, %d files removed", rows, files)
+        return rows, files
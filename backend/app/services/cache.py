@@ -0,0 +1,203 @@
+"""In-process caches and database-backed invalidation counters"""
+import hashlib
+import logging
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import wraps
+from flask import current_app, request, make_response
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session
+from app.extensions import db
+from app.models import CacheVersion
+from .db_utils import upsert_increment
+
+logger = logging.getLogger(__name__)
+
+
+class LRUCache:
+    """Thread-safe LRU cache bounded by entry count and, optionally, bytes.
+    
+    Entries can also expire after ``ttl`` seconds.
+    """
+    
+    def __init__(self, max_entries=512, max_bytes=None, size_of=None, ttl=None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size_of = size_of or (lambda value: 0)
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        """Return the cached value or None, marking it most recently used"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[2] is not None and entry[2] <= time.monotonic():
+                self._entries.pop(key)
+                self._bytes -= entry[1]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+    
+    def set(self, key, value):
+        """Store a value, evicting least recently used entries over budget"""
+        size = self.size_of(value)
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+            expires_at = time.monotonic() + self.ttl if self.ttl is not None else None
+            self._entries[key] = (value, size, expires_at)
+            self._bytes += size
+            
+            while len(self._entries) > self.max_entries or \
+                    (self.max_bytes is not None and self._bytes > self.max_bytes):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self.evictions += 1
+    
+    def delete(self, key):
+        """Drop a single entry if present"""
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[1]
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+    
+    def stats(self):
+        """Hit/miss counters and current size"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+            }
+
+
+class CacheVersions:
+    """Named version counters stored in the database.
+    
+    Writers bump a counter when their transaction commits; readers fold the
+    current versions into cache keys, so every worker sees an invalidation
+    right after the write. The increment runs in its own short transaction
+    after the commit, so concurrent writers never hold the counter row's
+    lock for the length of their transaction.
+    """
+    
+    @staticmethod
+    def get_many(names):
+        """Return a tuple of current versions, in the order given"""
+        rows = dict(db.session.execute(
+            select(CacheVersion.name, CacheVersion.version).where(CacheVersion.name.in_(names))
+        ).all())
+        return tuple(rows.get(name, 0) for name in names)
+    
+    @staticmethod
+    def bump(name):
+        """Increment a version counter once the current transaction commits"""
+        db.session.info.setdefault("pending_version_bumps", set()).add(name)
+    
+    @staticmethod
+    def bump_now(names):
+        """Increment version counters in a transaction of their own"""
+        with db.engine.begin() as connection:
+            for name in sorted(names):
+                upsert_increment(CacheVersion, {"name": name}, "version", connection=connection)
+
+
+def get_analytics_cache():
+    """Return the app's analytics response cache, creating it on first use"""
+    cache = current_app.extensions.get("analytics_cache")
+    if cache is None:
+        cache = current_app.extensions.setdefault("analytics_cache", LRUCache(
+            max_entries=current_app.config["ANALYTICS_CACHE_MAX_ENTRIES"],
+            max_bytes=current_app.config["ANALYTICS_CACHE_MAX_BYTES"],
+            size_of=lambda value: len(value[0])
+        ))
+    return cache
+
+
+def cached_response(*depends_on):
+    """
+    Cache a JSON view's 200 responses until any named version is bumped
+    
+    Entries are scoped globally for officers/admins and per user for
+    citizens, and carry an ETag so unchanged responses become 304s.
+    Must be applied below ``@jwt_required()``.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            from .identity import current_identity
+            identity = current_identity()
+            scope = f"user:{identity.user_id}" if identity.role == "citizen" else "global"
+            # The date is part of the key because default ranges slide daily
+            key = (
+                request.endpoint,
+                scope,
+                request.full_path,
+                datetime.utcnow().date().isoformat(),
+                CacheVersions.get_many(depends_on)
+            )
+            etag = hashlib.sha1(repr(key).encode()).hexdigest()
+            
+            if request.if_none_match.contains(etag):
+                response = current_app.response_class(status=304)
+            else:
+                cache = get_analytics_cache()
+                cached = cache.get(key)
+                if cached is None:
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    cache.set(key, (response.get_data(), response.mimetype))
+                else:
+                    body, mimetype = cached
+                    response = current_app.response_class(body, status=200, mimetype=mimetype)
+            
+            response.set_etag(etag)
+            response.headers["Cache-Control"] = "private, no-cache"
+            return response
+        
+        return wrapper
+    return decorator
+
+
+@event.listens_for(Session, "after_commit")
+def _bump_pending_versions(session):
+    names = session.info.pop("pending_version_bumps", None)
+    if names:
+        try:
+            CacheVersions.bump_now(names)
+        except Exception:
+            # The write itself is committed; don't fail the caller over it
+            logger.exception("Could not bump cache versions %s", sorted(names))
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_versions(session):
+    session.info.pop("pending_version_bumps", None)
@@ -0,0 +1,52 @@
+"""Small SQL helpers shared by services"""
+from sqlalchemy import insert, update
+from sqlalchemy.dialects import mysql, sqlite
+from app.extensions import db
+
+
+def upsert_increment(model, keys, column, amount=1, insert_values=None, connection=None):
+    """
+    Atomically add ``amount`` to ``column`` of the row matching ``keys``,
+    inserting the row if it does not exist yet
+
+    The statement is staged on the current session and commits with the
+    caller's transaction, or runs on ``connection`` when one is given.
+
+    Args:
+        model: Mapped class with a unique constraint over ``keys``
+        keys: dict of column name -> value identifying the row
+        column: Name of the integer column to increment
+        amount: Value to add
+        insert_values: Extra column values used only when inserting
+        connection: Connection to execute on instead of the session
+    """
+    executor = connection if connection is not None else db.session
+    dialect = (connection.dialect if connection is not None else db.session.get_bind().dialect).name
+    values = dict(keys, **(insert_values or {}), **{column: amount})
+    target = getattr(model, column)
+
+    if dialect == "mysql":
+        stmt = mysql.insert(model).values(**values)
+        stmt = stmt.on_duplicate_key_update({column: target + stmt.inserted[column]})
+        executor.execute(stmt)
+        return
+
+    if dialect == "sqlite":
+        stmt = sqlite.insert(model).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={column: target + stmt.excluded[column]}
+        )
+        executor.execute(stmt)
+        return
+
+    result = executor.execute(
+        update(model)
+        .where(*[getattr(model, name) == value for name, value in keys.items()])
+        .values({column: target + amount})
+    )
+    if result.rowcount == 0:
+        if connection is not None:
+            connection.execute(insert(model).values(**values))
+        else:
+            db.session.add(model(**values))
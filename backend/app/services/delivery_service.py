@@ -0,0 +1,342 @@
+"""Outbound SMS/email delivery through an outbox table"""
+import json
+import logging
+import random
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from email.message import EmailMessage
+from flask import current_app
+from sqlalchemy import select, update
+from app.extensions import db
+from app.models import OutboundMessage
+from .identity import load_user
+
+logger = logging.getLogger(__name__)
+
+
+class DeliveryProvider:
+    """Sends one channel's messages; subclasses implement send_batch"""
+
+    def send_batch(self, messages, pace=None):
+        """
+        Deliver a batch of outbox rows
+
+        Args:
+            messages: Claimed OutboundMessage rows
+            pace: Optional callable that blocks until the next message may
+                go out; call it before each message
+
+        Returns:
+            dict of message id -> error string (None on success)
+        """
+        raise NotImplementedError
+
+
+class LoopbackProvider(DeliveryProvider):
+    """Append messages to a JSON-lines file instead of sending them"""
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+
+    def send_batch(self, messages, pace=None):
+        with self._lock, open(self.path, "a") as f:
+            for m in messages:
+                if pace:
+                    pace()
+                f.write(json.dumps({
+                    "id": m.id,
+                    "channel": m.channel,
+                    "to": m.recipient,
+                    "subject": m.subject,
+                    "body": m.body,
+                    "sent_at": datetime.utcnow().isoformat()
+                }) + "\n")
+        return {m.id: None for m in messages}
+
+
+class TwilioSmsProvider(DeliveryProvider):
+    """Send SMS through Twilio"""
+
+    def __init__(self, account_sid, auth_token, from_number):
+        from twilio.rest import Client
+        self.client = Client(account_sid, auth_token)
+        self.from_number = from_number
+
+    def send_batch(self, messages, pace=None):
+        results = {}
+        for m in messages:
+            if pace:
+                pace()
+            try:
+                self.client.messages.create(to=m.recipient, from_=self.from_number, body=m.body)
+                results[m.id] = None
+            except Exception as e:
+                results[m.id] = str(e)
+        return results
+
+
+class SmtpEmailProvider(DeliveryProvider):
+    """Send email over one SMTP connection per batch"""
+
+    def __init__(self, host, port, username, password, sender, use_tls=True):
+        self.host = host
+        self.port = port
+        self.username = username
+        self.password = password
+        self.sender = sender
+        self.use_tls = use_tls
+
+    def send_batch(self, messages, pace=None):
+        results = {}
+        try:
+            with smtplib.SMTP(self.host, self.port, timeout=30) as smtp:
+                if self.use_tls:
+                    smtp.starttls()
+                if self.username:
+                    smtp.login(self.username, self.password)
+                for m in messages:
+                    email = EmailMessage()
+                    email["From"] = self.sender
+                    email["To"] = m.recipient
+                    email["Subject"] = m.subject or "Grievance update"
+                    email.set_content(m.body)
+                    if pace:
+                        pace()
+                    try:
+                        smtp.send_message(email)
+                        results[m.id] = None
+                    except smtplib.SMTPException as e:
+                        results[m.id] = str(e)
+        except (OSError, smtplib.SMTPException) as e:
+            for m in messages:
+                results.setdefault(m.id, str(e))
+        return results
+
+
+class RateLimiter:
+    """Pace a channel to ``rate`` messages per second (blocking, one thread)"""
+
+    def __init__(self, rate):
+        self.rate = rate
+        self._next_free = time.monotonic()
+
+    def wait(self, count=1):
+        if not self.rate:
+            return
+        now = time.monotonic()
+        start = max(now, self._next_free)
+        self._next_free = start + count / self.rate
+        if start > now:
+            time.sleep(start - now)
+
+
+def build_providers(config):
+    """Instantiate providers from DELIVERY_PROVIDERS, e.g. "sms:twilio,email:smtp" """
+    providers = {}
+    for entry in filter(None, (e.strip() for e in config["DELIVERY_PROVIDERS"].split(","))):
+        channel, _, kind = entry.partition(":")
+        if kind == "loopback":
+            providers[channel] = LoopbackProvider(config["DELIVERY_LOOPBACK_PATH"])
+        elif kind == "twilio":
+            providers[channel] = TwilioSmsProvider(
+                config["TWILIO_ACCOUNT_SID"], config["TWILIO_AUTH_TOKEN"], config["TWILIO_FROM_NUMBER"]
+            )
+        elif kind == "smtp":
+            providers[channel] = SmtpEmailProvider(
+                config["SMTP_HOST"], config["SMTP_PORT"], config["SMTP_USERNAME"],
+                config["SMTP_PASSWORD"], config["SMTP_SENDER"], config["SMTP_USE_TLS"]
+            )
+        else:
+            raise ValueError(f"Unknown delivery provider '{entry}'")
+    return providers
+
+
+def _parse_rates(value):
+    """Parse "sms:1,email:10" into {"sms": 1.0, "email": 10.0}"""
+    rates = {}
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        channel, _, rate = entry.partition(":")
+        rates[channel] = float(rate)
+    return rates
+
+
+class DeliveryService:
+    """Queue outbound messages and deliver them in the background"""
+
+    @staticmethod
+    def channels():
+        """Channels with a configured provider"""
+        return [
+            entry.split(":", 1)[0].strip()
+            for entry in current_app.config["DELIVERY_PROVIDERS"].split(",") if entry.strip()
+        ]
+
+    @staticmethod
+    def enqueue_for_user(user_id, body, subject=None, notification=None):
+        """
+        Stage outbox rows for every configured channel the user can receive
+
+        Only writes to the current session; providers are never called from
+        the request.
+        """
+        channels = DeliveryService.channels()
+        if not channels:
+            return []
+
+        user = load_user(user_id)
+        if user is None:
+            return []
+
+        contacts = {"sms": user["phone"], "email": user["email"]}
+        messages = []
+        for channel in channels:
+            if contacts.get(channel):
+                message = OutboundMessage(
+                    notification=notification,
+                    channel=channel,
+                    recipient=contacts[channel],
+                    subject=subject,
+                    body=body
+                )
+                db.session.add(message)
+                messages.append(message)
+        return messages
+
+
+class DeliveryWorker:
+    """Claims due outbox rows per channel and hands them to providers.
+
+    Each channel is drained on its own thread, so a paced SMS backlog does
+    not hold up email, and providers pace every message to the channel's
+    rate rather than sending whole batches at once.
+    """
+
+    def __init__(self, config, providers=None):
+        self.providers = providers if providers is not None else build_providers(config)
+        rates = _parse_rates(config["DELIVERY_RATE_LIMITS"])
+        self.limiters = {channel: RateLimiter(rates.get(channel)) for channel in self.providers}
+        self.batch_size = config["DELIVERY_BATCH_SIZE"]
+        self.max_attempts = config["DELIVERY_MAX_ATTEMPTS"]
+        self.retry_base = config["DELIVERY_RETRY_BASE_SECONDS"]
+        self.retry_max = config["DELIVERY_RETRY_MAX_SECONDS"]
+        self.claim_timeout = config["DELIVERY_CLAIM_TIMEOUT_SECONDS"]
+
+    def run_once(self):
+        """Deliver everything currently due; returns the number of rows processed"""
+        self._release_stale_claims()
+        app = current_app._get_current_object()
+        processed = {}
+        threads = [
+            threading.Thread(target=self._run_channel, args=(app, channel, processed), name=f"delivery-{channel}")
+            for channel in self.providers
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(processed.values())
+
+    def _run_channel(self, app, channel, processed):
+        """Drain one channel (in its own thread and app context, hence its own session)"""
+        provider = self.providers[channel]
+        limiter = self.limiters[channel]
+        processed[channel] = 0
+        with app.app_context():
+            try:
+                while True:
+                    batch = self._claim(channel)
+                    if not batch:
+                        break
+                    try:
+                        results = provider.send_batch(batch, pace=limiter.wait)
+                    except Exception as e:
+                        logger.exception("Delivery provider for %s failed", channel)
+                        results = {m.id: str(e) for m in batch}
+                    self._record(batch, results)
+                    processed[channel] += len(batch)
+            except Exception:
+                logger.exception("Delivery for %s stopped", channel)
+                db.session.rollback()
+
+    def _batch_size(self, channel):
+        """Rows to claim at once: small enough to send well within the claim timeout"""
+        rate = self.limiters[channel].rate
+        if not rate:
+            return self.batch_size
+        return max(1, min(self.batch_size, int(rate * self.claim_timeout / 2)))
+
+    def _claim(self, channel):
+        """Mark up to _batch_size() due rows as ours and return them"""
+        now = datetime.utcnow()
+        ids = db.session.execute(
+            select(OutboundMessage.id)
+            .where(
+                OutboundMessage.status == "pending",
+                OutboundMessage.channel == channel,
+                OutboundMessage.next_attempt_at <= now
+            )
+            .order_by(OutboundMessage.next_attempt_at)
+            .limit(self._batch_size(channel))
+        ).scalars().all()
+        if not ids:
+            return []
+
+        token = uuid.uuid4().hex
+        # The status guard makes the claim safe against other workers
+        db.session.execute(
+            update(OutboundMessage)
+            .where(OutboundMessage.id.in_(ids), OutboundMessage.status == "pending")
+            .values(status="sending", claim_token=token, claimed_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return OutboundMessage.query.filter_by(claim_token=token).all()
+
+    def _record(self, batch, results):
+        """Store per-message outcomes and schedule retries with backoff"""
+        now = datetime.utcnow()
+        for m in batch:
+            error = results.get(m.id, "No result from provider")
+            m.attempts += 1
+            m.claim_token = None
+            if error is None:
+                m.status = "sent"
+                m.sent_at = now
+                m.last_error = None
+            elif m.attempts >= self.max_attempts:
+                m.status = "failed"
+                m.last_error = error
+            else:
+                delay = min(self.retry_max, self.retry_base * 2 ** (m.attempts - 1))
+                m.status = "pending"
+                m.next_attempt_at = now + timedelta(seconds=delay * random.uniform(0.8, 1.2))
+                m.last_error = error
+        db.session.commit()
+
+    def _release_stale_claims(self):
+        """
+        Return rows claimed by a worker that died mid-batch to the queue
+
+        The lost claim counts as an attempt, so a message that keeps
+        crashing the worker is marked failed after max_attempts.
+        """
+        cutoff = datetime.utcnow() - timedelta(seconds=self.claim_timeout)
+        stale = (OutboundMessage.status == "sending", OutboundMessage.claimed_at < cutoff)
+        error = "Delivery worker stopped before finishing (claim expired)"
+        db.session.execute(
+            update(OutboundMessage)
+            .where(*stale, OutboundMessage.attempts + 1 >= self.max_attempts)
+            .values(status="failed", claim_token=None, attempts=OutboundMessage.attempts + 1, last_error=error)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(
+            update(OutboundMessage)
+            .where(*stale)
+            .values(status="pending", claim_token=None, attempts=OutboundMessage.attempts + 1, last_error=error)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
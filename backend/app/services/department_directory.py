@@ -0,0 +1,84 @@
+"""Process-wide department directory"""
+import threading
+import time
+from flask import current_app
+from sqlalchemy import select
+from app.extensions import db
+from app.models import Department
+from .cache import CacheVersions
+
+
+class DepartmentDirectory:
+    """Name/id lookups for the small, rarely-changing departments table.
+    
+    The table is loaded once per process and reloaded when the shared
+    ``departments`` version counter moves. That counter is only checked every
+    DEPARTMENT_DIRECTORY_CHECK_SECONDS, so steady-state lookups never touch
+    the database.
+    """
+    
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_id = {}
+        self._by_name = {}
+        self._version = None
+        self._checked_at = 0.0
+    
+    def _ensure_fresh(self):
+        interval = current_app.config["DEPARTMENT_DIRECTORY_CHECK_SECONDS"]
+        if self._version is not None and time.monotonic() - self._checked_at < interval:
+            return
+        
+        with self._lock:
+            if self._version is not None and time.monotonic() - self._checked_at < interval:
+                return
+            
+            (version,) = CacheVersions.get_many(("departments",))
+            if version != self._version:
+                rows = db.session.execute(
+                    select(Department.id, Department.name, Department.description, Department.email)
+                ).all()
+                by_id = {
+                    row.id: {
+                        "id": row.id,
+                        "name": row.name,
+                        "description": row.description,
+                        "email": row.email
+                    }
+                    for row in rows
+                }
+                self._by_id = by_id
+                self._by_name = {entry["name"]: entry for entry in by_id.values()}
+                self._version = version
+            self._checked_at = time.monotonic()
+    
+    def invalidate(self):
+        """Force a reload on next access (call after committing a change)"""
+        with self._lock:
+            self._version = None
+    
+    def get(self, department_id):
+        """Department dict by id, or None"""
+        self._ensure_fresh()
+        return self._by_id.get(department_id)
+    
+    def get_id(self, name):
+        """Department id by name, or None"""
+        self._ensure_fresh()
+        entry = self._by_name.get(name)
+        return entry["id"] if entry else None
+    
+    def name_for(self, department_id):
+        """Department name by id, or None"""
+        if department_id is None:
+            return None
+        entry = self.get(department_id)
+        return entry["name"] if entry else None
+    
+    def all(self):
+        """All departments ordered by id"""
+        self._ensure_fresh()
+        return [self._by_id[key] for key in sorted(self._by_id)]
+
+
+department_directory = DepartmentDirectory()
@@ -0,0 +1,270 @@
+"""In-process pub/sub for pushing events to connected clients"""
+import json
+import logging
+import os
+import queue
+import socket
+import threading
+import time
+from collections import OrderedDict, defaultdict, deque
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from app.extensions import db
+
+logger = logging.getLogger(__name__)
+
+# Datagrams larger than this are split by channel
+_MAX_CHANNELS_PER_DATAGRAM = 2000
+
+
+class Subscription:
+    """One connected client's bounded event queue"""
+
+    def __init__(self, channel, maxsize):
+        self.channel = channel
+        self._queue = queue.Queue(maxsize=maxsize)
+
+    def put(self, evt):
+        """Enqueue an event, dropping the oldest one if the client is slow"""
+        while True:
+            try:
+                self._queue.put_nowait(evt)
+                return
+            except queue.Full:
+                try:
+                    self._queue.get_nowait()
+                except queue.Empty:
+                    pass
+
+    def get(self, timeout):
+        """Next event, or None after ``timeout`` seconds of silence"""
+        try:
+            return self._queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+class EventBus:
+    """Fan events out to subscribers by channel (a user id).
+
+    Recently active channels keep a short history so reconnecting clients
+    can resume from their Last-Event-ID. With a broker configured, events
+    are also forwarded to the other worker processes on this host.
+    """
+
+    def __init__(self, history_size=100, history_channels=10000, queue_size=256):
+        self.history_size = history_size
+        self.history_channels = history_channels
+        self.queue_size = queue_size
+        self.broker_dir = None
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._history = OrderedDict()
+        self._last_id = 0
+        self._broker = None
+        self._listeners = defaultdict(list)
+
+    def configure(self, config):
+        """Apply app config (history limits, queue size, broker directory)"""
+        self.history_size = config["EVENT_HISTORY_SIZE"]
+        self.history_channels = config["EVENT_HISTORY_CHANNELS"]
+        self.queue_size = config["EVENT_QUEUE_SIZE"]
+        self.broker_dir = config["EVENT_BROKER_DIR"]
+
+    def subscribe(self, channel):
+        """Register a client on a channel"""
+        self.ensure_broker()
+        sub = Subscription(channel, self.queue_size)
+        with self._lock:
+            self._subscribers[channel].add(sub)
+        return sub
+
+    def add_listener(self, channel, callback):
+        """
+        Call ``callback(event)`` for every event on a channel, in any worker
+
+        Does not start the broker, so it is safe while a gunicorn master
+        preloads the app; workers start theirs after fork (ensure_broker),
+        other processes on their first publish or subscribe.
+        """
+        with self._lock:
+            self._listeners[channel].append(callback)
+
+    def unsubscribe(self, sub):
+        """Remove a client"""
+        with self._lock:
+            subs = self._subscribers.get(sub.channel)
+            if subs is not None:
+                subs.discard(sub)
+                if not subs:
+                    del self._subscribers[sub.channel]
+
+    def connection_count(self):
+        """Number of clients currently subscribed in this process"""
+        with self._lock:
+            return sum(len(subs) for subs in self._subscribers.values())
+
+    def publish(self, channels, event_type, data):
+        """
+        Deliver an event to every subscriber of the given channels
+
+        Args:
+            channels: A channel or an iterable of channels
+            event_type: SSE event name
+            data: JSON-serializable payload
+        """
+        if not isinstance(channels, (list, tuple, set, frozenset)):
+            channels = [channels]
+        channels = list(channels)
+        evt = {"id": self._next_id(), "type": event_type, "data": data}
+
+        self._deliver(channels, evt)
+
+        broker = self.ensure_broker()
+        if broker is not None:
+            for start in range(0, len(channels), _MAX_CHANNELS_PER_DATAGRAM):
+                broker.send({"channels": channels[start:start + _MAX_CHANNELS_PER_DATAGRAM], "event": evt})
+        return evt
+
+    def replay(self, channel, last_event_id):
+        """Events on a channel newer than ``last_event_id``, oldest first"""
+        with self._lock:
+            return [evt for evt in self._history.get(channel, ()) if evt["id"] > last_event_id]
+
+    def _deliver(self, channels, evt):
+        with self._lock:
+            targets = []
+            for channel in channels:
+                history = self._history.get(channel)
+                if history is None:
+                    history = self._history[channel] = deque(maxlen=self.history_size)
+                    if len(self._history) > self.history_channels:
+                        self._history.popitem(last=False)
+                else:
+                    self._history.move_to_end(channel)
+                history.append(evt)
+                targets.extend(self._subscribers.get(channel, ()))
+            callbacks = [cb for channel in channels for cb in self._listeners.get(channel, ())]
+        for sub in targets:
+            sub.put(evt)
+        for callback in callbacks:
+            try:
+                callback(evt)
+            except Exception:
+                logger.exception("Event listener failed")
+
+    def _next_id(self):
+        # Nanosecond clock ids are comparable across workers; the max() keeps
+        # them strictly increasing within this process
+        with self._lock:
+            self._last_id = max(self._last_id + 1, time.time_ns())
+            return self._last_id
+
+    def ensure_broker(self):
+        """Start this process's broker socket (again after a fork)"""
+        if not self.broker_dir:
+            return None
+        broker = self._broker
+        if broker is None or broker.pid != os.getpid():
+            with self._lock:
+                if self._broker is None or self._broker.pid != os.getpid():
+                    self._broker = LocalSocketBroker(self.broker_dir, self._deliver)
+                    self._broker.start()
+                broker = self._broker
+        return broker
+
+
+class LocalSocketBroker:
+    """Forward events between worker processes on one host.
+
+    Every worker binds a Unix datagram socket in a shared directory and
+    sends each event to all the other sockets there. Sockets left behind by
+    dead workers are removed on the first failed send; a worker whose
+    receive queue is full misses the event rather than stalling the sender.
+    """
+
+    def __init__(self, directory, deliver):
+        self.directory = directory
+        self.deliver = deliver
+        self.pid = os.getpid()
+        self.path = os.path.join(directory, f"{self.pid}.sock")
+        self._sock = None
+        self._full = set()  # peers whose queue was full on the last send
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._sock.bind(self.path)
+        threading.Thread(target=self._receive, name="event-broker", daemon=True).start()
+
+    def send(self, message):
+        payload = json.dumps(message).encode()
+        for name in os.listdir(self.directory):
+            if not name.endswith(".sock"):
+                continue
+            path = os.path.join(self.directory, name)
+            if path == self.path:
+                continue
+            try:
+                # Never wait on a peer: this runs in the after_commit hook of
+                # request threads, and a stopped worker's queue stays full
+                self._sock.sendto(payload, socket.MSG_DONTWAIT, path)
+                self._full.discard(path)
+            except BlockingIOError:
+                if path not in self._full:
+                    self._full.add(path)
+                    logger.warning("Event broker dropping events for %s: receive queue full", path)
+            except (ConnectionRefusedError, FileNotFoundError):
+                try:
+                    os.unlink(path)
+                except OSError:
+                    pass
+            except OSError as e:
+                logger.warning("Event broker could not reach %s: %s", path, e)
+
+    def _receive(self):
+        while True:
+            try:
+                payload = self._sock.recv(1 << 20)
+                message = json.loads(payload)
+                self.deliver(message["channels"], message["event"])
+            except Exception:
+                logger.exception("Event broker dropped a message")
+
+
+event_bus = EventBus()
+
+
+def publish_after_commit(channels, event_type, data):
+    """
+    Publish an event once the current transaction commits
+
+    ``data`` may be a callable; it is evaluated just before the commit,
+    after a flush, so it can read database-generated ids. Events are
+    discarded if the transaction rolls back.
+    """
+    db.session.info.setdefault("pending_events", []).append((channels, event_type, data))
+
+
+@event.listens_for(Session, "before_commit")
+def _resolve_pending_events(session):
+    pending = session.info.get("pending_events")
+    if pending and any(callable(data) for _, _, data in pending):
+        session.flush()
+        session.info["pending_events"] = [
+            (channels, event_type, data() if callable(data) else data)
+            for channels, event_type, data in pending
+        ]
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_pending_events(session):
+    for channels, event_type, data in session.info.pop("pending_events", []):
+        event_bus.publish(channels, event_type, data)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_pending_events(session):
+    session.info.pop("pending_events", None)
@@ -0,0 +1,75 @@
+"""Petition ID allocation from pre-reserved sequence blocks"""
+import os
+import threading
+from datetime import datetime
+from flask import current_app
+from sqlalchemy import insert, select, update
+from sqlalchemy.exc import IntegrityError
+from app.extensions import db
+from app.models import IdSequence
+
+
+class PetitionIdAllocator:
+    """Hand out PET-YYYY-NNNNNN ids without a database round trip per id.
+
+    Each process reserves a block of ID_BLOCK_SIZE numbers per year from
+    the ``id_sequences`` table, in its own short transaction on a separate
+    connection, and serves ids from memory until the block runs out. The
+    reservation is a single atomic UPDATE, so blocks never overlap between
+    processes or hosts. Numbers left in a block when a process exits are
+    skipped, never reused.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pid = os.getpid()
+        self._blocks = {}  # year -> [next, end)
+
+    def next_id(self, year=None):
+        """A new petition id, for the current year unless ``year`` is given"""
+        return self.allocate(1, year)[0]
+
+    def allocate(self, count, year=None):
+        """``count`` new petition ids for one year"""
+        year = year or datetime.utcnow().year
+        ids = []
+        with self._lock:
+            if self._pid != os.getpid():
+                # Forked: the parent may still serve from the same blocks
+                self._blocks.clear()
+                self._pid = os.getpid()
+            while len(ids) < count:
+                block = self._blocks.get(year)
+                if block is None or block[0] >= block[1]:
+                    size = max(current_app.config["ID_BLOCK_SIZE"], count - len(ids))
+                    block = self._blocks[year] = self._reserve(f"petition:{year}", size)
+                take = min(count - len(ids), block[1] - block[0])
+                ids.extend(range(block[0], block[0] + take))
+                block[0] += take
+        return [f"PET-{year}-{n:06d}" for n in ids]
+
+    @staticmethod
+    def _reserve(name, size):
+        """Claim the next ``size`` numbers of a sequence; returns [start, end)"""
+        for _ in range(3):
+            with db.engine.begin() as conn:
+                result = conn.execute(
+                    update(IdSequence)
+                    .where(IdSequence.name == name)
+                    .values(next_value=IdSequence.next_value + size)
+                )
+                if result.rowcount:
+                    end = conn.execute(
+                        select(IdSequence.next_value).where(IdSequence.name == name)
+                    ).scalar_one()
+                    return [end - size, end]
+            try:
+                with db.engine.begin() as conn:
+                    conn.execute(insert(IdSequence).values(name=name, next_value=1 + size))
+                return [1, 1 + size]
+            except IntegrityError:
+                continue  # another process created it first
+        raise RuntimeError(f"Could not reserve ids from sequence '{name}'")
+
+
+petition_ids = PetitionIdAllocator()
@@ -0,0 +1,135 @@
+"""Request identity from JWT claims, with a short-lived user cache"""
+import hashlib
+import secrets
+from collections import namedtuple
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, jsonify
+from flask_jwt_extended import get_jwt, get_jwt_identity
+from sqlalchemy import delete
+from app.extensions import db, jwt
+from app.models import StreamTicket, User
+from .cache import LRUCache
+
+Identity = namedtuple("Identity", ["user_id", "role", "token_version"])
+
+
+def _get_identity_cache():
+    cache = current_app.extensions.get("identity_cache")
+    if cache is None:
+        cache = current_app.extensions.setdefault("identity_cache", LRUCache(
+            max_entries=current_app.config["IDENTITY_CACHE_MAX_ENTRIES"],
+            ttl=current_app.config["IDENTITY_CACHE_TTL_SECONDS"]
+        ))
+    return cache
+
+
+def token_claims(user):
+    """Extra JWT claims issued at login"""
+    return {"role": user.role, "tv": user.token_version or 0}
+
+
+def load_user(user_id):
+    """
+    Get a user's row as a dict, cached for IDENTITY_CACHE_TTL_SECONDS
+
+    Returns:
+        dict with id, name, email, phone, role, token_version and
+        created_at, or None if the user does not exist
+    """
+    cache = _get_identity_cache()
+    row = cache.get(user_id)
+    if row is None:
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        row = {
+            "id": user.id,
+            "name": user.name,
+            "email": user.email,
+            "phone": user.phone,
+            "role": user.role,
+            "token_version": user.token_version or 0,
+            "created_at": user.created_at
+        }
+        cache.set(user_id, row)
+    return row
+
+
+def invalidate_user(user_id):
+    """Drop a user from this worker's identity cache"""
+    _get_identity_cache().delete(user_id)
+
+
+def current_identity():
+    """Identity of the authenticated caller, read from the token's claims"""
+    claims = get_jwt()
+    user_id = int(get_jwt_identity())
+    role = claims.get("role")
+    if role is None:
+        # Tokens issued before role claims existed
+        role = load_user(user_id)["role"]
+    return Identity(user_id, role, claims.get("tv", 0))
+
+
+def roles_required(*roles, message="Unauthorized"):
+    """Reject callers whose role is not in ``roles``; use below @jwt_required()"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if current_identity().role not in roles:
+                return jsonify({"error": message}), 403
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def is_token_revoked(claims):
+    """True if the token's user is gone or its version is outdated"""
+    user = load_user(int(claims["sub"]))
+    return user is None or claims.get("tv", 0) != user["token_version"]
+
+
+def issue_stream_ticket(user_id):
+    """
+    A one-time ticket that opens one event stream (EventSource can't send headers)
+
+    Only the ticket's hash is stored; it expires after STREAM_TICKET_TTL_SECONDS.
+
+    Returns:
+        The ticket string
+    """
+    now = datetime.utcnow()
+    ticket = secrets.token_urlsafe(32)
+    db.session.execute(delete(StreamTicket).where(StreamTicket.expires_at < now))
+    db.session.add(StreamTicket(
+        ticket_hash=hashlib.sha256(ticket.encode()).hexdigest(),
+        user_id=user_id,
+        expires_at=now + timedelta(seconds=current_app.config["STREAM_TICKET_TTL_SECONDS"])
+    ))
+    db.session.commit()
+    return ticket
+
+
+def redeem_stream_ticket(ticket):
+    """
+    Use up a stream ticket
+
+    Returns:
+        The ticket's user id, or None if it is unknown, expired or already used
+    """
+    ticket_hash = hashlib.sha256(ticket.encode()).hexdigest()
+    row = db.session.get(StreamTicket, ticket_hash)
+    user_id = row.user_id if row is not None and row.expires_at >= datetime.utcnow() else None
+    # The DELETE decides between concurrent redemptions of the same ticket
+    result = db.session.execute(delete(StreamTicket).where(StreamTicket.ticket_hash == ticket_hash))
+    db.session.commit()
+    if result.rowcount != 1 or user_id is None or load_user(user_id) is None:
+        return None
+    return user_id
+
+
+@jwt.token_in_blocklist_loader
+def _token_revoked(jwt_header, jwt_payload):
+    """Reject tokens whose version no longer matches the user's"""
+    return is_token_revoked(jwt_payload)
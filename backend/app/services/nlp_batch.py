@@ -0,0 +1,50 @@
+"""Batch NLP analysis for the importer and reprocessor process pools"""
+from .analysis_store import compact_analysis
+
+# One PetitionProcessor per pool process (or per caller when run inline)
+_worker_processor = None
+
+
+def init_worker():
+    """Pool initializer: load the NLP models once per process"""
+    global _worker_processor
+    from .petition_processor import PetitionProcessor
+    _worker_processor = PetitionProcessor()
+
+
+def analyze_batch(texts):
+    """
+    Run the NLP pipeline over (title, description) pairs
+
+    Returns:
+        list of (category, priority, sentiment, urgency, analysis, error)
+        tuples, where analysis is the compact_analysis() of the result
+    """
+    if _worker_processor is None:
+        init_worker()
+    results = []
+    for title, description in texts:
+        try:
+            analysis = _worker_processor.process_petition(title, description)
+            results.append((
+                analysis["classification"]["category"],
+                analysis["priority"]["level"],
+                analysis["sentiment"]["compound"],
+                analysis["urgency"]["level"],
+                compact_analysis(analysis),
+                None
+            ))
+        except Exception as e:
+            results.append((None, None, None, None, None, f"NLP failed: {e}"))
+    return results
+
+
+class InlineFuture:
+    """Stands in for a Future when no process pool is used"""
+
+    def __init__(self, fn, *args):
+        self._fn = fn
+        self._args = args
+
+    def result(self):
+        return self._fn(*self._args)
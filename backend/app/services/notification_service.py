@@ -1,66 +1,356 @@
 """Notification service for sending alerts"""
-from app.models import Notification
+import logging
+from collections import Counter, defaultdict
+from datetime import datetime
+from sqlalchemy import event, exists, func, literal, select, update, insert
+from app.models import Notification, NotificationCounter, Petition, User
 from app.extensions import db
+from .event_bus import publish_after_commit
+from .delivery_service import DeliveryService
+
+logger = logging.getLogger(__name__)
+
+# Fan-out selectors pick users directly or through the petitions they filed;
+# the two kinds can't be combined
+USER_SELECTOR_KEYS = ("user_ids", "all_users")
+PETITION_SELECTOR_KEYS = ("department_id", "category", "status", "petition_ids")
+SELECTOR_KEYS = PETITION_SELECTOR_KEYS + USER_SELECTOR_KEYS
+
+def _is_id(value):
+    # bool is an int subclass; JSON true/false are not ids
+    return isinstance(value, int) and not isinstance(value, bool)
+
 
 class NotificationService:
     """Handle notifications for petition updates"""
     
     @staticmethod
-    def create_notification(user_id, petition_id, message):
-        """Create a new notification"""
+    def create_notification(user_id, petition_id, message, commit=True):
+        """
+        Create a new notification
+        
+        With commit=False the row is only staged on the session, so the
+        caller can write it in the same transaction as its own changes.
+        """
         notification = Notification(
             user_id=user_id,
             petition_id=petition_id,
             message=message
         )
         db.session.add(notification)
-        db.session.commit()
+        NotificationService._adjust_unread(user_id, 1)
+        DeliveryService.enqueue_for_user(user_id, message, notification=notification)
+        publish_after_commit(user_id, "notification", lambda: {
+            "id": notification.id,
+            "message": message,
+            "petition_id": petition_id,
+            "created_at": notification.created_at.isoformat()
+        })
+        if commit:
+            db.session.commit()
         return notification
     
     @staticmethod
-    def get_user_notifications(user_id, unread_only=False):
-        """Get notifications for a user"""
+    def get_user_notifications(user_id, unread_only=False, limit=None, before_id=None, columns=None):
+        """
+        Get notifications for a user, newest first
+        
+        Args:
+            user_id: Recipient
+            unread_only: Only return unread notifications
+            limit: Page size (None returns everything)
+            before_id: Cursor - only return notifications older than this id
+            columns: Select these columns and return row tuples instead of
+                Notification objects (must include Notification.id)
+        """
         query = Notification.query.filter_by(user_id=user_id)
         
         if unread_only:
             query = query.filter_by(read_status=False)
         
-        return query.order_by(Notification.created_at.desc()).all()
+        if before_id is not None:
+            query = query.filter(Notification.id < before_id)
+        
+        # Ids grow with creation time and, unlike created_at, are unique, so
+        # they give stable cursors and ride the (user_id, read_status, id) index
+        query = query.order_by(Notification.id.desc())
+        
+        if limit is not None:
+            query = query.limit(limit)
+        
+        if columns is not None:
+            query = query.with_entities(*columns)
+        
+        return query.all()
     
     @staticmethod
-    def mark_as_read(notification_id):
-        """Mark notification as read"""
-        notification = Notification.query.get(notification_id)
-        if notification:
-            notification.read_status = True
-            db.session.commit()
+    def get_unread_count(user_id):
+        """Get a user's unread count from the counter row"""
+        unread = db.session.execute(
+            select(NotificationCounter.unread).where(NotificationCounter.user_id == user_id)
+        ).scalar()
+        if unread is not None:
+            return unread
+        
+        # Counters are created with the user (and by init_db for older users);
+        # until then count from the table rather than seed a racy counter
+        return db.session.execute(
+            select(func.count(Notification.id))
+            .where(Notification.user_id == user_id, Notification.read_status.is_(False))
+        ).scalar()
+    
+    @staticmethod
+    def mark_as_read(notification_id, user_id=None):
+        """Mark notification as read (optionally only if owned by user_id)"""
+        notification = db.session.get(Notification, notification_id)
+        if not notification or (user_id is not None and notification.user_id != user_id):
+            return None
+        
+        # Only the request whose UPDATE flips the flag moves the counter
+        result = db.session.execute(
+            update(Notification)
+            .where(Notification.id == notification_id, Notification.read_status.is_(False))
+            .values(read_status=True)
+        )
+        NotificationService._adjust_unread(notification.user_id, -result.rowcount)
+        db.session.commit()
         return notification
     
+    @staticmethod
+    def mark_many_as_read(user_id, notification_ids):
+        """Mark a user's notifications read in one statement; returns rows changed"""
+        if not notification_ids:
+            return 0
+        
+        result = db.session.execute(
+            update(Notification)
+            .where(
+                Notification.user_id == user_id,
+                Notification.id.in_(notification_ids),
+                Notification.read_status.is_(False)
+            )
+            .values(read_status=True)
+            .execution_options(synchronize_session=False)
+        )
+        NotificationService._adjust_unread(user_id, -result.rowcount)
+        db.session.commit()
+        return result.rowcount
+    
     @staticmethod
     def mark_all_as_read(user_id):
         """Mark all notifications as read for a user"""
-        Notification.query.filter_by(
-            user_id=user_id,
-            read_status=False
-        ).update({"read_status": True})
+        result = db.session.execute(
+            update(Notification)
+            .where(Notification.user_id == user_id, Notification.read_status.is_(False))
+            .values(read_status=True)
+            .execution_options(synchronize_session=False)
+        )
+        # Decrement rather than zero, so notifications committed meanwhile stay counted
+        NotificationService._adjust_unread(user_id, -result.rowcount)
         db.session.commit()
     
     @staticmethod
-    def notify_petition_submitted(user_id, petition_id, petition_title):
+    def rebuild_unread_counters():
+        """
+        Create missing counter rows and recompute every user's unread count
+        
+        Returns:
+            Number of users with a counter
+        """
+        db.session.execute(
+            insert(NotificationCounter).from_select(
+                ["user_id", "unread"],
+                select(User.id, literal(0)).where(~exists().where(NotificationCounter.user_id == User.id))
+            )
+        )
+        db.session.execute(update(NotificationCounter).values(unread=0))
+        counts = db.session.execute(
+            select(Notification.user_id, func.count(Notification.id))
+            .where(Notification.read_status.is_(False))
+            .group_by(Notification.user_id)
+        ).all()
+        if counts:
+            db.session.execute(update(NotificationCounter), [
+                {"user_id": user_id, "unread": unread} for user_id, unread in counts
+            ])
+        db.session.commit()
+        return db.session.execute(select(func.count()).select_from(NotificationCounter)).scalar()
+    
+    @staticmethod
+    def _adjust_unread(user_id, delta):
+        """
+        Shift a user's unread counter in the current session
+        
+        Every user gets a counter row when created (see _create_counter), so
+        concurrent writers only ever adjust it relatively.
+        """
+        if delta:
+            db.session.execute(
+                update(NotificationCounter)
+                .where(NotificationCounter.user_id == user_id)
+                .values(unread=NotificationCounter.unread + delta)
+            )
+    
+    @staticmethod
+    def create_many(rows):
+        """
+        Stage many notifications at once (in-app only, no delivery or push)
+        
+        Args:
+            rows: iterable of (user_id, petition_id, message)
+            
+        Returns:
+            Number of notifications staged
+        """
+        rows = list(rows)
+        if not rows:
+            return 0
+        now = datetime.utcnow()
+        db.session.execute(insert(Notification), [
+            {"user_id": user_id, "petition_id": petition_id, "message": message,
+             "read_status": False, "created_at": now}
+            for user_id, petition_id, message in rows
+        ])
+        
+        # One counter UPDATE per distinct increment rather than per user
+        per_user = Counter(user_id for user_id, _, _ in rows)
+        by_delta = defaultdict(list)
+        for user_id, delta in per_user.items():
+            by_delta[delta].append(user_id)
+        for delta, user_ids in by_delta.items():
+            db.session.execute(
+                update(NotificationCounter)
+                .where(NotificationCounter.user_id.in_(user_ids))
+                .values(unread=NotificationCounter.unread + delta)
+                .execution_options(synchronize_session=False)
+            )
+        return len(rows)
+    
+    @staticmethod
+    def fan_out(message, selector, batch_size=1000, progress=None):
+        """
+        Send the same notification to every user matched by a selector
+        
+        Recipients are streamed from the database in user-id order and
+        written with one multi-row INSERT and one counter UPDATE per batch,
+        each batch in its own transaction. Fan-out messages are in-app only
+        and are not queued for SMS/email delivery.
+        
+        Args:
+            message: Notification text
+            selector: dict with any of department_id, category, status and
+                petition_ids (users who filed matching petitions), or with
+                exactly one of user_ids (explicit list) and all_users=True
+            batch_size: Recipients per transaction
+            progress: Optional callable(sent_so_far) invoked after each batch
+            
+        Returns:
+            Number of notifications created
+        """
+        NotificationService._validate_selector(selector)
+        
+        sent = 0
+        for batch in NotificationService._iter_recipients(selector, batch_size):
+            now = datetime.utcnow()
+            db.session.execute(insert(Notification), [
+                {"user_id": user_id, "petition_id": None, "message": message,
+                 "read_status": False, "created_at": now}
+                for user_id in batch
+            ])
+            db.session.execute(
+                update(NotificationCounter)
+                .where(NotificationCounter.user_id.in_(batch))
+                .values(unread=NotificationCounter.unread + 1)
+                .execution_options(synchronize_session=False)
+            )
+            publish_after_commit(batch, "notification", {
+                "id": None,
+                "message": message,
+                "petition_id": None,
+                "created_at": now.isoformat()
+            })
+            db.session.commit()
+            
+            sent += len(batch)
+            logger.info("Notification fan-out: %d recipients sent", sent)
+            if progress:
+                progress(sent)
+        return sent
+    
+    @staticmethod
+    def _validate_selector(selector):
+        """Raise ValueError for empty, ambiguous or mixed selectors"""
+        user_keys = [key for key in USER_SELECTOR_KEYS if selector.get(key) is not None]
+        petition_keys = [key for key in PETITION_SELECTOR_KEYS if selector.get(key) is not None]
+        if not user_keys and not petition_keys:
+            raise ValueError(f"Selector needs at least one of: {', '.join(SELECTOR_KEYS)}")
+        if "all_users" in user_keys and selector["all_users"] is not True:
+            raise ValueError("all_users must be true when given")
+        if len(user_keys) > 1:
+            raise ValueError("Use either user_ids or all_users, not both")
+        if user_keys and petition_keys:
+            raise ValueError(
+                f"{user_keys[0]} can't be combined with petition filters ({', '.join(petition_keys)})"
+            )
+        for key in ("user_ids", "petition_ids"):
+            ids = selector.get(key)
+            if ids is not None and not (isinstance(ids, list) and all(_is_id(value) for value in ids)):
+                raise ValueError(f"{key} must be a list of integer ids")
+        if selector.get("department_id") is not None and not _is_id(selector["department_id"]):
+            raise ValueError("department_id must be an integer id")
+    
+    @staticmethod
+    def _iter_recipients(selector, batch_size):
+        """Yield sorted batches of distinct recipient user ids (keyset paginated)"""
+        if selector.get("all_users") is True or selector.get("user_ids") is not None:
+            id_column = User.id
+            query = select(User.id)
+            if selector.get("user_ids") is not None:
+                query = query.where(User.id.in_(set(selector["user_ids"])))
+        else:
+            id_column = Petition.user_id
+            query = select(Petition.user_id).distinct()
+            if selector.get("department_id") is not None:
+                query = query.where(Petition.department_id == selector["department_id"])
+            if selector.get("category"):
+                query = query.where(Petition.category == selector["category"])
+            if selector.get("status"):
+                query = query.where(Petition.status == selector["status"])
+            if selector.get("petition_ids") is not None:
+                query = query.where(Petition.id.in_(set(selector["petition_ids"])))
+        
+        last_id = 0
+        while True:
+            batch = db.session.execute(
+                query.where(id_column > last_id).order_by(id_column).limit(batch_size)
+            ).scalars().all()
+            if not batch:
+                return
+            yield batch
+            last_id = batch[-1]
+    
+    @staticmethod
+    def notify_petition_submitted(user_id, petition_id, petition_title, commit=True):
         """Send notification when petition is submitted"""
         message = f"Your petition '{petition_title}' has been submitted successfully. Petition ID: {petition_id}"
-        return NotificationService.create_notification(user_id, petition_id, message)
+        return NotificationService.create_notification(user_id, petition_id, message, commit=commit)
     
     @staticmethod
-    def notify_status_update(user_id, petition_id, new_status, comment=None):
+    def notify_status_update(user_id, petition_id, new_status, comment=None, commit=True):
         """Send notification when petition status changes"""
         message = f"Your petition status has been updated to: {new_status}"
         if comment:
             message += f". Comment: {comment}"
-        return NotificationService.create_notification(user_id, petition_id, message)
+        return NotificationService.create_notification(user_id, petition_id, message, commit=commit)
     
     @staticmethod
-    def notify_resolution(user_id, petition_id, resolution_comment):
+    def notify_resolution(user_id, petition_id, resolution_comment, commit=True):
         """Send notification when petition is resolved"""
         message = f"Your petition has been resolved. Resolution: {resolution_comment}"
-        return NotificationService.create_notification(user_id, petition_id, message)
+        return NotificationService.create_notification(user_id, petition_id, message, commit=commit)
+
+
+@event.listens_for(User, "after_insert")
+def _create_counter(mapper, connection, user):
+    """Give each new user an unread counter in the same transaction"""
+    connection.execute(insert(NotificationCounter).values(user_id=user.id, unread=0))
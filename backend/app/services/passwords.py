@@ -0,0 +1,99 @@
+"""Password hashing off the request threads, with hash parameter upgrades"""
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from flask import current_app
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+
+class PasswordHasherBusy(Exception):
+    """Too many hashes queued; the caller should retry shortly"""
+
+
+def normalize_method(method):
+    """
+    Spell out werkzeug's defaults, as they appear in stored hashes
+
+    "pbkdf2" -> "pbkdf2:sha256:600000", "scrypt" -> "scrypt:32768:8:1"
+    """
+    name, *args = method.split(":")
+    if name == "pbkdf2":
+        hash_name = args[0] if args else "sha256"
+        iterations = int(args[1]) if len(args) > 1 else DEFAULT_PBKDF2_ITERATIONS
+        return f"pbkdf2:{hash_name}:{iterations}"
+    if name == "scrypt":
+        n, r, p = args if args else (2 ** 15, 8, 1)
+        return f"scrypt:{n}:{r}:{p}"
+    raise ValueError(f"Unsupported password hash method '{method}'")
+
+
+class PasswordHasher:
+    """Hash and verify passwords on a small dedicated pool.
+
+    Key stretching is deliberately CPU-heavy. Running it on a bounded pool
+    keeps login peaks from occupying every request thread: at most
+    ``workers`` hashes run at once, at most ``max_pending`` wait, and
+    callers beyond that get PasswordHasherBusy after ``queue_timeout``
+    seconds instead of piling up. With ``executor="process"`` hashing
+    also leaves the worker process, so it can't hold the GIL against other
+    requests; "inline" hashes on the calling thread.
+    """
+
+    def __init__(self, method, executor="thread", workers=2, max_pending=16, queue_timeout=2.0):
+        self.method = normalize_method(method)
+        self.executor = executor
+        self.workers = workers
+        self.queue_timeout = queue_timeout
+        self._slots = threading.BoundedSemaphore(workers + max_pending)
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pid = None
+
+    def hash(self, password):
+        """A new hash of ``password`` with the configured method"""
+        return self._run(generate_password_hash, password, self.method)
+
+    def verify(self, stored_hash, password):
+        """True if ``password`` matches ``stored_hash``"""
+        return self._run(check_password_hash, stored_hash, password)
+
+    def needs_rehash(self, stored_hash):
+        """True if a hash was made with other parameters than the configured method"""
+        return stored_hash.split("$", 1)[0] != self.method
+
+    def _run(self, fn, *args):
+        if self.executor == "inline":
+            return fn(*args)
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            raise PasswordHasherBusy("Too many password checks in progress")
+        try:
+            return self._get_pool().submit(fn, *args).result()
+        finally:
+            self._slots.release()
+
+    def _get_pool(self):
+        # Created lazily, and again in a forked worker
+        if self._pool is None or self._pid != os.getpid():
+            with self._lock:
+                if self._pool is None or self._pid != os.getpid():
+                    if self.executor == "process":
+                        self._pool = ProcessPoolExecutor(self.workers)
+                    else:
+                        self._pool = ThreadPoolExecutor(self.workers, thread_name_prefix="password-hash")
+                    self._pid = os.getpid()
+        return self._pool
+
+
+def get_password_hasher():
+    """This app's password hasher, created on first use"""
+    hasher = current_app.extensions.get("password_hasher")
+    if hasher is None:
+        config = current_app.config
+        hasher = current_app.extensions.setdefault("password_hasher", PasswordHasher(
+            config["PASSWORD_HASH_METHOD"],
+            executor=config["PASSWORD_HASH_EXECUTOR"],
+            workers=config["PASSWORD_HASH_WORKERS"],
+            max_pending=config["PASSWORD_HASH_MAX_PENDING"],
+            queue_timeout=config["PASSWORD_HASH_QUEUE_TIMEOUT"]
+        ))
+    return hasher
@@ -0,0 +1,112 @@
+"""Streaming petition exports (CSV / NDJSON, optionally gzipped)"""
+import csv
+import io
+import json
+import zlib
+from sqlalchemy import select
+from app.extensions import db
+from app.models import Petition
+from .department_directory import department_directory
+
+EXPORT_COLUMNS = (
+    "id", "petition_id", "title", "description", "category", "department", "priority",
+    "urgency_level", "sentiment_score", "status", "created_at", "updated_at", "resolved_at"
+)
+
+
+def apply_petition_filters(query, user_id=None, status=None, priority=None, department=None):
+    """
+    Apply the petition list filters to a Query or select()
+
+    Args:
+        user_id: Only this user's petitions (citizen scope)
+        status: Status to match
+        priority: Priority to match
+        department: Department name; unknown names are ignored
+    """
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    if status:
+        query = query.filter_by(status=status)
+    if priority:
+        query = query.filter_by(priority=priority)
+    if department:
+        dept_id = department_directory.get_id(department)
+        if dept_id:
+            query = query.filter_by(department_id=dept_id)
+    return query
+
+
+class PetitionExporter:
+    """Stream petitions as encoded chunks without loading the result set.
+
+    Rows are fetched as plain tuples through a server-side cursor in
+    ``batch_size`` batches, and each batch is encoded and yielded before
+    the next one is read. Nothing else may query the session's connection
+    while the cursor is open.
+    """
+
+    @staticmethod
+    def iter_rows(batch_size=1000, **filters):
+        """Yield export rows as tuples in EXPORT_COLUMNS order, oldest first"""
+        query = select(
+            Petition.id, Petition.petition_id, Petition.title, Petition.description,
+            Petition.category, Petition.department_id, Petition.priority, Petition.urgency_level,
+            Petition.sentiment_score, Petition.status, Petition.created_at, Petition.updated_at,
+            Petition.resolved_at
+        )
+        query = apply_petition_filters(query, **filters).order_by(Petition.id)
+        # Resolve names from a snapshot: a directory refresh would query on
+        # this connection while the unbuffered cursor is still open
+        departments = {entry["id"]: entry["name"] for entry in department_directory.all()}
+        result = db.session.execute(query.execution_options(yield_per=batch_size))
+        for partition in result.partitions():
+            yield [
+                row[:5] + (departments.get(row[5]),) + row[6:10]
+                + tuple(value.isoformat() if value else None for value in row[10:])
+                for row in partition
+            ]
+
+    @staticmethod
+    def stream(fmt="csv", compress=False, batch_size=1000, **filters):
+        """
+        Yield the export as bytes, one chunk per batch
+
+        Args:
+            fmt: csv or ndjson
+            compress: gzip the output
+            batch_size: Rows per database fetch / output chunk
+            **filters: See apply_petition_filters
+        """
+        if fmt not in ("csv", "ndjson"):
+            raise ValueError("format must be csv or ndjson")
+        chunks = PetitionExporter._encode(fmt, PetitionExporter.iter_rows(batch_size, **filters))
+        return _gzip_chunks(chunks) if compress else chunks
+
+    @staticmethod
+    def _encode(fmt, batches):
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(EXPORT_COLUMNS)
+            yield buffer.getvalue().encode()
+            for batch in batches:
+                buffer.seek(0)
+                buffer.truncate()
+                writer.writerows(batch)
+                yield buffer.getvalue().encode()
+        else:
+            for batch in batches:
+                yield "".join(
+                    json.dumps(dict(zip(EXPORT_COLUMNS, row))) + "\n" for row in batch
+                ).encode()
+
+
+def _gzip_chunks(chunks):
+    """Gzip a chunk stream, flushing after each chunk so output keeps flowing"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
@@ -0,0 +1,410 @@
+"""Bulk import of legacy petitions from CSV or JSON-lines files"""
+import csv
+import io
+import json
+import logging
+import os
+import threading
+from collections import Counter, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timezone
+from sqlalchemy import insert, select, update
+from app.extensions import db
+from app.models import ImportJob, ImportRowError, Petition, PetitionStatus, User
+from .analysis_store import AnalysisService
+from .cache import CacheVersions
+from .department_directory import department_directory
+from .id_allocator import petition_ids
+from .nlp_batch import InlineFuture, analyze_batch, init_worker
+from .notification_service import NotificationService
+from .trend_service import TrendService
+from .sla_service import sla_due_at
+from .work_queue import OPEN_STATUSES, queue_score
+
+logger = logging.getLogger(__name__)
+
+STATUSES = ("submitted", "in_review", "in_progress", "resolved", "rejected")
+
+
+def read_rows(stream, fmt):
+    """
+    Yield (row_number, record) pairs from a binary CSV or JSONL stream
+
+    Unparseable JSON lines are yielded as (row_number, ValueError).
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8", newline="")
+    if fmt == "csv":
+        for number, record in enumerate(csv.DictReader(text), start=1):
+            yield number, record
+    elif fmt == "jsonl":
+        number = 0
+        for line in text:
+            if not line.strip():
+                continue
+            number += 1
+            try:
+                record = json.loads(line)
+                if not isinstance(record, dict):
+                    raise ValueError("expected a JSON object")
+                yield number, record
+            except ValueError as e:
+                yield number, ValueError(f"Invalid JSON: {e}")
+    else:
+        raise ValueError("format must be csv or jsonl")
+
+
+def detect_format(filename):
+    """csv or jsonl, from a file name"""
+    ext = filename.rsplit(".", 1)[-1].lower()
+    return "jsonl" if ext in ("jsonl", "ndjson", "json") else "csv"
+
+
+class PetitionImporter:
+    """Stream legacy petitions into the database in batches.
+
+    Rows are read lazily and grouped into batches; the NLP pipeline runs on
+    a process pool with a bounded number of batches in flight, and each
+    batch is written with multi-row INSERTs in its own transaction. The
+    same transaction advances the job's ImportJob row and records the
+    batch's row errors, so a rerun of the same job resumes exactly after
+    the last committed batch. Rows that fail validation or NLP are skipped
+    and reported, not retried.
+
+    Input columns: title, description, user_email or user_id, and
+    optionally petition_id (legacy id; allocated when missing), status and
+    created_at (ISO 8601).
+    """
+
+    def __init__(self, job_id, batch_size=500, workers=None, notify=False):
+        self.job_id = job_id
+        self.batch_size = batch_size
+        self.workers = os.cpu_count() if workers is None else workers
+        self.notify = notify
+        self._users = {}
+
+    def run(self, stream, fmt, progress=None):
+        """
+        Import every row of a CSV/JSONL stream
+
+        Args:
+            stream: Binary file object
+            fmt: csv or jsonl
+            progress: Optional callable(state dict) invoked after each batch
+
+        Returns:
+            dict with row (last row processed), imported and failed counts
+        """
+        state = self._start_job()
+        resume_after = state["row"]
+
+        executor = ProcessPoolExecutor(self.workers, initializer=init_worker) if self.workers > 1 else None
+        in_flight = deque()
+        max_in_flight = max(2, self.workers * 2)
+        try:
+            for batch in self._batches(read_rows(stream, fmt), resume_after):
+                texts = [(r["title"], r["description"]) for r in batch["valid"]]
+                future = executor.submit(analyze_batch, texts) if executor else InlineFuture(analyze_batch, texts)
+                in_flight.append((batch, future))
+                if len(in_flight) >= max_in_flight:
+                    self._finish(*in_flight.popleft(), state, progress)
+            while in_flight:
+                self._finish(*in_flight.popleft(), state, progress)
+            state["status"] = "completed"
+            self._end_job(state)
+        except Exception as e:
+            db.session.rollback()
+            state["status"] = "failed"
+            state["error"] = str(e)
+            self._end_job(state)
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+        return state
+
+    def _batches(self, rows, resume_after):
+        """Group validated rows into batches, skipping already imported rows"""
+        batch = {"valid": [], "errors": [], "last_row": resume_after}
+        for number, record in rows:
+            if number <= resume_after:
+                continue
+            batch["last_row"] = number
+            if isinstance(record, Exception):
+                batch["errors"].append({"row": number, "error": str(record)})
+            else:
+                try:
+                    batch["valid"].append(self._clean(number, record))
+                except ValueError as e:
+                    batch["errors"].append({"row": number, "petition_id": record.get("petition_id"), "error": str(e)})
+            if len(batch["valid"]) + len(batch["errors"]) >= self.batch_size:
+                yield batch
+                batch = {"valid": [], "errors": [], "last_row": number}
+        if batch["valid"] or batch["errors"]:
+            yield batch
+
+    @staticmethod
+    def _clean(number, record):
+        """Validate one input record; raises ValueError"""
+        title = str(record.get("title") or "").strip()
+        description = str(record.get("description") or "").strip()
+        if not title or not description:
+            raise ValueError("title and description are required")
+
+        petition_id = str(record.get("petition_id") or "").strip() or None
+
+        user_id = record.get("user_id")
+        email = str(record.get("user_email") or "").strip()
+        if not user_id and not email:
+            raise ValueError("user_email or user_id is required")
+        if user_id and not isinstance(user_id, (int, str)):
+            raise ValueError(f"invalid user_id {user_id!r}")
+
+        status = str(record.get("status") or "submitted").strip()
+        if status not in STATUSES:
+            raise ValueError(f"status must be one of {', '.join(STATUSES)}")
+
+        created_at = record.get("created_at")
+        if created_at and not isinstance(created_at, str):
+            raise ValueError(f"created_at must be an ISO 8601 string, got {created_at!r}")
+        try:
+            created_at = datetime.fromisoformat(created_at) if created_at else datetime.utcnow()
+        except ValueError:
+            raise ValueError(f"invalid created_at '{created_at}'")
+        if created_at.tzinfo is not None:
+            # Stored datetimes are naive UTC
+            created_at = created_at.astimezone(timezone.utc).replace(tzinfo=None)
+
+        return {
+            "row": number,
+            "petition_id": petition_id,
+            "user_id": int(user_id) if user_id else None,
+            "user_email": email,
+            "title": title[:200],
+            "description": description,
+            "status": status,
+            "created_at": created_at
+        }
+
+    def _finish(self, batch, future, state, progress):
+        """Write one analyzed batch, its row errors and the job's progress in one transaction"""
+        errors = list(batch["errors"])
+        rows = []
+        for record, (category, priority, sentiment, urgency, analysis, error) in zip(batch["valid"], future.result()):
+            if error:
+                errors.append({"row": record["row"], "petition_id": record["petition_id"], "error": error})
+                continue
+            record.update(category=category, priority=priority, sentiment=sentiment, urgency=urgency, analysis=analysis)
+            rows.append(record)
+
+        rows = self._resolve_users(rows, errors)
+        rows = self._drop_duplicates(rows, errors)
+        if rows:
+            self._write(rows)
+            CacheVersions.bump("petitions")
+        if errors:
+            db.session.execute(insert(ImportRowError), [
+                {"job_id": self.job_id, "row": error["row"], "error": error["error"],
+                 "petition_id": str(error["petition_id"])[:255] if error.get("petition_id") is not None else None}
+                for error in errors
+            ])
+        db.session.execute(
+            update(ImportJob)
+            .where(ImportJob.id == self.job_id)
+            .values(
+                last_row=batch["last_row"],
+                imported=ImportJob.imported + len(rows),
+                failed=ImportJob.failed + len(errors),
+                updated_at=datetime.utcnow()
+            )
+        )
+        db.session.commit()
+
+        state["row"] = batch["last_row"]
+        state["imported"] += len(rows)
+        state["failed"] += len(errors)
+        logger.info("Petition import: %d imported, %d failed (row %d)", state["imported"], state["failed"], state["row"])
+        if progress:
+            progress(dict(state))
+
+    def _resolve_users(self, rows, errors):
+        """Map user_email / user_id to existing users, caching across batches"""
+        emails = {r["user_email"] for r in rows if not r["user_id"]} - set(self._users)
+        ids = {r["user_id"] for r in rows if r["user_id"]} - set(self._users)
+        if emails:
+            for user_id, email in db.session.execute(select(User.id, User.email).where(User.email.in_(emails))):
+                self._users[email] = user_id
+        if ids:
+            for (user_id,) in db.session.execute(select(User.id).where(User.id.in_(ids))):
+                self._users[user_id] = user_id
+
+        resolved = []
+        for r in rows:
+            user_id = self._users.get(r["user_id"] or r["user_email"])
+            if user_id is None:
+                errors.append({"row": r["row"], "petition_id": r["petition_id"], "error": "unknown user"})
+            else:
+                r["user_id"] = user_id
+                resolved.append(r)
+        return resolved
+
+    @staticmethod
+    def _drop_duplicates(rows, errors):
+        """Reject petition ids already in the database or repeated in the batch"""
+        legacy_ids = [r["petition_id"] for r in rows if r["petition_id"]]
+        existing = set(db.session.execute(
+            select(Petition.petition_id).where(Petition.petition_id.in_(legacy_ids))
+        ).scalars()) if legacy_ids else set()
+
+        unique = []
+        for r in rows:
+            if r["petition_id"] is None:
+                unique.append(r)
+            elif r["petition_id"] in existing:
+                errors.append({"row": r["row"], "petition_id": r["petition_id"], "error": "duplicate petition_id"})
+            else:
+                existing.add(r["petition_id"])
+                unique.append(r)
+        return unique
+
+    def _write(self, rows):
+        """Multi-row INSERTs for petitions, their history, analyses and rollups"""
+        now = datetime.utcnow()
+        petitions = []
+        increments = Counter()
+        
+        # Rows without a legacy id get one for the year they were filed
+        missing = defaultdict(list)
+        for r in rows:
+            if r["petition_id"] is None:
+                missing[r["created_at"].year].append(r)
+        for year, year_rows in missing.items():
+            for r, petition_id in zip(year_rows, petition_ids.allocate(len(year_rows), year)):
+                r["petition_id"] = petition_id
+        
+        for r in rows:
+            department_id = department_directory.get_id(r["category"])
+            petitions.append({
+                "petition_id": r["petition_id"],
+                "user_id": r["user_id"],
+                "title": r["title"],
+                "description": r["description"],
+                "category": r["category"],
+                "department_id": department_id,
+                "priority": r["priority"],
+                "sentiment_score": r["sentiment"],
+                "urgency_level": r["urgency"],
+                "status": r["status"],
+                "created_at": r["created_at"],
+                "updated_at": now,
+                "resolved_at": r["created_at"] if r["status"] == "resolved" else None,
+                "queue_score": queue_score(
+                    r["priority"], r["urgency"], r["sentiment"], r["created_at"]
+                ) if r["status"] in OPEN_STATUSES else None,
+                "sla_due_at": _future_or_none(sla_due_at(r["category"], r["created_at"], r["status"]), now)
+            })
+            increments.update(TrendService.created_increments(
+                r["created_at"], department_directory.name_for(department_id),
+                r["category"], r["priority"], r["status"]
+            ))
+        db.session.execute(insert(Petition), petitions)
+
+        ids = dict(db.session.execute(
+            select(Petition.petition_id, Petition.id)
+            .where(Petition.petition_id.in_([r["petition_id"] for r in rows]))
+        ).all())
+
+        db.session.execute(insert(PetitionStatus), [
+            {"petition_id": ids[r["petition_id"]], "status": r["status"],
+             "comment": "Imported from legacy system", "updated_by": None, "timestamp": r["created_at"]}
+            for r in rows
+        ])
+        AnalysisService.record_many(
+            (ids[r["petition_id"]], r["created_at"], r["analysis"]) for r in rows
+        )
+        if self.notify:
+            NotificationService.create_many(
+                (r["user_id"], ids[r["petition_id"]],
+                 f"Your petition '{r['title']}' has been imported. Petition ID: {r['petition_id']}")
+                for r in rows
+            )
+        TrendService.apply_increments(increments)
+
+    def _start_job(self):
+        """Create or resume this job's row and mark it running; returns its state"""
+        job = db.session.get(ImportJob, self.job_id, with_for_update=True)
+        if job is None:
+            job = ImportJob(id=self.job_id, last_row=0, imported=0, failed=0)
+            db.session.add(job)
+        job.status = "running"
+        job.error = None
+        db.session.commit()
+        return {"row": job.last_row, "imported": job.imported, "failed": job.failed, "status": job.status}
+
+    def _end_job(self, state):
+        db.session.execute(
+            update(ImportJob)
+            .where(ImportJob.id == self.job_id)
+            .values(status=state["status"], error=state.get("error"), updated_at=datetime.utcnow())
+        )
+        db.session.commit()
+
+
+def _future_or_none(due, now):
+    """Legacy petitions already past their SLA are not escalated en masse"""
+    return due if due and due > now else None
+
+
+def read_import_state(job_id, errors=100):
+    """
+    Progress of an import job and its first row errors, or None
+
+    Args:
+        job_id: ImportJob id
+        errors: Maximum number of row errors to include (None for all)
+    """
+    job = db.session.get(ImportJob, job_id)
+    if job is None:
+        return None
+    rows = db.session.execute(
+        select(ImportRowError.row, ImportRowError.petition_id, ImportRowError.error)
+        .where(ImportRowError.job_id == job_id)
+        .order_by(ImportRowError.id)
+        .limit(errors)
+    ).all()
+    return {
+        "status": job.status,
+        "row": job.last_row,
+        "imported": job.imported,
+        "failed": job.failed,
+        "error": job.error,
+        "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+        "errors": [
+            {"row": row, "petition_id": petition_id, "error": error} if petition_id is not None
+            else {"row": row, "error": error}
+            for row, petition_id, error in rows
+        ]
+    }
+
+
+def start_import_job(app, source_path, fmt, job_id, **options):
+    """
+    Run an import on a background thread; progress and row errors are
+    recorded under ``job_id`` (see read_import_state)
+    """
+    importer = PetitionImporter(job_id, **options)
+    db.session.add(ImportJob(id=job_id, status="queued", last_row=0, imported=0, failed=0))
+    db.session.commit()
+
+    def run():
+        with app.app_context():
+            try:
+                with open(source_path, "rb") as f:
+                    importer.run(f, fmt)
+            except Exception:
+                logger.exception("Petition import %s failed", job_id)
+            finally:
+                db.session.remove()
+
+    thread = threading.Thread(target=run, name=f"petition-import-{job_id}", daemon=True)
+    thread.start()
+    return thread
@@ -1,7 +1,37 @@
 """Petition processing service - orchestrates NLP pipeline"""
 from app.nlp import TextPreprocessor, PetitionClassifier, SentimentAnalyzer, EntityExtractor
-from app.models import Department
-from datetime import datetime
+from .department_directory import department_directory
+from .id_allocator import petition_ids
+import threading
+import time
+
+# Entity stages that may be truncated or deferred under a budget, cheapest
+# first, and the extract_all_entities keys each one fills
+BUDGETED_STAGES = {
+    "locations": ("locations",),
+    "named_entities": ("names", "organizations"),
+}
+
+
+def truncate_text(text, max_chars):
+    """Cut text to at most max_chars, at a word boundary where possible"""
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(" ", 0, max_chars)
+    return text[:cut if cut > 0 else max_chars]
+
+
+def text_chunks(text, max_chars):
+    """Split text into pieces of at most max_chars, at sentence or word boundaries"""
+    while len(text) > max_chars:
+        cut = text.rfind(". ", 0, max_chars) + 1 or text.rfind(" ", 0, max_chars)
+        if cut <= 0:
+            cut = max_chars
+        yield text[:cut]
+        text = text[cut:].lstrip()
+    if text:
+        yield text
+
 
 class PetitionProcessor:
     """Main service for processing petitions with AI/NLP"""
@@ -11,18 +41,29 @@ class PetitionProcessor:
         self.classifier = PetitionClassifier()
         self.sentiment_analyzer = SentimentAnalyzer()
         self.entity_extractor = EntityExtractor()
+        self._cost_per_char = {}  # stage -> moving average of seconds per input char
     
-    def process_petition(self, title, description):
+    def process_petition(self, title, description, time_budget=None, max_chars=None):
         """
         Process petition through complete NLP pipeline
         
+        Preprocessing, classification, sentiment/urgency and the regex
+        entities always run on the full text. The expensive entity stages
+        (BUDGETED_STAGES) run on at most ``max_chars`` characters, and are
+        skipped when their estimated cost would overrun ``time_budget``.
+        
         Args:
             title: Petition title
             description: Petition description
+            time_budget: Seconds for the whole pipeline (None: unlimited)
+            max_chars: Longest input for the expensive stages (None: unlimited)
             
         Returns:
-            dict with all AI-generated insights
+            dict with all AI-generated insights; "degraded_stages" maps each
+            truncated or skipped stage to "truncated" or "deferred"
         """
+        started = time.perf_counter()
+        
         # Combine title and description for analysis
         full_text = f"{title}. {description}"
         
@@ -36,17 +77,40 @@ class PetitionProcessor:
         # 3. Analyze sentiment and calculate priority
         priority_analysis = self.sentiment_analyzer.calculate_priority(full_text)
         
-        # 4. Extract entities
-        entities = self.entity_extractor.extract_all_entities(full_text)
+        # 4. Extract entities: the regex ones always, the others within budget
+        entities = {
+            "dates": self.entity_extractor.extract_dates(full_text),
+            "phone_numbers": self.entity_extractor.extract_phone_numbers(full_text),
+            "emails": self.entity_extractor.extract_emails(full_text)
+        }
+        degraded_stages = {}
+        stage_text = full_text if max_chars is None else truncate_text(full_text, max_chars)
+        for stage, keys in BUDGETED_STAGES.items():
+            if time_budget is not None:
+                remaining = time_budget - (time.perf_counter() - started)
+                if remaining <= 0 or self._cost_per_char.get(stage, 0) * len(stage_text) > remaining:
+                    degraded_stages[stage] = "deferred"
+                    entities.update((key, []) for key in keys)
+                    continue
+            entities.update(self.run_stage(stage, stage_text))
+            if len(stage_text) < len(full_text):
+                degraded_stages[stage] = "truncated"
         entity_summary = self.entity_extractor.generate_summary(entities)
         
         # 5. Generate petition summary
-        summary = self._generate_summary(title, classification, priority_analysis, entities)
+        summary = self.generate_summary(
+            title,
+            classification["category"],
+            priority_analysis["priority"],
+            priority_analysis["urgency"]["urgency_level"],
+            entities
+        )
         
         return {
             "classification": {
                 "category": classification["category"],
-                "confidence": classification["confidence"]
+                "confidence": classification["confidence"],
+                "all_probabilities": classification.get("all_probabilities", {})
             },
             "priority": {
                 "level": priority_analysis["priority"],
@@ -63,28 +127,78 @@ class PetitionProcessor:
             "entities": entities,
             "keywords": keywords,
             "summary": summary,
+            "entity_summary": entity_summary,
+            "degraded_stages": degraded_stages,
             "preprocessed_text": preprocessed
         }
     
-    def _generate_summary(self, title, classification, priority_analysis, entities):
+    def run_stage(self, stage, text):
+        """Run one of BUDGETED_STAGES, returning its entity lists"""
+        started = time.perf_counter()
+        if stage == "locations":
+            result = {"locations": self.entity_extractor.extract_locations(text)}
+        else:
+            result = self.entity_extractor.extract_named_entities(text)
+        if text:
+            cost = (time.perf_counter() - started) / len(text)
+            previous = self._cost_per_char.get(stage)
+            self._cost_per_char[stage] = cost if previous is None else 0.8 * previous + 0.2 * cost
+        return result
+    
+    def complete_stages(self, title, description, stages, chunk_chars):
+        """
+        Run degraded stages over the full text, a chunk at a time
+        
+        Args:
+            title: Petition title
+            description: Petition description
+            stages: Names from BUDGETED_STAGES
+            chunk_chars: Largest piece of text handed to one stage call
+            
+        Returns:
+            dict of the stages' entity lists
+        """
+        found = {key: set() for stage in stages for key in BUDGETED_STAGES[stage]}
+        for chunk in text_chunks(f"{title}. {description}", chunk_chars):
+            for stage in stages:
+                for key, values in self.run_stage(stage, chunk).items():
+                    found[key].update(values)
+        entities = {key: sorted(values) for key, values in found.items()}
+        if "locations" in entities:
+            entities["locations"] = entities["locations"][:5]
+        return entities
+    
+    def generate_summary(self, title, category, priority, urgency_level, entities):
         """Generate human-readable summary of petition"""
         parts = [f"Petition: {title}"]
         
-        parts.append(f"Category: {classification['category']}")
-        parts.append(f"Priority: {priority_analysis['priority']}")
-        parts.append(f"Urgency: {priority_analysis['urgency']['urgency_level']}")
+        parts.append(f"Category: {category}")
+        parts.append(f"Priority: {priority}")
+        parts.append(f"Urgency: {urgency_level}")
         
         if entities.get('locations'):
             parts.append(f"Location: {entities['locations'][0]}")
         
         return " | ".join(parts)
     
-    def get_department_id(self, category_name, db_session):
+    def get_department_id(self, category_name):
         """Get department ID from category name"""
-        department = db_session.query(Department).filter_by(name=category_name).first()
-        return department.id if department else None
+        return department_directory.get_id(category_name)
     
     def generate_petition_id(self):
-        """Generate unique petition ID"""
-        timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        return f"PET-{timestamp}"
+        """Generate unique petition ID (PET-YYYY-NNNNNN)"""
+        return petition_ids.next_id()
+
+
+_shared_processor = None
+_shared_lock = threading.Lock()
+
+
+def get_processor():
+    """The process-wide PetitionProcessor, built (and its models trained) on first use"""
+    global _shared_processor
+    if _shared_processor is None:
+        with _shared_lock:
+            if _shared_processor is None:
+                _shared_processor = PetitionProcessor()
+    return _shared_processor
@@ -0,0 +1,334 @@
+"""Re-run the NLP pipeline over stored petitions"""
+import json
+import logging
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from sqlalchemy import delete, select, update
+from app.extensions import db
+from app.models import Petition, PetitionAnalysis, PetitionEntity, PetitionKeyword
+from .analysis_store import AnalysisService, analysis_digest
+from .cache import CacheVersions
+from .department_directory import department_directory
+from .nlp_batch import InlineFuture, analyze_batch, init_worker
+from .sla_service import SLA_STATUSES, keep_escalated_priority, sla_due_at
+from .track_cache import invalidate_tracking
+from .trend_service import TrendService
+from .work_queue import OPEN_STATUSES, queue_score
+
+logger = logging.getLogger(__name__)
+
+# Stored fields the pipeline derives, compared against fresh results
+DERIVED_FIELDS = ("category", "department_id", "priority", "urgency_level", "sentiment_score")
+
+# Derived fields the stored analysis (its summary) is written from
+ANALYSIS_FIELDS = {"category", "priority", "urgency_level"}
+
+# Trend rollup dimensions that depend on derived fields
+ROLLUP_DIMENSIONS = (("department", "department_id"), ("category", "category"), ("priority", "priority"))
+
+
+def _init_background_worker(niceness):
+    """Pool initializer: lower the worker's CPU priority, then load the models"""
+    if niceness:
+        try:
+            os.nice(niceness)
+        except (AttributeError, OSError):
+            pass
+    init_worker()
+
+
+class PetitionReprocessor:
+    """Refresh NLP-derived petition fields after a model or lexicon change.
+
+    Petitions are read in primary-key order in ``batch_size`` chunks
+    (keyset pagination, so each chunk is an index range scan no matter how
+    far the job has got). Chunks are analyzed on a low-priority process
+    pool with a bounded number in flight, and each chunk's changes are
+    written in one transaction: bulk UPDATEs by primary key, a fresh
+    stored analysis where it changed, and rollup corrections. A checkpoint records the last
+    petition id committed so a rerun resumes after it.
+
+    With ``dry_run`` nothing is written; every petition whose fields would
+    change is appended to the report file as a JSON line instead.
+    """
+
+    def __init__(self, batch_size=200, workers=1, dry_run=False, max_rate=0,
+                 niceness=10, checkpoint_path=None, report_path=None):
+        self.batch_size = batch_size
+        self.workers = workers
+        self.dry_run = dry_run
+        self.max_rate = max_rate
+        self.niceness = niceness
+        self.checkpoint_path = checkpoint_path
+        self.report_path = report_path
+
+    def run(self, progress=None):
+        """
+        Reprocess every petition after the checkpointed id
+
+        Args:
+            progress: Optional callable(state dict) invoked after each chunk
+
+        Returns:
+            dict with last_id, scanned, changed and failed counts
+        """
+        state = self._load_checkpoint()
+        state["status"] = "running"
+        state["dry_run"] = self.dry_run
+        self._save_checkpoint(state)
+
+        executor = None
+        if self.workers > 1:
+            executor = ProcessPoolExecutor(
+                self.workers, initializer=_init_background_worker, initargs=(self.niceness,)
+            )
+        in_flight = deque()
+        started = time.monotonic()
+        scanned_before = state["scanned"]
+        try:
+            for chunk in self._chunks(state["last_id"]):
+                texts = [(row.title, row.description) for row in chunk]
+                future = executor.submit(analyze_batch, texts) if executor else InlineFuture(analyze_batch, texts)
+                in_flight.append((chunk, future))
+                if len(in_flight) >= self.workers + 1:
+                    self._finish(*in_flight.popleft(), state, progress)
+                    self._throttle(started, state["scanned"] - scanned_before)
+            while in_flight:
+                self._finish(*in_flight.popleft(), state, progress)
+                self._throttle(started, state["scanned"] - scanned_before)
+            state["status"] = "completed"
+        except Exception as e:
+            db.session.rollback()
+            state["status"] = "failed"
+            state["error"] = str(e)
+            raise
+        finally:
+            if executor is not None:
+                executor.shutdown(cancel_futures=True)
+            self._save_checkpoint(state)
+        return state
+
+    def _chunks(self, after_id):
+        """Yield chunks of stored petitions with id > after_id, in id order"""
+        query = select(
+            Petition.id, Petition.petition_id, Petition.title, Petition.description, Petition.created_at,
+            Petition.status, Petition.escalated_at, *(getattr(Petition, field) for field in DERIVED_FIELDS)
+        ).order_by(Petition.id).limit(self.batch_size)
+        while True:
+            chunk = db.session.execute(query.where(Petition.id > after_id)).all()
+            # End the read transaction so long runs don't hold a snapshot open
+            db.session.commit()
+            if not chunk:
+                return
+            yield chunk
+            after_id = chunk[-1].id
+
+    def _finish(self, chunk, future, state, progress):
+        """Diff one analyzed chunk against the stored values and apply it"""
+        results = []
+        analyses = []
+        failed = []
+        for row, (category, priority, sentiment, urgency, analysis, error) in zip(chunk, future.result()):
+            if error:
+                failed.append({"id": row.id, "petition_id": row.petition_id, "error": error})
+                continue
+            results.append((row, {
+                "category": category,
+                "department_id": department_directory.get_id(category),
+                "priority": priority,
+                "urgency_level": urgency,
+                "sentiment_score": sentiment,
+            }))
+            analyses.append((row.id, row.created_at, analysis))
+
+        if self.dry_run:
+            changes = [(row, fresh, _diff(row, _adjusted(row, fresh))) for row, fresh in results]
+            changes = [change for change in changes if change[2]]
+            self._write_report([_report_line(row, diff) for row, _, diff in changes] + failed)
+        else:
+            changes = self._write(results, analyses)
+            self._write_report(failed)
+
+        state["last_id"] = chunk[-1].id
+        state["scanned"] += len(chunk)
+        state["changed"] += len(changes)
+        state["failed"] += len(failed)
+        self._save_checkpoint(state)
+        logger.info("Petition reprocessing: %d scanned, %d changed, %d failed (id %d)",
+                    state["scanned"], state["changed"], state["failed"], state["last_id"])
+        if progress:
+            progress(dict(state))
+
+    @staticmethod
+    def _write(results, analyses):
+        """
+        Apply one chunk's changes in a single transaction
+
+        The analysis ran on rows read before it, possibly seconds ago, so the
+        rows are locked and read again here; the diff, rollup moves and
+        queue scores come from their current values, not the earlier read.
+        Escalated petitions keep at least their escalated priority, and a
+        changed category moves an open petition's SLA deadline. Stored
+        analyses are only replaced for petitions whose category, priority,
+        urgency or analysis changed, so a rerun with the same models leaves
+        the analysis, entity and keyword tables alone.
+
+        Returns:
+            (current row, fresh values, diff) for each petition changed
+        """
+        fresh_by_id = {row.id: fresh for row, fresh in results}
+        changes = []
+        current = []
+        if fresh_by_id:
+            current = db.session.execute(
+                select(
+                    Petition.id, Petition.petition_id, Petition.created_at, Petition.status,
+                    Petition.escalated_at, *(getattr(Petition, field) for field in DERIVED_FIELDS)
+                )
+                .where(Petition.id.in_(fresh_by_id))
+                .order_by(Petition.id)
+                .with_for_update()
+            ).all()
+            for row in current:
+                fresh = _adjusted(row, fresh_by_id[row.id])
+                diff = _diff(row, fresh)
+                if diff:
+                    changes.append((row, fresh, diff))
+
+        if changes:
+            db.session.execute(update(Petition), [
+                dict(
+                    fresh,
+                    id=row.id,
+                    queue_score=queue_score(
+                        fresh["priority"], fresh["urgency_level"], fresh["sentiment_score"], row.created_at
+                    ) if row.status in OPEN_STATUSES else None,
+                    **({"sla_due_at": sla_due_at(fresh["category"], row.created_at, row.status)}
+                       if "category" in diff and row.status in SLA_STATUSES and row.escalated_at is None else {})
+                )
+                for row, fresh, diff in changes
+            ])
+
+            # Move each changed petition between its created-day rollup buckets
+            increments = Counter()
+            for row, fresh, diff in changes:
+                day = row.created_at.date()
+                for dimension, field in ROLLUP_DIMENSIONS:
+                    if field in diff:
+                        old, new = diff[field]
+                        increments[(day, dimension, _bucket(dimension, old))] -= 1
+                        increments[(day, dimension, _bucket(dimension, new))] += 1
+            TrendService.apply_increments(increments)
+            CacheVersions.bump("petitions")
+            invalidate_tracking(row.petition_id for row, _, _ in changes)
+
+        rewrite = _changed_analyses(analyses, {row.id for row in current}, changes)
+        if rewrite:
+            ids = [petition_id for petition_id, _, _ in rewrite]
+            for model in (PetitionEntity, PetitionKeyword, PetitionAnalysis):
+                db.session.execute(delete(model).where(model.petition_id.in_(ids)))
+            AnalysisService.record_many(rewrite)
+        db.session.commit()
+        return changes
+
+    def _throttle(self, started, scanned):
+        """Sleep as needed to stay under max_rate petitions per second"""
+        if self.max_rate:
+            delay = scanned / self.max_rate - (time.monotonic() - started)
+            if delay > 0:
+                time.sleep(delay)
+
+    def _load_checkpoint(self):
+        state = {"last_id": 0, "scanned": 0, "changed": 0, "failed": 0}
+        if self.checkpoint_path and os.path.exists(self.checkpoint_path):
+            with open(self.checkpoint_path) as f:
+                saved = json.load(f)
+            # A dry run never commits anything, so it can't be resumed into a real run
+            if saved.get("dry_run") == self.dry_run:
+                state.update(saved)
+            state.pop("error", None)
+        return state
+
+    def _save_checkpoint(self, state):
+        if not self.checkpoint_path:
+            return
+        state["updated_at"] = datetime.utcnow().isoformat()
+        tmp = f"{self.checkpoint_path}.tmp"
+        with open(tmp, "w") as f:
+            json.dump(state, f)
+        os.replace(tmp, self.checkpoint_path)
+
+    def _write_report(self, lines):
+        if not lines or not self.report_path:
+            return
+        with open(self.report_path, "a") as f:
+            for line in lines:
+                f.write(json.dumps(line) + "\n")
+
+
+def _changed_analyses(analyses, current_ids, changes):
+    """
+    The analyses that differ from what is stored
+
+    Args:
+        analyses: (petition id, created_at, compact_analysis()) tuples
+        current_ids: Ids of the petitions that still exist
+        changes: (row, fresh values, diff) for the petitions being updated
+    """
+    analyses = [item for item in analyses if item[0] in current_ids]
+    if not analyses:
+        return []
+    moved = {row.id for row, _, diff in changes if diff.keys() & ANALYSIS_FIELDS}
+    stored = dict(db.session.execute(
+        select(PetitionAnalysis.petition_id, PetitionAnalysis.analysis_digest)
+        .where(PetitionAnalysis.petition_id.in_([petition_id for petition_id, _, _ in analyses]))
+    ).all())
+    return [
+        (petition_id, created_at, analysis)
+        for petition_id, created_at, analysis in analyses
+        if petition_id in moved or stored.get(petition_id) != analysis_digest(analysis)
+    ]
+
+
+def _adjusted(row, fresh):
+    """Fresh values to store for a row: an escalated petition's priority is never lowered"""
+    if row.escalated_at is None:
+        return fresh
+    return dict(fresh, priority=keep_escalated_priority(row.priority, fresh["priority"]))
+
+
+def _diff(row, fresh):
+    """{field: (stored, fresh)} for the derived fields that would change"""
+    return {
+        field: (getattr(row, field), value)
+        for field, value in fresh.items()
+        if not _same(getattr(row, field), value)
+    }
+
+
+def _same(old, new):
+    if isinstance(old, float) or isinstance(new, float):
+        return old is not None and new is not None and round(old, 4) == round(new, 4)
+    return old == new
+
+
+def _bucket(dimension, value):
+    """Rollup bucket value, with the same fallbacks as TrendService.created_increments"""
+    if dimension == "department":
+        return department_directory.name_for(value) or "Unassigned"
+    if dimension == "category":
+        return value or "Unclassified"
+    return value or "medium"
+
+
+def _report_line(row, diff):
+    """One dry-run report entry: {field: {"from", "to"}} per changed field"""
+    changes = {}
+    for field, (old, new) in diff.items():
+        if field == "department_id":
+            field, old, new = "department", department_directory.name_for(old), department_directory.name_for(new)
+        changes[field] = {"from": old, "to": new}
+    return {"id": row.id, "petition_id": row.petition_id, "changes": changes}
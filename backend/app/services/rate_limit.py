@@ -0,0 +1,203 @@
+"""Token-bucket rate limiting for expensive and public endpoints"""
+import fcntl
+import hashlib
+import math
+import mmap
+import os
+import struct
+import threading
+import time
+from functools import wraps
+from flask import current_app, jsonify, request
+
+PERIODS = {"second": 1, "minute": 60, "hour": 3600, "day": 86400}
+
+
+def parse_limits(value):
+    """
+    Parse "login:10/minute,track:60/minute" into {name: (capacity, refill per second)}
+
+    A limit of N/period allows a burst of N requests and refills at
+    N/period tokens per second.
+    """
+    limits = {}
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        name, _, spec = entry.partition(":")
+        count, _, period = spec.partition("/")
+        if period not in PERIODS:
+            raise ValueError(f"Unknown rate limit period '{period}' in '{entry}'")
+        limits[name.strip()] = (float(count), float(count) / PERIODS[period])
+    return limits
+
+
+def _take(tokens, updated, now, capacity, rate):
+    """
+    One token-bucket decision
+
+    Returns:
+        (tokens left, seconds to wait or 0 if allowed)
+    """
+    tokens = min(capacity, tokens + (now - updated) * rate)
+    if tokens >= 1:
+        return tokens - 1, 0.0
+    return tokens, (1 - tokens) / rate
+
+
+class MemoryBucketStore:
+    """Buckets in a dict, private to this process"""
+
+    def __init__(self, max_entries=100000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._buckets = {}  # key -> [tokens, updated]
+
+    def take(self, key, capacity, rate):
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(key)
+            if bucket is None:
+                if len(self._buckets) >= self.max_entries:
+                    self._prune(now)
+                bucket = self._buckets[key] = [capacity, now]
+            bucket[0], wait = _take(bucket[0], bucket[1], now, capacity, rate)
+            bucket[1] = now
+            return wait
+
+    def _prune(self, now):
+        """Forget buckets idle long enough to have refilled (they'd start full anyway)"""
+        self._buckets = {
+            key: bucket for key, bucket in self._buckets.items()
+            if now - bucket[1] < 3600
+        }
+        if len(self._buckets) >= self.max_entries:
+            self._buckets.clear()
+
+
+class SharedBucketStore:
+    """Buckets in a memory-mapped file shared by every worker on the host.
+
+    The file is a fixed table of ``slots`` 24-byte records (key hash,
+    tokens, last update), grouped into 4-way sets. A key lives in one set,
+    guarded by a byte-range lock on that set, so workers only contend when
+    they touch the same set. When a set is full the least recently used
+    record is reused; with the default table size that only happens under
+    a very large number of distinct clients, and the evicted client simply
+    starts again with a full bucket.
+    """
+
+    RECORD = struct.Struct("<Qdd")
+    WAYS = 4
+
+    def __init__(self, path, slots=65536):
+        self.path = path
+        self.sets = max(1, slots // self.WAYS)
+        self.size = self.sets * self.WAYS * self.RECORD.size
+        self._lock = threading.Lock()  # fcntl locks don't exclude threads of one process
+        self._pid = None
+        self._fd = None
+        self._map = None
+
+    def _open(self):
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(fd).st_size < self.size:
+            os.ftruncate(fd, self.size)
+        self._fd = fd
+        self._map = mmap.mmap(fd, self.size)
+        self._pid = os.getpid()
+
+    def take(self, key, capacity, rate):
+        digest = int.from_bytes(hashlib.blake2b(key.encode(), digest_size=8).digest(), "little") or 1
+        start = (digest % self.sets) * self.WAYS * self.RECORD.size
+        length = self.WAYS * self.RECORD.size
+        with self._lock:
+            if self._pid != os.getpid():
+                self._open()
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, length, start)
+            try:
+                now = time.time()
+                victim = None
+                for way in range(self.WAYS):
+                    offset = start + way * self.RECORD.size
+                    stored, tokens, updated = self.RECORD.unpack_from(self._map, offset)
+                    if stored == digest:
+                        break
+                    if victim is None or updated < victim[1]:
+                        victim = (offset, updated)
+                else:
+                    offset, tokens, updated = victim[0], capacity, now
+                tokens, wait = _take(tokens, updated, now, capacity, rate)
+                self.RECORD.pack_into(self._map, offset, digest, tokens, now)
+                return wait
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, length, start)
+
+
+class RateLimiter:
+    """Named limits (RATE_LIMITS) applied to keys in a bucket store"""
+
+    def __init__(self, limits, store):
+        self.limits = limits
+        self.store = store
+
+    def check(self, name, key):
+        """Seconds until ``key`` may call limit ``name`` again, or 0 (and consume a token)"""
+        limit = self.limits.get(name)
+        if limit is None:
+            return 0.0
+        capacity, rate = limit
+        return self.store.take(f"{name}:{key}", capacity, rate)
+
+
+def get_rate_limiter():
+    """This app's rate limiter, created on first use"""
+    limiter = current_app.extensions.get("rate_limiter")
+    if limiter is None:
+        config = current_app.config
+        if config["RATE_LIMIT_STORE"] == "shared":
+            store = SharedBucketStore(config["RATE_LIMIT_SHARED_PATH"], config["RATE_LIMIT_SHARED_SLOTS"])
+        else:
+            store = MemoryBucketStore()
+        limiter = current_app.extensions.setdefault(
+            "rate_limiter", RateLimiter(parse_limits(config["RATE_LIMITS"]), store)
+        )
+    return limiter
+
+
+def _client_ip():
+    return request.remote_addr or "unknown"
+
+
+def _current_user():
+    from .identity import current_identity
+    return current_identity().user_id
+
+
+KEY_FUNCTIONS = {"ip": _client_ip, "user": _current_user}
+
+
+def rate_limit(name, by="ip"):
+    """
+    Reject calls over limit ``name`` from RATE_LIMITS with 429 and Retry-After
+
+    Args:
+        name: Limit name in RATE_LIMITS; unknown names are not limited
+        by: "ip", "user" (use below @jwt_required()) or a callable
+            returning the key; calls whose key is None are not limited
+    """
+    key_function = KEY_FUNCTIONS[by] if isinstance(by, str) else by
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if current_app.config["RATE_LIMIT_ENABLED"]:
+                key = key_function()
+                if key is not None:
+                    wait = get_rate_limiter().check(name, key)
+                    if wait:
+                        response = jsonify({"error": "Too many requests. Please try again later."})
+                        response.status_code = 429
+                        response.headers["Retry-After"] = str(math.ceil(wait))
+                        return response
+            return view(*args, **kwargs)
+        return wrapper
+    return decorator
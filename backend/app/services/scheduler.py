@@ -0,0 +1,125 @@
+"""Background jobs run by APScheduler"""
+import fcntl
+import logging
+import threading
+from apscheduler.schedulers.background import BackgroundScheduler
+from app.extensions import db
+from .delivery_service import DeliveryWorker
+from .work_queue import WorkQueue
+from .sla_service import SLAService
+from .analysis_store import AnalysisService
+from .attachment_store import AttachmentService
+from .trend_service import TrendService
+
+logger = logging.getLogger(__name__)
+
+
+def init_scheduler(app):
+    """
+    Start the background scheduler if SCHEDULER_ENABLED is set
+
+    Enable it in exactly one process per deployment (or run a dedicated
+    worker process); jobs claim rows safely but duplicate schedulers waste
+    connections. Never call this in a process that forks afterwards (a
+    preloading gunicorn master): the children would inherit locks held by
+    the scheduler's threads. Workers use elect_scheduler instead.
+    """
+    if not app.config["SCHEDULER_ENABLED"]:
+        return None
+
+    scheduler = BackgroundScheduler(daemon=True)
+
+    if app.config["DELIVERY_PROVIDERS"]:
+        worker = DeliveryWorker(app.config)
+        scheduler.add_job(
+            _in_app_context(app, worker.run_once),
+            "interval",
+            seconds=app.config["DELIVERY_INTERVAL_SECONDS"],
+            id="outbound-delivery",
+            max_instances=1,
+            coalesce=True
+        )
+
+    scheduler.add_job(
+        _in_app_context(app, WorkQueue.release_stale),
+        "interval",
+        seconds=app.config["QUEUE_RELEASE_INTERVAL_SECONDS"],
+        id="release-stale-claims",
+        max_instances=1,
+        coalesce=True
+    )
+
+    scheduler.add_job(
+        _in_app_context(app, SLAService.escalate_overdue),
+        "interval",
+        seconds=app.config["SLA_CHECK_INTERVAL_SECONDS"],
+        id="sla-escalation",
+        max_instances=1,
+        coalesce=True
+    )
+
+    scheduler.add_job(
+        _in_app_context(app, AnalysisService.complete_pending),
+        "interval",
+        seconds=app.config["NLP_COMPLETION_INTERVAL_SECONDS"],
+        id="nlp-completion",
+        max_instances=1,
+        coalesce=True
+    )
+
+    scheduler.add_job(
+        _in_app_context(app, TrendService.fold_pending),
+        "interval",
+        seconds=app.config["TREND_ROLLUP_INTERVAL_SECONDS"],
+        id="trend-rollup",
+        max_instances=1,
+        coalesce=True
+    )
+
+    scheduler.add_job(
+        _in_app_context(app, AttachmentService.sweep_orphans),
+        "interval",
+        seconds=app.config["ATTACHMENT_SWEEP_INTERVAL_SECONDS"],
+        id="attachment-sweep",
+        max_instances=1,
+        coalesce=True
+    )
+
+    scheduler.start()
+    app.extensions["scheduler"] = scheduler
+    return scheduler
+
+
+def elect_scheduler(app):
+    """
+    Run the scheduler in this process once it holds SCHEDULER_LOCK_PATH
+
+    Called in every gunicorn worker after fork. A daemon thread waits on an
+    exclusive flock; the lock is released when its holder exits, so a
+    replacement or sibling worker takes over after restarts and reloads.
+    """
+    if not app.config["SCHEDULER_ENABLED"]:
+        return None
+
+    def wait_for_lock():
+        lock = open(app.config["SCHEDULER_LOCK_PATH"], "a")
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        app.extensions["scheduler_lock"] = lock  # held for the life of the process
+        logger.info("Scheduler elected in this worker")
+        init_scheduler(app)
+
+    thread = threading.Thread(target=wait_for_lock, name="scheduler-election", daemon=True)
+    thread.start()
+    return thread
+
+
+def _in_app_context(app, job):
+    """Wrap a job so it runs inside an app context and never kills the thread"""
+    def run():
+        with app.app_context():
+            try:
+                job()
+            except Exception:
+                logger.exception("Scheduled job %s failed", getattr(job, "__qualname__", job))
+                db.session.rollback()
+    return run
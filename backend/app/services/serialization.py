@@ -0,0 +1,97 @@
+"""Declarative row schemas and a fast JSON response path"""
+import json
+import zlib
+from datetime import date, datetime
+from flask import current_app, request
+
+try:
+    import orjson
+except ImportError:  # optional; the stdlib encoder produces the same documents
+    orjson = None
+
+
+class Field:
+    """One output key, read from one or more selected columns.
+
+    ``transform`` receives the column values positionally; without it the
+    single column value is emitted as is (datetimes are encoded as ISO 8601
+    by the JSON encoder).
+    """
+
+    def __init__(self, name, *columns, transform=None):
+        self.name = name
+        self.columns = columns
+        self.transform = transform
+
+
+class Schema:
+    """Ordered fields mapping selected row tuples to response dicts"""
+
+    def __init__(self, *fields):
+        self.fields = fields
+        self._slices = []
+        offset = 0
+        for field in fields:
+            self._slices.append((field.name, offset, offset + len(field.columns), field.transform))
+            offset += len(field.columns)
+
+    @property
+    def columns(self):
+        """Columns to select, in row order"""
+        return [column for field in self.fields for column in field.columns]
+
+    def dump(self, row):
+        item = {}
+        for name, start, end, transform in self._slices:
+            if transform is None:
+                item[name] = row[start]
+            else:
+                item[name] = transform(*row[start:end])
+        return item
+
+    def dump_many(self, rows):
+        return [self.dump(row) for row in rows]
+
+
+def truncate(length):
+    """Shorten text to ``length`` characters plus an ellipsis"""
+    def transform(value):
+        return value[:length] + "..." if value and len(value) > length else value
+    return transform
+
+
+def _default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(payload):
+    """Compact JSON with sorted keys (the same documents as jsonify), as bytes"""
+    if orjson is not None:
+        return orjson.dumps(payload, option=orjson.OPT_SORT_KEYS)
+    return json.dumps(payload, sort_keys=True, separators=(",", ":"), default=_default).encode()
+
+
+def json_response(payload, status=200):
+    """
+    Serialize ``payload`` and compress it when the client accepts it
+
+    Bodies of at least RESPONSE_COMPRESS_MIN_BYTES are sent gzip- or
+    deflate-encoded, whichever the client prefers.
+    """
+    body = dumps(payload) + b"\n"
+    response = current_app.response_class(body, status=status, mimetype="application/json")
+    response.vary.add("Accept-Encoding")
+
+    if len(body) >= current_app.config["RESPONSE_COMPRESS_MIN_BYTES"]:
+        encoding = request.accept_encodings.best_match(["gzip", "deflate"])
+        level = current_app.config["RESPONSE_COMPRESS_LEVEL"]
+        if encoding == "gzip":
+            compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+            response.set_data(compressor.compress(body) + compressor.flush())
+            response.content_encoding = "gzip"
+        elif encoding == "deflate":
+            response.set_data(zlib.compress(body, level))
+            response.content_encoding = "deflate"
+    return response
@@ -0,0 +1,176 @@
+"""SLA deadlines and escalation of overdue petitions"""
+import logging
+from collections import Counter
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from app.extensions import db
+from app.models import Petition, PetitionStatus, User
+from .cache import CacheVersions
+from .notification_service import NotificationService
+from .track_cache import invalidate_tracking
+from .trend_service import TrendService
+from .work_queue import WorkQueue
+
+logger = logging.getLogger(__name__)
+
+# Statuses an SLA applies to; moving past them stops the clock
+SLA_STATUSES = ("submitted", "in_review")
+
+ESCALATED_PRIORITY = {"low": "medium", "medium": "high", "high": "high"}
+PRIORITY_RANK = {"low": 0, "medium": 1, "high": 2}
+
+
+def parse_sla_rules(value):
+    """Parse "Healthcare:24,default:72" into {"Healthcare": 24.0, "default": 72.0} (hours)"""
+    rules = {}
+    for entry in filter(None, (e.strip() for e in value.split(","))):
+        category, _, hours = entry.rpartition(":")
+        rules[category.strip()] = float(hours)
+    return rules
+
+
+def sla_due_at(category, created_at=None, status="submitted"):
+    """When a petition in ``category`` breaches its SLA, or None if none applies"""
+    if status not in SLA_STATUSES:
+        return None
+    rules = current_app.extensions.get("sla_rules")
+    if rules is None:
+        rules = current_app.extensions.setdefault("sla_rules", parse_sla_rules(current_app.config["SLA_RULES"]))
+    hours = rules.get(category, rules.get("default"))
+    if hours is None:
+        return None
+    return (created_at or datetime.utcnow()) + timedelta(hours=hours)
+
+
+def keep_escalated_priority(current, fresh):
+    """The priority to store when re-deriving an escalated petition's: never lower it"""
+    return max(current or "medium", fresh or "medium", key=lambda p: PRIORITY_RANK.get(p, 1))
+
+
+class SLAService:
+    """Escalate petitions left in submitted/in_review past their SLA.
+
+    Open petitions carry an indexed ``sla_due_at``; the escalation job reads
+    only rows with sla_due_at <= now (an index range scan) and clears the
+    column on the rows it escalates, so each tick costs in proportion to
+    the number of newly overdue petitions, not the size of the table.
+    A petition is escalated at most once.
+    """
+
+    @staticmethod
+    def escalate_overdue(now=None, batch_size=None, max_batches=10):
+        """
+        Escalate petitions whose SLA has passed
+
+        Each batch bumps priority one level, writes a PetitionStatus entry,
+        updates rollups and queue scores, and sends every officer one digest
+        notification, all in one transaction.
+
+        Returns:
+            Number of petitions escalated
+        """
+        now = now or datetime.utcnow()
+        batch_size = batch_size or current_app.config["SLA_BATCH_SIZE"]
+        escalated = 0
+        for _ in range(max_batches):
+            overdue = db.session.execute(
+                select(Petition)
+                .where(Petition.sla_due_at <= now)
+                .order_by(Petition.sla_due_at)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).scalars().all()
+            if not overdue:
+                db.session.commit()
+                break
+            SLAService._escalate(overdue, now)
+            db.session.commit()
+            escalated += len(overdue)
+            if len(overdue) < batch_size:
+                break
+        if escalated:
+            logger.info("SLA escalation: %d petitions escalated", escalated)
+        return escalated
+
+    @staticmethod
+    def _escalate(petitions, now):
+        increments = Counter()
+        for petition in petitions:
+            old_priority = petition.priority or "medium"
+            new_priority = ESCALATED_PRIORITY.get(old_priority, "high")
+            overdue_hours = (now - petition.sla_due_at).total_seconds() / 3600
+
+            petition.priority = new_priority
+            petition.sla_due_at = None
+            petition.escalated_at = now
+            WorkQueue.sync(petition)
+
+            comment = f"SLA breached ({overdue_hours:.1f}h overdue)"
+            if new_priority != old_priority:
+                comment += f"; priority escalated from {old_priority} to {new_priority}"
+                day = petition.created_at.date()
+                increments[(day, "priority", old_priority)] -= 1
+                increments[(day, "priority", new_priority)] += 1
+            db.session.add(PetitionStatus(
+                petition_id=petition.id,
+                status=petition.status,
+                comment=comment,
+                updated_by=None,
+                timestamp=now
+            ))
+            # rebuild() counts every history row in the status rollup
+            increments[(now.date(), "status", petition.status)] += 1
+
+        TrendService.apply_increments(increments)
+        CacheVersions.bump("petitions")
+        invalidate_tracking(p.petition_id for p in petitions)
+
+        officers = db.session.execute(select(User.id).where(User.role == "officer")).scalars().all()
+        listed = ", ".join(p.petition_id for p in petitions[:10])
+        more = f" and {len(petitions) - 10} more" if len(petitions) > 10 else ""
+        message = f"{len(petitions)} petition(s) breached their SLA and were escalated: {listed}{more}"
+        petition_id = petitions[0].id if len(petitions) == 1 else None
+        NotificationService.create_many((officer_id, petition_id, message) for officer_id in officers)
+
+    @staticmethod
+    def backfill(batch_size=1000):
+        """
+        Give open petitions without a deadline (filed before SLAs existed) one
+
+        Deadlines come from the petition's category and created_at, so
+        petitions already past their SLA are escalated by the next
+        escalation ticks, SLA_BATCH_SIZE at a time. Escalated petitions
+        are skipped.
+
+        Returns:
+            Number of petitions given a deadline
+        """
+        query = select(Petition.id, Petition.category, Petition.created_at, Petition.status).where(
+            Petition.status.in_(SLA_STATUSES),
+            Petition.sla_due_at.is_(None),
+            Petition.escalated_at.is_(None)
+        ).order_by(Petition.id).limit(batch_size)
+        after_id = 0
+        total = 0
+        while True:
+            rows = db.session.execute(query.where(Petition.id > after_id)).all()
+            if not rows:
+                break
+            updates = [
+                {"id": row.id, "sla_due_at": due}
+                for row in rows
+                if (due := sla_due_at(row.category, row.created_at, row.status)) is not None
+            ]
+            if updates:
+                db.session.execute(update(Petition), updates)
+            db.session.commit()
+            after_id = rows[-1].id
+            total += len(updates)
+        return total
+
+    @staticmethod
+    def sync(petition):
+        """Stop a petition's SLA clock once it moves past submitted/in_review (no commit)"""
+        if petition.status not in SLA_STATUSES:
+            petition.sla_due_at = None
@@ -0,0 +1,86 @@
+"""Cache of public tracking responses, invalidated when a petition changes"""
+import hashlib
+import threading
+from flask import current_app
+from .cache import LRUCache
+from .event_bus import event_bus, publish_after_commit
+from .serialization import dumps
+
+TRACK_CHANNEL = "track-cache"
+
+
+class TrackCache:
+    """Tracking payloads by public petition id, with an ETag per entry.
+
+    Writers call invalidate_tracking() in their transaction; after commit
+    the ids are dropped here and, through the event bus broker, in every
+    other process on the host (web workers, the scheduler, CLI jobs), so
+    the broker is required. Entries also expire after
+    TRACK_CACHE_TTL_SECONDS, which bounds staleness across hosts.
+    """
+
+    def __init__(self, max_entries, ttl):
+        self._entries = LRUCache(max_entries=max_entries, ttl=ttl)
+        self._lock = threading.Lock()
+        self._generation = 0  # bumped by every invalidation
+
+    def get(self, petition_id):
+        """(payload, etag) or None"""
+        return self._entries.get(petition_id)
+
+    def generation(self):
+        """Token to pass to put(); read it before loading from the database"""
+        return self._generation
+
+    def put(self, petition_id, payload, generation):
+        """
+        Cache a payload unless an invalidation arrived while it was loaded
+
+        Returns:
+            The entry's ETag
+        """
+        etag = hashlib.sha1(dumps(payload)).hexdigest()
+        with self._lock:
+            if generation == self._generation:
+                self._entries.set(petition_id, (payload, etag))
+        return etag
+
+    def invalidate(self, petition_ids):
+        with self._lock:
+            self._generation += 1
+            for petition_id in petition_ids:
+                self._entries.delete(petition_id)
+
+    def stats(self):
+        return self._entries.stats()
+
+
+_create_lock = threading.Lock()
+
+
+def get_track_cache():
+    """This app's tracking cache, created (and subscribed to invalidations) on first use"""
+    cache = current_app.extensions.get("track_cache")
+    if cache is None:
+        with _create_lock:
+            cache = current_app.extensions.get("track_cache")
+            if cache is None:
+                if not event_bus.broker_dir:
+                    raise RuntimeError("The tracking cache needs EVENT_BROKER_DIR to share invalidations")
+                cache = TrackCache(
+                    current_app.config["TRACK_CACHE_MAX_ENTRIES"],
+                    current_app.config["TRACK_CACHE_TTL_SECONDS"]
+                )
+                event_bus.add_listener(TRACK_CHANNEL, lambda evt: cache.invalidate(evt["data"]))
+                current_app.extensions["track_cache"] = cache
+    return cache
+
+
+def invalidate_tracking(petition_ids):
+    """
+    Drop cached tracking responses once the current transaction commits
+
+    Args:
+        petition_ids: Public petition ids (e.g. PET-2025-000123)
+    """
+    publish_after_commit(TRACK_CHANNEL, "invalidate", list(petition_ids))
@@ -0,0 +1,315 @@
+"""Time-series trends backed by a daily rollup store"""
+from collections import Counter, defaultdict
+from datetime import date, datetime, timedelta
+import logging
+from sqlalchemy import func, select, delete, insert, union_all
+from app.extensions import db
+from app.models import Petition, PetitionStatus, PetitionTrendDelta, PetitionTrendRollup, Department
+from .db_utils import upsert_increment
+
+GRANULARITIES = ("hour", "day", "week", "month")
+DIMENSIONS = ("department", "category", "priority", "status")
+
+logger = logging.getLogger(__name__)
+
+
+class TrendService:
+    """Maintain and query per-day petition counts.
+
+    Every petition increments one ``total`` bucket plus one bucket per
+    dimension on the day it was created; every status change increments a
+    ``status`` bucket on the day it happened. Writers only insert delta rows,
+    staged on the current session so they commit together with the petition
+    write; the hot per-day bucket rows are updated by fold_pending alone.
+    Queries add unfolded deltas to the rollups, so they are exact either way.
+    """
+
+    @staticmethod
+    def record_petition_created(petition, department_name=None):
+        """Count a newly created petition in its daily buckets"""
+        TrendService.apply_increments(TrendService.created_increments(
+            petition.created_at, department_name, petition.category, petition.priority, petition.status
+        ))
+
+    @staticmethod
+    def created_increments(created_at, department_name, category, priority, status):
+        """Rollup buckets a new petition counts in, as a Counter"""
+        day = (created_at or datetime.utcnow()).date()
+        return Counter({
+            (day, "total", ""): 1,
+            (day, "department", department_name or "Unassigned"): 1,
+            (day, "category", category or "Unclassified"): 1,
+            (day, "priority", priority or "medium"): 1,
+            (day, "status", status or "submitted"): 1,
+        })
+
+    @staticmethod
+    def record_status_change(new_status, when=None):
+        """Count a status transition in the day's ``status`` bucket"""
+        day = (when or datetime.utcnow()).date()
+        TrendService.apply_increments({(day, "status", new_status): 1})
+
+    @staticmethod
+    def apply_increments(increments):
+        """
+        Add counts to rollup buckets in the current session (as delta rows)
+
+        Args:
+            increments: mapping of (day, dimension, value) -> amount
+        """
+        rows = [
+            {"day": day, "dimension": dimension, "value": value, "amount": amount}
+            for (day, dimension, value), amount in increments.items() if amount
+        ]
+        if rows:
+            db.session.execute(insert(PetitionTrendDelta), rows)
+
+    @staticmethod
+    def fold_pending(batch_size=5000):
+        """
+        Move committed delta rows into the rollup buckets
+
+        Each batch is claimed with SKIP LOCKED, summed per bucket, added to
+        the rollups and deleted in one transaction.
+
+        Returns:
+            Number of delta rows folded
+        """
+        folded = 0
+        while True:
+            deltas = db.session.execute(
+                select(
+                    PetitionTrendDelta.id, PetitionTrendDelta.day,
+                    PetitionTrendDelta.dimension, PetitionTrendDelta.value, PetitionTrendDelta.amount
+                )
+                .order_by(PetitionTrendDelta.id)
+                .limit(batch_size)
+                .with_for_update(skip_locked=True)
+            ).all()
+            if not deltas:
+                db.session.commit()
+                break
+            totals = Counter()
+            for _, day, dimension, value, amount in deltas:
+                totals[(day, dimension, value)] += amount
+            for (day, dimension, value), amount in sorted(totals.items()):
+                if amount:
+                    upsert_increment(
+                        PetitionTrendRollup,
+                        {"day": day, "dimension": dimension, "value": value},
+                        "count",
+                        amount
+                    )
+            db.session.execute(
+                delete(PetitionTrendDelta)
+                .where(PetitionTrendDelta.id.in_([delta.id for delta in deltas]))
+                .execution_options(synchronize_session=False)
+            )
+            db.session.commit()
+            folded += len(deltas)
+            if len(deltas) < batch_size:
+                break
+        if folded:
+            logger.debug("Trend rollups: folded %d deltas", folded)
+        return folded
+
+    @staticmethod
+    def rebuild():
+        """Recompute the whole rollup store from petitions and status history"""
+        db.session.execute(delete(PetitionTrendDelta))
+        db.session.execute(delete(PetitionTrendRollup))
+
+        increments = Counter()
+        created_day = func.date(Petition.created_at)
+
+        total_query = select(created_day, func.count(Petition.id)).group_by(created_day)
+        for day, count in db.session.execute(total_query):
+            increments[(_as_date(day), "total", "")] += count
+
+        for dimension, column, default in (
+            ("category", Petition.category, "Unclassified"),
+            ("priority", Petition.priority, "medium"),
+        ):
+            query = select(created_day, column, func.count(Petition.id)).group_by(created_day, column)
+            for day, value, count in db.session.execute(query):
+                increments[(_as_date(day), dimension, value or default)] += count
+
+        dept_query = select(created_day, Department.name, func.count(Petition.id))\
+            .select_from(Petition).outerjoin(Department, Petition.department_id == Department.id)\
+            .group_by(created_day, Department.name)
+        for day, name, count in db.session.execute(dept_query):
+            increments[(_as_date(day), "department", name or "Unassigned")] += count
+
+        status_day = func.date(PetitionStatus.timestamp)
+        status_query = select(status_day, PetitionStatus.status, func.count(PetitionStatus.id))\
+            .group_by(status_day, PetitionStatus.status)
+        for day, status, count in db.session.execute(status_query):
+            increments[(_as_date(day), "status", status)] += count
+
+        db.session.add_all([
+            PetitionTrendRollup(day=day, dimension=dimension, value=value, count=count)
+            for (day, dimension, value), count in increments.items()
+        ])
+        db.session.commit()
+        return len(increments)
+
+    @staticmethod
+    def get_series(start, end, granularity="day", dimension=None, user_id=None, max_hourly_days=7):
+        """
+        Build zero-filled time series between two dates (inclusive)
+
+        Args:
+            start: First day of the range
+            end: Last day of the range
+            granularity: hour, day, week or month
+            dimension: Optional breakdown (department, category, priority, status)
+            user_id: Restrict to one petitioner's petitions
+            max_hourly_days: Longest range allowed at hour granularity
+
+        Returns:
+            dict with 'trends' (totals) and, for a dimension, per-value 'series'
+        """
+        if granularity not in GRANULARITIES:
+            raise ValueError(f"granularity must be one of {', '.join(GRANULARITIES)}")
+        if dimension is not None and dimension not in DIMENSIONS:
+            raise ValueError(f"dimension must be one of {', '.join(DIMENSIONS)}")
+        if start > end:
+            raise ValueError("start must not be after end")
+        if granularity == "hour" and (end - start).days + 1 > max_hourly_days:
+            raise ValueError(f"hourly trends are limited to {max_hourly_days} days")
+
+        # Hourly buckets and per-citizen scopes are not in the global daily
+        # rollup; both are small enough to bucket straight from the raw rows
+        if granularity == "hour" or user_id is not None:
+            counts = TrendService._count_raw(start, end, granularity, dimension, user_id)
+        else:
+            counts = TrendService._count_rollup(start, end, granularity, dimension)
+
+        buckets = list(_iter_buckets(start, end, granularity))
+        totals = Counter()
+        for (bucket, _), count in counts.items():
+            totals[bucket] += count
+
+        result = {
+            "trends": [{"date": _label(b, granularity), "count": totals.get(b, 0)} for b in buckets]
+        }
+
+        if dimension is not None:
+            values = sorted({value for _, value in counts})
+            result["series"] = {
+                value: [{"date": _label(b, granularity), "count": counts.get((b, value), 0)} for b in buckets]
+                for value in values
+            }
+
+        return result
+
+    @staticmethod
+    def _count_rollup(start, end, granularity, dimension):
+        """Sum daily rollup rows, plus deltas not folded yet, into (bucket, value) counts"""
+        dimension_name = dimension or "total"
+        query = union_all(
+            select(
+                PetitionTrendRollup.day,
+                PetitionTrendRollup.value,
+                PetitionTrendRollup.count
+            ).where(
+                PetitionTrendRollup.dimension == dimension_name,
+                PetitionTrendRollup.day >= start,
+                PetitionTrendRollup.day <= end
+            ),
+            select(
+                PetitionTrendDelta.day,
+                PetitionTrendDelta.value,
+                PetitionTrendDelta.amount
+            ).where(
+                PetitionTrendDelta.dimension == dimension_name,
+                PetitionTrendDelta.day >= start,
+                PetitionTrendDelta.day <= end
+            )
+        )
+
+        counts = defaultdict(int)
+        for day, value, count in db.session.execute(query):
+            counts[(_bucket(_as_date(day), granularity), value if dimension else "")] += count
+        return counts
+
+    @staticmethod
+    def _count_raw(start, end, granularity, dimension, user_id):
+        """Bucket raw petition/status rows into (bucket, value) counts"""
+        start_dt = datetime.combine(start, datetime.min.time())
+        end_dt = datetime.combine(end + timedelta(days=1), datetime.min.time())
+
+        if dimension == "status":
+            query = select(PetitionStatus.timestamp, PetitionStatus.status)\
+                .where(PetitionStatus.timestamp >= start_dt, PetitionStatus.timestamp < end_dt)
+            if user_id is not None:
+                query = query.join(Petition, PetitionStatus.petition_id == Petition.id)\
+                    .where(Petition.user_id == user_id)
+        else:
+            if dimension == "department":
+                query = select(Petition.created_at, Department.name).select_from(Petition)\
+                    .outerjoin(Department, Petition.department_id == Department.id)
+            elif dimension in ("category", "priority"):
+                query = select(Petition.created_at, getattr(Petition, dimension))
+            else:
+                query = select(Petition.created_at, db.literal(""))
+            query = query.where(Petition.created_at >= start_dt, Petition.created_at < end_dt)
+            if user_id is not None:
+                query = query.where(Petition.user_id == user_id)
+
+        defaults = {"department": "Unassigned", "category": "Unclassified", "priority": "medium"}
+        counts = defaultdict(int)
+        for timestamp, value in db.session.execute(query):
+            if value is None:
+                value = defaults.get(dimension, "")
+            bucket = _bucket(timestamp if granularity == "hour" else timestamp.date(), granularity)
+            counts[(bucket, value)] += 1
+        return counts
+
+
+def _as_date(value):
+    """Normalize DATE() results, which SQLite returns as strings"""
+    if isinstance(value, str):
+        return date.fromisoformat(value)
+    if isinstance(value, datetime):
+        return value.date()
+    return value
+
+
+def _bucket(value, granularity):
+    """Map a date (or datetime for hours) to the start of its bucket"""
+    if granularity == "hour":
+        return value.replace(minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        return value - timedelta(days=value.weekday())
+    if granularity == "month":
+        return value.replace(day=1)
+    return value
+
+
+def _iter_buckets(start, end, granularity):
+    """Yield every bucket start between two dates, gaps included"""
+    if granularity == "hour":
+        current = datetime.combine(start, datetime.min.time())
+        stop = datetime.combine(end + timedelta(days=1), datetime.min.time())
+        while current < stop:
+            yield current
+            current += timedelta(hours=1)
+        return
+
+    current = _bucket(start, granularity)
+    while current <= end:
+        yield current
+        if granularity == "day":
+            current += timedelta(days=1)
+        elif granularity == "week":
+            current += timedelta(weeks=1)
+        else:
+            current = (current.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+def _label(bucket, granularity):
+    """Format a bucket start for the API"""
+    if granularity == "hour":
+        return bucket.strftime("%Y-%m-%dT%H:00")
+    return bucket.isoformat()
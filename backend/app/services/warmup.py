@@ -0,0 +1,30 @@
+"""Load models before serving so the first real request is not the slow one"""
+import logging
+import time
+from .petition_processor import get_processor
+
+logger = logging.getLogger(__name__)
+
+WARMUP_TITLE = "Street light not working"
+WARMUP_DESCRIPTION = (
+    "The street light near the bus stop on Main Road has not worked for two weeks. "
+    "It is urgent because the area is unsafe at night. Please contact 9876543210."
+)
+
+
+def warm_up(app):
+    """
+    Build the NLP pipeline and run a dummy petition through it
+
+    With a pre-fork server this runs once in the master, and the workers
+    inherit the loaded models.
+    """
+    start = time.monotonic()
+    with app.app_context():
+        get_processor().process_petition(WARMUP_TITLE, WARMUP_DESCRIPTION)
+    app.extensions["warmed_up"] = True
+    logger.info("Warmup finished in %.1fs", time.monotonic() - start)
+
+
+def is_warmed_up(app):
+    return app.extensions.get("warmed_up", False)
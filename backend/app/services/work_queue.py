@@ -0,0 +1,187 @@
+"""Officer work queue: stored priority scores and row-locked claiming"""
+import calendar
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import select, update
+from app.extensions import db
+from app.models import Petition
+
+OPEN_STATUSES = ("submitted", "in_review", "in_progress")
+
+# Head start, in points, for each signal; one point is QUEUE_HOURS_PER_POINT
+# hours of waiting
+PRIORITY_POINTS = {"high": 3, "medium": 1, "low": 0}
+URGENCY_POINTS = {"critical": 3, "urgent": 1.5, "normal": 0}
+NEGATIVE_SENTIMENT_POINTS = 2  # at sentiment -1, scaled linearly to 0
+
+
+def queue_score(priority, urgency_level, sentiment_score, created_at, hours_per_point=None):
+    """
+    Queue position of a petition; lower is served first
+
+    The score is the petition's "effective filing time" in epoch seconds:
+    created_at moved earlier by a head start for priority, urgency and
+    negative sentiment. Every petition ages at the same rate, so the order
+    by this fixed value equals the order by (points + hours waited) at any
+    moment, and the score never needs to be refreshed as time passes.
+    """
+    if hours_per_point is None:
+        hours_per_point = current_app.config["QUEUE_HOURS_PER_POINT"]
+    points = (
+        PRIORITY_POINTS.get(priority, 1)
+        + URGENCY_POINTS.get(urgency_level, 0)
+        + NEGATIVE_SENTIMENT_POINTS * max(0.0, -(sentiment_score or 0.0))
+    )
+    filed = calendar.timegm((created_at or datetime.utcnow()).utctimetuple())
+    return int(filed - points * hours_per_point * 3600)
+
+
+def petition_queue_score(petition):
+    """queue_score for a Petition, or None once it is closed"""
+    if petition.status not in OPEN_STATUSES:
+        return None
+    return queue_score(petition.priority, petition.urgency_level, petition.sentiment_score, petition.created_at)
+
+
+class WorkQueue:
+    """Per-department queue of open petitions for officers.
+
+    Open petitions carry a stored ``queue_score`` (see queue_score) and
+    are read through the (department_id, claimed_by, queue_score) index,
+    so finding the next unclaimed items is an index range scan whose cost
+    doesn't grow with the backlog. Claims lock candidate rows with
+    SELECT ... FOR UPDATE SKIP LOCKED, so concurrent officers never wait on
+    or take the same petition; claims older than QUEUE_CLAIM_TIMEOUT_MINUTES
+    return to the queue.
+    """
+
+    @staticmethod
+    def _unclaimed(columns, department_id):
+        return (
+            select(*columns)
+            .where(
+                Petition.department_id == department_id,
+                Petition.claimed_by.is_(None),
+                Petition.queue_score.isnot(None)
+            )
+            .order_by(Petition.queue_score)
+        )
+
+    @staticmethod
+    def claim(department_id, officer_id, count=1):
+        """
+        Atomically claim the next ``count`` unclaimed petitions
+
+        Args:
+            department_id: Department whose queue to take from
+            officer_id: Claiming user
+            count: Number of petitions wanted
+
+        Returns:
+            list of claimed petition ids in queue order (may be shorter)
+        """
+        ids = db.session.execute(
+            WorkQueue._unclaimed([Petition.id], department_id).limit(count).with_for_update(skip_locked=True)
+        ).scalars().all()
+        if ids:
+            now = datetime.utcnow()
+            result = db.session.execute(
+                update(Petition)
+                .where(Petition.id.in_(ids), Petition.claimed_by.is_(None))
+                .values(claimed_by=officer_id, claimed_at=now)
+                .execution_options(synchronize_session=False)
+            )
+            if result.rowcount < len(ids):
+                # Only without row locks (e.g. SQLite) can another claim win
+                # a row between our SELECT and UPDATE; keep what we got
+                claimed = set(db.session.execute(
+                    select(Petition.id)
+                    .where(Petition.id.in_(ids), Petition.claimed_by == officer_id, Petition.claimed_at == now)
+                ).scalars())
+                ids = [i for i in ids if i in claimed]
+        db.session.commit()
+        return ids
+
+    @staticmethod
+    def release(petition_ids, department_id=None, officer_id=None):
+        """
+        Return claimed petitions to the queue
+
+        Args:
+            petition_ids: Petition primary keys
+            department_id: Only release petitions of this department
+            officer_id: Only release claims held by this user (None = any)
+
+        Returns:
+            Number of petitions released
+        """
+        query = update(Petition).where(Petition.id.in_(petition_ids), Petition.claimed_by.isnot(None))
+        if department_id is not None:
+            query = query.where(Petition.department_id == department_id)
+        if officer_id is not None:
+            query = query.where(Petition.claimed_by == officer_id)
+        result = db.session.execute(
+            query.values(claimed_by=None, claimed_at=None).execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def release_stale(timeout_minutes=None):
+        """Release claims older than the timeout; returns the number released"""
+        if timeout_minutes is None:
+            timeout_minutes = current_app.config["QUEUE_CLAIM_TIMEOUT_MINUTES"]
+        cutoff = datetime.utcnow() - timedelta(minutes=timeout_minutes)
+        result = db.session.execute(
+            update(Petition)
+            .where(Petition.claimed_at < cutoff)
+            .values(claimed_by=None, claimed_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    @staticmethod
+    def peek(columns, department_id, limit=20):
+        """select() of the next ``limit`` unclaimed petitions, in queue order"""
+        return WorkQueue._unclaimed(columns, department_id).limit(limit)
+
+    @staticmethod
+    def sync(petition):
+        """
+        Update a petition's score and claim after a change (no commit)
+
+        Closed petitions leave the queue; reopened ones rejoin it.
+        """
+        petition.queue_score = petition_queue_score(petition)
+        if petition.queue_score is None:
+            petition.claimed_by = None
+            petition.claimed_at = None
+
+    @staticmethod
+    def rescore(batch_size=1000):
+        """Recompute the score of every petition; returns the number scored"""
+        hours_per_point = current_app.config["QUEUE_HOURS_PER_POINT"]
+        query = select(
+            Petition.id, Petition.status, Petition.priority, Petition.urgency_level,
+            Petition.sentiment_score, Petition.created_at
+        ).order_by(Petition.id).limit(batch_size)
+        after_id = 0
+        total = 0
+        while True:
+            rows = db.session.execute(query.where(Petition.id > after_id)).all()
+            if not rows:
+                break
+            db.session.execute(update(Petition), [
+                {
+                    "id": row.id,
+                    "queue_score": queue_score(
+                        row.priority, row.urgency_level, row.sentiment_score, row.created_at, hours_per_point
+                    ) if row.status in OPEN_STATUSES else None
+                }
+                for row in rows
+            ])
+            db.session.commit()
+            after_id = rows[-1].id
+            total += len(rows)
+        return total
@@ -0,0 +1,8 @@
+"""WSGI entrypoint for the event-stream server
+
+    gunicorn -c gunicorn_sse.conf.py app.sse_wsgi:app
+
+The same app as app.wsgi, without the NLP warmup: this server only answers
+/notifications/stream, which never touches the models.
+"""
+from app.start import app
@@ -7,7 +7,9 @@ env_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), ".env")
 load_dotenv(env_path)
 
 from app.extensions import db, jwt
+from app.db_routing import init_routing
 from app.config import Config
+from app.services import event_bus, AttachmentRequest
 
 # Import blueprints
 from app.api.auth import auth
@@ -15,23 +17,33 @@ from app.api.petitions import petitions
 from app.api.departments import departments
 from app.api.analytics import analytics
 from app.api.notifications import notifications
+from app.api.health import health
 
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
+    app.request_class = AttachmentRequest
+    if app.config["TRUSTED_PROXIES"]:
+        from werkzeug.middleware.proxy_fix import ProxyFix
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config["TRUSTED_PROXIES"])
 
     # Initialize extensions
     db.init_app(app)
     jwt.init_app(app)
+    event_bus.configure(app.config)
+    init_routing(app)
 
     # Configure CORS
     from flask_cors import CORS
     CORS(app, resources={r"/*": {"origins": "*"}})
 
-    # ✅ Auto-create all tables when app starts (no python shell needed)
-    with app.app_context():
-        db.create_all()
+    # Schema creation and upgrades are not part of booting; run init_db.py,
+    # or set AUTO_CREATE_SCHEMA=true for local development
+    if app.config["AUTO_CREATE_SCHEMA"]:
+        from app.migrations import upgrade_schema
+        with app.app_context():
+            upgrade_schema()
 
     # Register routes
     app.register_blueprint(auth, url_prefix="/auth")
@@ -39,6 +51,7 @@ def create_app():
     app.register_blueprint(departments, url_prefix="/departments")
     app.register_blueprint(analytics, url_prefix="/analytics")
     app.register_blueprint(notifications, url_prefix="/notifications")
+    app.register_blueprint(health, url_prefix="/health")
 
     @app.route("/")
     def home():
@@ -50,6 +63,14 @@ def create_app():
 app = create_app()
 
 if __name__ == "__main__":
+    # Development server; production uses gunicorn -c gunicorn.conf.py app.wsgi:app
+    from app.migrations import upgrade_schema
+    from app.services import init_scheduler, warm_up
+    with app.app_context():
+        upgrade_schema()
+    warm_up(app)
+    # Under gunicorn a worker is elected to run these (gunicorn.conf.py)
+    init_scheduler(app)
     app.run(host="0.0.0.0", port=5000, debug=True)
 
 
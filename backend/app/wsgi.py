@@ -0,0 +1,11 @@
+"""Production WSGI entrypoint
+
+    gunicorn -c gunicorn.conf.py app.wsgi:app
+
+Importing this module builds the app and warms up the NLP pipeline. With
+preload_app the master does both once before forking workers.
+"""
+from app.start import app
+from app.services import warm_up
+
+warm_up(app)
@@ -0,0 +1,132 @@
+"""Benchmark login throughput and its effect on other endpoints
+
+Usage:
+    python benchmarks/password_hashing.py
+    python benchmarks/password_hashing.py --seconds 20 --clients 16 --modes inline,process
+
+For each PASSWORD_HASH_EXECUTOR mode the app is served by a threaded WSGI
+server (like one gunicorn gthread worker) against a throwaway SQLite
+database. Client processes log in as fast as they can while a probe
+measures /health/live latency; a run without login load gives the
+baseline. Reported: successful logins/s, rejected (503) logins, and probe
+p50/p99 latency.
+"""
+import argparse
+import http.client
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from multiprocessing import Process, Queue
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def login_client(port, seconds, results):
+    body = json.dumps({"email": "bench@example.com", "password": "bench-password"})
+    ok = busy = 0
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("POST", "/auth/login", body, {"Content-Type": "application/json"})
+        status = conn.getresponse().status
+        conn.close()
+        ok += status == 200
+        busy += status == 503
+    results.put(("login", ok, busy))
+
+
+def probe_client(port, seconds, results):
+    latencies = []
+    deadline = time.monotonic() + seconds
+    while time.monotonic() < deadline:
+        start = time.perf_counter()
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        conn.request("GET", "/health/live")
+        conn.getresponse().read()
+        conn.close()
+        latencies.append((time.perf_counter() - start) * 1000)
+        time.sleep(0.01)
+    results.put(("probe", latencies))
+
+
+def run(port, seconds, clients):
+    results = Queue()
+    procs = [Process(target=probe_client, args=(port, seconds, results))]
+    procs += [Process(target=login_client, args=(port, seconds, results)) for _ in range(clients)]
+    for p in procs:
+        p.start()
+    ok = busy = 0
+    latencies = []
+    for _ in procs:
+        item = results.get()
+        if item[0] == "login":
+            ok += item[1]
+            busy += item[2]
+        else:
+            latencies = item[1]
+    for p in procs:
+        p.join()
+    latencies.sort()
+    return {
+        "logins_per_s": round(ok / seconds, 1),
+        "rejected": busy,
+        "probe_p50_ms": round(statistics.median(latencies), 2),
+        "probe_p99_ms": round(latencies[int(len(latencies) * 0.99) - 1], 2),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Password hashing benchmark")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=8, help="Concurrent login clients")
+    parser.add_argument("--modes", default="inline,thread,process")
+    parser.add_argument("--method", help="PASSWORD_HASH_METHOD (default: app config)")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench.db"
+    os.environ["RATE_LIMIT_ENABLED"] = "false"
+    os.environ["SCHEDULER_ENABLED"] = "false"
+    from werkzeug.serving import make_server
+    from app.start import app
+    from app.extensions import db
+    from app.models import User
+    from app.services.passwords import PasswordHasher
+
+    method = args.method or app.config["PASSWORD_HASH_METHOD"]
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(
+            name="Bench", email="bench@example.com", role="citizen",
+            password=PasswordHasher(method, executor="inline").hash("bench-password")
+        ))
+        db.session.commit()
+
+    logging.getLogger("werkzeug").setLevel(logging.WARNING)
+    server = make_server("127.0.0.1", 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    print(f"method={method} clients={args.clients} seconds={args.seconds}")
+    print(f"{'mode':<10}{'logins/s':>10}{'503s':>8}{'probe p50':>12}{'probe p99':>12}")
+    baseline = run(server.server_port, min(args.seconds, 3), 0)
+    print(f"{'no load':<10}{'-':>10}{'-':>8}{baseline['probe_p50_ms']:>10}ms{baseline['probe_p99_ms']:>10}ms")
+    for mode in args.modes.split(","):
+        app.extensions["password_hasher"] = PasswordHasher(
+            method,
+            executor=mode,
+            workers=app.config["PASSWORD_HASH_WORKERS"],
+            max_pending=app.config["PASSWORD_HASH_MAX_PENDING"],
+            queue_timeout=app.config["PASSWORD_HASH_QUEUE_TIMEOUT"]
+        )
+        result = run(server.server_port, args.seconds, args.clients)
+        print(f"{mode:<10}{result['logins_per_s']:>10}{result['rejected']:>8}"
+              f"{result['probe_p50_ms']:>10}ms{result['probe_p99_ms']:>10}ms")
+    server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""Export petitions as CSV or NDJSON
+
+Usage:
+    python export_petitions.py -o petitions.csv
+    python export_petitions.py --format ndjson --gzip --status resolved -o resolved.ndjson.gz
+    python export_petitions.py --department Healthcare > healthcare.csv
+"""
+import argparse
+import sys
+from app.start import app
+from app.services import PetitionExporter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export petitions")
+    parser.add_argument("--format", choices=["csv", "ndjson"], default="csv")
+    parser.add_argument("--gzip", action="store_true", help="Compress the output")
+    parser.add_argument("--status")
+    parser.add_argument("--priority")
+    parser.add_argument("--department", help="Department name")
+    parser.add_argument("--batch-size", type=int, default=app.config["EXPORT_BATCH_SIZE"])
+    parser.add_argument("-o", "--output", help="Output file (default: stdout)")
+    args = parser.parse_args()
+
+    out = open(args.output, "wb") if args.output else sys.stdout.buffer
+    try:
+        with app.app_context():
+            for chunk in PetitionExporter.stream(
+                args.format, args.gzip, args.batch_size,
+                status=args.status, priority=args.priority, department=args.department
+            ):
+                out.write(chunk)
+    finally:
+        if args.output:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,45 @@
+"""Gunicorn settings; every value can be overridden from the environment"""
+import multiprocessing
+import os
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5001')}")
+workers = int(os.getenv("GUNICORN_WORKERS", str(multiprocessing.cpu_count() * 2 + 1)))
+threads = int(os.getenv("GUNICORN_THREADS", "4"))
+worker_class = "gthread" if threads > 1 else "sync"
+
+# An event stream holds one of these threads for as long as it is open, so
+# streams that reach the API server are capped well below the thread count
+# (503 above it). Serve /notifications/stream from gunicorn_sse.conf.py.
+os.environ.setdefault("SSE_MAX_CONNECTIONS", str(max(1, threads // 4)))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+keepalive = int(os.getenv("GUNICORN_KEEPALIVE", "5"))
+max_requests = int(os.getenv("GUNICORN_MAX_REQUESTS", "0"))
+max_requests_jitter = int(os.getenv("GUNICORN_MAX_REQUESTS_JITTER", "0"))
+
+# Load the app (and train/load the NLP models via app.wsgi) once in the
+# master; workers share those pages copy-on-write. The master starts no
+# threads (it keeps forking replacements), so with SCHEDULER_ENABLED the
+# background scheduler runs in one elected worker (see post_fork).
+preload_app = True
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_fork(server, worker):
+    """Give each worker its own database connections and event broker socket,
+    and let it stand for running the background scheduler"""
+    from app.wsgi import app
+    from app.extensions import db
+    from app.services import elect_scheduler
+    from app.services.event_bus import event_bus
+
+    with app.app_context():
+        for engine in db.engines.values():
+            # close=False leaves the master's sockets alone
+            engine.dispose(close=False)
+    # Bind now rather than on first publish, so the worker receives events
+    # (cache invalidations, replica pins) before it serves anything
+    event_bus.ensure_broker()
+    elect_scheduler(app)
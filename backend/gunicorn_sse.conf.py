@@ -0,0 +1,33 @@
+"""Gunicorn settings for the event-stream server (/notifications/stream)
+
+    gunicorn -c gunicorn_sse.conf.py app.sse_wsgi:app
+
+Each open stream is an idle greenlet instead of a thread, so one worker
+holds thousands of connections. Run it next to the API server with the same
+EVENT_BROKER_DIR and route /notifications/stream to it from the proxy.
+"""
+import os
+
+bind = os.getenv("SSE_BIND", "0.0.0.0:5002")
+workers = int(os.getenv("SSE_WORKERS", "1"))
+worker_class = "gevent"
+worker_connections = int(os.getenv("SSE_WORKER_CONNECTIONS", "5000"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "60"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "30"))
+
+# Leave a little headroom below worker_connections for the ticket lookups'
+# own sockets; streams above it get 503
+os.environ.setdefault("SSE_MAX_CONNECTIONS", str(max(1, worker_connections - 100)))
+
+# Not preloaded: the app must be imported after gevent has patched the
+# standard library in each worker
+preload_app = False
+
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-")
+loglevel = os.getenv("GUNICORN_LOG_LEVEL", "info")
+
+
+def post_worker_init(worker):
+    """Bind the event broker socket before serving, so pins and invalidations arrive"""
+    from app.services.event_bus import event_bus
+    event_bus.ensure_broker()
@@ -0,0 +1,54 @@
+"""Bulk import legacy petitions from a CSV or JSONL file
+
+Usage:
+    python import_petitions.py petitions.csv
+    python import_petitions.py petitions.jsonl --workers 8 --notify
+
+Progress is recorded in the database under a job named after the input
+file (its absolute path, or --job); running the same command again resumes
+after the last committed batch. Rows that could not be imported are
+written to <file>.errors.jsonl.
+"""
+import argparse
+import json
+import os
+from app.start import app
+from app.services import PetitionImporter, detect_format, read_import_state
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Import legacy petitions")
+    parser.add_argument("source", help="CSV or JSONL file")
+    parser.add_argument("--format", choices=["csv", "jsonl"], help="Input format (default: from extension)")
+    parser.add_argument("--batch-size", type=int, default=app.config["IMPORT_BATCH_SIZE"])
+    parser.add_argument("--workers", type=int, default=app.config["IMPORT_WORKERS"],
+                        help="NLP processes (1 runs in-process)")
+    parser.add_argument("--notify", action="store_true", help="Create an in-app notification per petition")
+    parser.add_argument("--job", help="Import job id to create or resume (default: the source's absolute path)")
+    parser.add_argument("--errors", help="Row error file (default: <source>.errors.jsonl)")
+    args = parser.parse_args()
+
+    importer = PetitionImporter(
+        args.job or os.path.abspath(args.source),
+        batch_size=args.batch_size,
+        workers=args.workers,
+        notify=args.notify
+    )
+    errors_path = args.errors or f"{args.source}.errors.jsonl"
+
+    def progress(state):
+        print(f"  row {state['row']}: {state['imported']} imported, {state['failed']} failed")
+
+    with app.app_context(), open(args.source, "rb") as f:
+        state = importer.run(f, args.format or detect_format(args.source), progress=progress)
+        print(f"✅ Import {state['status']}: {state['imported']} imported, {state['failed']} failed")
+        if state["failed"]:
+            # Every error of the job so far, including earlier runs
+            with open(errors_path, "w") as out:
+                for error in read_import_state(importer.job_id, errors=None)["errors"]:
+                    out.write(json.dumps(error) + "\n")
+            print(f"ℹ️  Row errors written to {errors_path}")
+
+
+if __name__ == "__main__":
+    main()
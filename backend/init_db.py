@@ -1,15 +1,18 @@
 """Database initialization and seeding script"""
 from app.start import app
 from app.extensions import db
+from app.migrations import upgrade_schema
 from app.models import User, Department
-from werkzeug.security import generate_password_hash
+from app.services import TrendService, NotificationService, WorkQueue, SLAService, get_password_hasher
 
 def init_database():
     """Initialize database and create tables"""
     with app.app_context():
-        # Create all tables
-        db.create_all()
+        # Create missing tables, then add columns/indexes introduced since
+        applied = upgrade_schema()
         print("✅ Database tables created successfully!")
+        if applied:
+            print(f"✅ Upgraded existing tables: {', '.join(applied)}")
         
         # Seed departments
         departments = [
@@ -39,7 +42,7 @@ def init_database():
             admin = User(
                 name="System Admin",
                 email=admin_email,
-                password=generate_password_hash("admin123", method='pbkdf2:sha256'),
+                password=get_password_hasher().hash("admin123"),
                 role="admin",
                 phone="9876543210"
             )
@@ -49,6 +52,22 @@ def init_database():
         else:
             print("ℹ️  Admin user already exists")
         
+        # Rebuild analytics rollups from existing petitions
+        buckets = TrendService.rebuild()
+        print(f"✅ Rebuilt trend rollups ({buckets} buckets)")
+        
+        # Seed unread notification counters
+        users = NotificationService.rebuild_unread_counters()
+        print(f"✅ Rebuilt unread counters for {users} users")
+        
+        # Score petitions for the officer work queue
+        scored = WorkQueue.rescore()
+        print(f"✅ Scored {scored} petitions for the work queue")
+        
+        # Give open petitions filed before SLAs existed a deadline
+        deadlines = SLAService.backfill()
+        print(f"✅ Set SLA deadlines on {deadlines} open petitions")
+        
         print("\n🎉 Database initialization complete!")
 
 if __name__ == "__main__":
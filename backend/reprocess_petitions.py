@@ -0,0 +1,57 @@
+"""Re-run the NLP pipeline over stored petitions
+
+Usage:
+    python reprocess_petitions.py --dry-run --report changes.jsonl
+    python reprocess_petitions.py --workers 4 --max-rate 50
+
+Progress is checkpointed (default: reprocess.checkpoint.json); running the
+same command again resumes after the last committed chunk. Use --restart
+to start from the first petition again.
+"""
+import argparse
+import os
+from app.start import app
+from app.services import PetitionReprocessor
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Reprocess stored petitions")
+    parser.add_argument("--dry-run", action="store_true", help="Report changes without writing them")
+    parser.add_argument("--report", help="JSONL file for changes (dry run) and NLP failures")
+    parser.add_argument("--batch-size", type=int, default=app.config["REPROCESS_BATCH_SIZE"])
+    parser.add_argument("--workers", type=int, default=app.config["REPROCESS_WORKERS"],
+                        help="NLP processes (1 runs in-process)")
+    parser.add_argument("--max-rate", type=float, default=app.config["REPROCESS_MAX_RATE"],
+                        help="Petitions per second (0 = unthrottled)")
+    parser.add_argument("--nice", type=int, default=10, help="CPU niceness of the worker processes")
+    parser.add_argument("--checkpoint", default="reprocess.checkpoint.json")
+    parser.add_argument("--restart", action="store_true", help="Ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    if args.restart and os.path.exists(args.checkpoint):
+        os.remove(args.checkpoint)
+
+    reprocessor = PetitionReprocessor(
+        batch_size=args.batch_size,
+        workers=args.workers,
+        dry_run=args.dry_run,
+        max_rate=args.max_rate,
+        niceness=args.nice,
+        checkpoint_path=args.checkpoint,
+        report_path=args.report
+    )
+
+    def progress(state):
+        print(f"  id {state['last_id']}: {state['scanned']} scanned, {state['changed']} changed, {state['failed']} failed")
+
+    with app.app_context():
+        state = reprocessor.run(progress=progress)
+
+    verb = "would change" if args.dry_run else "changed"
+    print(f"✅ Reprocessing {state['status']}: {state['scanned']} scanned, {state['changed']} {verb}, {state['failed']} failed")
+    if args.report:
+        print(f"ℹ️  Report written to {args.report}")
+
+
+if __name__ == "__main__":
+    main()
@@ -136,6 +136,53 @@ const api = {
             }
         });
         return await response.json();
+    },
+
+    // Push updates instead of polling; handlers receive the parsed event data.
+    // Each connection is opened with a one-time ticket, so after an error the
+    // stream is reopened with a fresh ticket, resuming from the last event id.
+    subscribeEvents({ onNotification, onStatus } = {}) {
+        let source = null;
+        let lastEventId = null;
+        let closed = false;
+
+        const track = (handler) => (e) => {
+            lastEventId = e.lastEventId || lastEventId;
+            handler(JSON.parse(e.data));
+        };
+
+        const connect = async () => {
+            if (closed) return;
+            try {
+                const response = await fetch(`${API_BASE_URL}/notifications/stream-ticket`, {
+                    method: 'POST',
+                    headers: {
+                        'Authorization': `Bearer ${getToken()}`
+                    }
+                });
+                if (!response.ok) throw new Error(`ticket request failed: ${response.status}`);
+                const { ticket } = await response.json();
+                let url = `${API_BASE_URL}/notifications/stream?ticket=${encodeURIComponent(ticket)}`;
+                if (lastEventId) url += `&last_event_id=${encodeURIComponent(lastEventId)}`;
+                source = new EventSource(url);
+                if (onNotification) source.addEventListener('notification', track(onNotification));
+                if (onStatus) source.addEventListener('status', track(onStatus));
+                source.onerror = () => {
+                    source.close();
+                    setTimeout(connect, 5000);
+                };
+            } catch (err) {
+                setTimeout(connect, 15000);
+            }
+        };
+
+        connect();
+        return {
+            close() {
+                closed = true;
+                if (source) source.close();
+            }
+        };
     }
 };
 